@@ -0,0 +1,81 @@
+"""
+    Measures bytes on the wire and end-to-end latency of save, find_by_user and search for a user with many
+    attributes, with and without request/response compression.
+
+    Usage:
+        python -m benchmarks.compression [--attributes N] [--iterations N] [--bandwidth BYTES_PER_SECOND]
+
+    A local stand-in vault is started with a simulated link speed (1 MB/s by default, roughly a congested
+    cross-region link); pass --bandwidth 0 to measure loopback speed only.
+"""
+
+import argparse
+import random
+import statistics
+import string
+import time
+
+from vizivault import ViziVault, User, AttributeDefinition, SearchRequest
+from benchmarks.vault_stand_in import start_stand_in
+
+
+def random_text(length):
+    return ''.join(random.choice(string.ascii_letters + ' ') for _ in range(length))
+
+
+def build_user(user_id, attributes):
+    user = User(user_id)
+    for index in range(attributes):
+        user.add_attribute(attribute="BenchmarkAddress", value={
+            "street": f"{index} {random.choice(['Main', 'Oak', 'Hacker', 'Jefferson'])} Street",
+            "city": random.choice(['Menlo Park', 'Dickinson', 'San Gabriel', 'Bridgeport']),
+            "country": "USA",
+            "note": random_text(60)})
+    return user
+
+
+def run(base_url, state, attributes, iterations):
+    configurations = (("uncompressed", dict(accept_encoding='identity')),
+                      ("gzip", dict(compress_requests_above=1024, accept_encoding='gzip, deflate')))
+    for label, options in configurations:
+        with ViziVault(base_url=base_url, api_key='12345', encryption_key='', decryption_key='', **options) as vault:
+            definition = AttributeDefinition("BenchmarkAddress")
+            definition.repeatable = True
+            definition.indexed = True
+            vault.store_attribute_definition(definition)
+
+            timings = {"save": [], "find_by_user": [], "search": []}
+            bytes_received, bytes_sent = state.bytes_received, state.bytes_sent
+            for _ in range(iterations):
+                user = build_user("benchmarkUser", attributes)
+                search_request = SearchRequest()
+                search_request.attributes = ["BenchmarkAddress"]
+                search_request.userId = user.id
+
+                for operation, call in (("save", lambda: vault.save(user)),
+                                        ("find_by_user", lambda: vault.find_by_user(user.id)),
+                                        ("search", lambda: vault.search(search_request, 0, attributes))):
+                    start = time.perf_counter()
+                    call()
+                    timings[operation].append(time.perf_counter() - start)
+                vault.purge(user.id)
+
+            print(f"{label}: {(state.bytes_received - bytes_received) / iterations / 1024:10.1f} KiB sent to vault, "
+                  f"{(state.bytes_sent - bytes_sent) / iterations / 1024:10.1f} KiB received per iteration")
+            for operation, operation_timings in timings.items():
+                print(f"    {operation:<14} mean {statistics.mean(operation_timings) * 1000:9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attributes', type=int, default=300)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--bandwidth', type=float, default=1000000)
+    args = parser.parse_args()
+
+    server, base_url = start_stand_in(bandwidth=args.bandwidth or None)
+    run(base_url, server.RequestHandlerClass.state, args.attributes, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
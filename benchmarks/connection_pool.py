@@ -0,0 +1,69 @@
+"""
+    Compares per-call latency of find_by_user and save with a pooled, keep-alive client against a client that
+    opens a new connection for every request.
+
+    Usage:
+        python -m benchmarks.connection_pool [--base-url URL] [--api-key KEY] [--iterations N]
+
+    Without --base-url a local stand-in vault is started, which only measures connection setup over loopback;
+    point it at a real (TLS) vault to see the handshake cost the pool removes.
+"""
+
+import argparse
+import statistics
+import time
+
+from vizivault import ViziVault, User, AttributeDefinition
+from benchmarks.vault_stand_in import start_stand_in
+
+
+def time_calls(function, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def build_user():
+    user = User("benchmarkUser")
+    user.add_attribute(attribute="BenchmarkAttribute", value="benchmark value")
+    return user
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{label:<28} mean {statistics.mean(timings) * 1000:8.3f} ms   "
+          f"p50 {statistics.median(timings) * 1000:8.3f} ms   p99 {p99 * 1000:8.3f} ms")
+
+
+def run(base_url, api_key, iterations):
+    for label, keep_alive in (("unpooled", False), ("pooled", True)):
+        with ViziVault(base_url=base_url, api_key=api_key, encryption_key='', decryption_key='',
+                       keep_alive=keep_alive) as vault:
+            vault.store_attribute_definition(AttributeDefinition("BenchmarkAttribute"))
+            vault.save(build_user())
+
+            report(f"{label} find_by_user", time_calls(lambda: vault.find_by_user("benchmarkUser"), iterations))
+            # A new user each time, as saving a user without changes sends nothing
+            report(f"{label} save", time_calls(lambda: vault.save(build_user()), iterations))
+            vault.purge("benchmarkUser")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url')
+    parser.add_argument('--api-key', default='12345')
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    base_url = args.base_url
+    if base_url is None:
+        server, base_url = start_stand_in()
+    run(base_url, args.api_key, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
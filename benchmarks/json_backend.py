@@ -0,0 +1,51 @@
+"""
+    Measures decoding and encoding throughput of a large search results page with every JSON backend installed,
+    and checks that they all encode it to the same bytes. No vault is needed.
+
+    Usage:
+        python -m benchmarks.json_backend [--records N] [--iterations N]
+"""
+
+import argparse
+import time
+
+from vizivault import json_backend
+from vizivault.attribute_set import AttributeSet
+from vizivault.attribute import Attribute
+from benchmarks.search_frame import build_records
+
+
+def throughput(function, size, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return size * iterations / (time.perf_counter() - start) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=50000)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    records = list(build_records(args.records, args.records // 10))
+    attribute_set = AttributeSet([Attribute.from_json_dict(record) for record in records])
+    page = json_backend.dumps({"data": records})
+    print(f"Search page of {args.records} records, {len(page) / 2 ** 20:.1f} MiB")
+    print(f"{'backend':<8} {'decode page':>14} {'encode page':>14} {'encode AttributeSet':>20}")
+
+    encoded = {}
+    for name in json_backend.available_backends():
+        json_backend.set_backend(name)
+        assert json_backend.loads(page) == {"data": records}
+        encoded[name] = (json_backend.dumps({"data": records}), attribute_set.to_json_bytes())
+        decode = throughput(lambda: json_backend.loads(page), len(page), args.iterations)
+        encode = throughput(lambda: json_backend.dumps({"data": records}), len(page), args.iterations)
+        encode_models = throughput(attribute_set.to_json_bytes, len(encoded[name][1]), args.iterations)
+        print(f"{name:<8} {decode:9.1f} MiB/s {encode:9.1f} MiB/s {encode_models:15.1f} MiB/s")
+    json_backend.set_backend()
+    assert len(set(encoded.values())) == 1, "backends encoded the page differently"
+
+
+if __name__ == '__main__':
+    main()
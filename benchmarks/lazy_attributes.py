@@ -0,0 +1,70 @@
+"""
+    Compares building every Attribute of a user or a search page up front with building them lazily, by time to
+    the first attribute read and memory held afterwards. Records are generated locally in the shape the vault
+    returns them, so no vault is needed.
+
+    Usage:
+        python -m benchmarks.lazy_attributes [--attributes N] [--keys N]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from vizivault import User, Attribute, LazyAttributeList, json_backend
+
+
+def build_records(count, keys):
+    return [{"dataPointId": f"{index:024x}", "userId": "benchmarkUser", "attribute": f"Attribute{index % keys}",
+             "sensitivity": "Personal", "value": f"value{index}", "regulations": ["GDPR"], "tags": ["tag1"],
+             "createdDate": "2021-03-10T17:05:27.123+00:00", "modifiedDate": "2021-03-11T09:00:00+00:00"}
+            for index in range(count)]
+
+
+def measure(label, content, build, read):
+    # Decoding is the same either way and is left out; timed (best of 3) and traced separately, as tracing slows
+    # allocation
+    elapsed = None
+    for _ in range(3):
+        records = json_backend.loads(content)['data']
+        gc.collect()
+        start = time.perf_counter()
+        read(build(records))
+        elapsed = min(elapsed or float('inf'), time.perf_counter() - start)
+    records = json_backend.loads(content)['data']
+    gc.collect()
+    tracemalloc.start()
+    result = build(records)
+    del records
+    read(result)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<34} first read after {elapsed * 1000:7.1f} ms, {size / 2 ** 20:6.1f} MiB held")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attributes', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=2000)
+    args = parser.parse_args()
+
+    content = json_backend.dumps({"data": build_records(args.attributes, args.keys)})
+    print(f"User with {args.attributes} attributes over {args.keys} keys")
+    measure("eager User, get_attribute", content, lambda records: User("benchmarkUser", records),
+            lambda user: user.get_attribute("Attribute7"))
+    measure("lazy User, get_attribute", content, lambda records: User("benchmarkUser", records, lazy=True),
+            lambda user: user.get_attribute("Attribute7"))
+    measure("lazy User, get_attributes", content, lambda records: User("benchmarkUser", records, lazy=True),
+            lambda user: user.get_attributes())
+
+    print(f"Search page of {args.attributes} attributes")
+    measure("list of Attribute, first 10", content,
+            lambda records: [Attribute.from_json_dict(record) for record in records], lambda page: page[:10])
+    measure("LazyAttributeList, first 10", content, LazyAttributeList, lambda page: page[:10])
+    measure("LazyAttributeList, all", content, LazyAttributeList, lambda page: list(page))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+    Reports the memory each Attribute, Tag and search request value takes, for the slotted model classes and for
+    dict-based copies of the classes as they were before, and checks that both serialize identically. Field
+    values are shared with the source records and not counted, so the numbers are the per-object overhead.
+
+    Usage:
+        python -m benchmarks.model_memory [--count N]
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from vizivault import Attribute, Tag, SearchRequest
+from vizivault.json_object import JSONObject
+from benchmarks.search_frame import build_records
+
+
+class DictAttribute:
+    def __init__(self, data_point_id=None, userId=None, attribute=None, sensitivity=None, value=None, regulations=None,
+                 tags=None, created_date=None, modified_date=None):
+        self.default_encoder = JSONObject.MyJSONEncoder
+        self.dataPointId = data_point_id
+        self.userId = userId
+        self.attribute = attribute
+        self.sensitivity = sensitivity
+        self.value = value
+        self.regulations = regulations or []
+        self.tags = tags or []
+        self.createdDate = created_date
+        self.modifiedDate = modified_date
+
+
+class DictTag:
+    def __init__(self, name=None):
+        self.default_encoder = JSONObject.MyJSONEncoder
+        self.name = name
+        self.createdDate = None
+        self.modifiedDate = None
+
+
+class DictValueSearchRequest:
+    def __init__(self, attribute, value):
+        self.attribute = attribute
+        self.value = value
+
+
+def bytes_per_object(build, count):
+    gc.collect()
+    tracemalloc.start()
+    objects = [build(index) for index in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The list holding them is not part of the objects
+    return (size - 8 * count) / count, objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    records = list(build_records(args.count, args.count // 10))
+    fields = ('dataPointId', 'userId', 'attribute', 'sensitivity', 'value', 'regulations', 'tags', 'createdDate',
+              'modifiedDate')
+    values = [tuple(record[field] for field in fields) for record in records]
+    comparisons = (
+        ("Attribute", lambda index: DictAttribute(*values[index]), lambda index: Attribute(*values[index])),
+        ("Tag", lambda index: DictTag(values[index][0]), lambda index: Tag(values[index][0])),
+        ("SearchRequest value", lambda index: DictValueSearchRequest(*values[index][2:4]),
+         lambda index: SearchRequest.ValueSearchRequest(*values[index][2:4])),
+    )
+    print(f"{'model':<22} {'before':>12} {'after':>12}")
+    for label, before_build, after_build in comparisons:
+        before, before_objects = bytes_per_object(before_build, args.count)
+        after, after_objects = bytes_per_object(after_build, args.count)
+        for old, new in zip(before_objects[:1000], after_objects):
+            if isinstance(new, JSONObject):
+                assert JSONObject.to_json(old, JSONObject.MyJSONEncoder) == new.to_json()
+        print(f"{label:<22} {before:8.0f} B/obj {after:8.0f} B/obj")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+    Compares memory use and analytics speed of search results held as a list of Attribute objects and as a
+    SearchFrame. Records are generated locally in the shape the vault's search returns them, so no vault is needed.
+
+    Usage:
+        python -m benchmarks.search_frame [--records N] [--users N]
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from vizivault import Attribute, SearchFrame
+
+
+def build_records(count, users):
+    attributes = ["EyeColor", "Age", "ClientName", "BillingAddress", "LAST_NAME"]
+    for index in range(count):
+        yield {"dataPointId": f"{index:024x}", "userId": f"user{random.randrange(users)}",
+               "attribute": random.choice(attributes), "sensitivity": random.choice(["Personal", "Sensitive"]),
+               "value": f"value{random.randrange(1000)}", "regulations": random.sample(["GDPR", "CCPA"], 1),
+               "tags": random.sample(["tag1", "tag2", "tag3"], 2),
+               "createdDate": "2021-03-10T17:05:27.123+00:00", "modifiedDate": "2021-03-11T09:00:00+00:00"}
+
+
+def measure(label, build):
+    # Timed and traced separately, as tracing slows down allocation heavy code unevenly
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} built in {elapsed:6.2f}s, {size / 2 ** 20:8.1f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=500000)
+    parser.add_argument('--users', type=int, default=50000)
+    args = parser.parse_args()
+
+    records = list(build_records(args.records, args.users))
+    attributes = measure("Attributes", lambda: [Attribute.from_json_dict(record) for record in records])
+    frame = measure("SearchFrame", lambda: SearchFrame.from_records(records))
+
+    start = time.perf_counter()
+    counts = {}
+    for attribute in attributes:
+        if "tag1" in attribute.tags:
+            counts[attribute.attribute] = counts.get(attribute.attribute, 0) + 1
+    print(f"Attributes   tag filter + count by attribute {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    start = time.perf_counter()
+    frame_counts = frame.filter(tag="tag1").count_by("attribute")
+    print(f"SearchFrame  tag filter + count by attribute {(time.perf_counter() - start) * 1000:8.1f} ms")
+    assert frame_counts == counts
+
+
+if __name__ == '__main__':
+    main()
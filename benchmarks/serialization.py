@@ -0,0 +1,105 @@
+"""
+    Times to_json for the models sent to the vault: a single Attribute, a large AttributeSet, a SearchRequest with
+    many value queries and a Regulation with a nested rule tree. Each is encoded with the reflective encoder the
+    models used before field plans, and with the current encoder, pretty-printed and compact. No vault is needed.
+
+    Usage:
+        python -m benchmarks.serialization [--attributes N] [--iterations N]
+"""
+
+import argparse
+import datetime
+import json
+import re
+import time
+from enum import Enum
+from json import JSONEncoder
+
+from vizivault import Attribute, SearchRequest, Regulation, ConjunctiveRule, DisjunctiveRule, AttributeRule,\
+    AttributeListOperator, UserRule, UserValuePredicate, TagRule, TagListOperator
+from vizivault.attribute_set import AttributeSet
+from vizivault.json_object import slot_plan
+
+
+def instance_fields(obj) -> dict:
+    slots = slot_plan(type(obj))
+    fields = {} if slots is None else {name: getattr(obj, name) for name in slots[1]}
+    fields.update(getattr(obj, '__dict__', {}))
+    return fields
+
+
+class ReflectiveEncoder(JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, (datetime.date, datetime.datetime)):
+            return obj.isoformat
+        elif isinstance(obj, Enum):
+            return obj.value[0]
+        else:
+            d = {}
+            for key, value in instance_fields(obj).items():
+                if value is None:
+                    continue
+                elif key == "default_encoder":
+                    continue
+                else:
+                    d[re.sub(r'^_{1,2}\w+_{2,}', '', key)] = value
+            return d
+
+
+def build_attribute(index):
+    return Attribute(data_point_id=f"{index:024x}", userId="benchmarkUser", attribute="BenchmarkAddress",
+                     sensitivity="Personal", value={"street": f"{index} Main Street", "city": "Menlo Park"},
+                     regulations=["GDPR"], tags=["tag1", "tag2"], created_date="2021-03-10T17:05:27.123+00:00")
+
+
+def build_regulation(depth):
+    rule = ConjunctiveRule()
+    node = rule
+    for level in range(depth):
+        child = DisjunctiveRule("any")
+        child.add_rule(AttributeRule([f"Attribute{level}", "LAST_NAME"], AttributeListOperator.ANY))
+        child.add_rule(UserRule("GEOGRAPHIC_REGION", UserValuePredicate.EQUALS, f"Region{level}"))
+        child.add_rule(TagRule(["tag1"], TagListOperator.ALL))
+        node.add_rule(child)
+        node = child
+    return Regulation(name="Benchmark regulation", key="BENCHMARK", url="https://example.com", rule=rule)
+
+
+def timed(encode, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        encode()
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attributes', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    search_request = SearchRequest()
+    for index in range(200):
+        search_request.add_value_query(f"Attribute{index % 10}", f"value{index}")
+    search_request.attributes = [f"Attribute{index}" for index in range(10)]
+    search_request.regulations = ["GDPR", "CCPA"]
+    models = (("Attribute", build_attribute(0), args.iterations * 1000),
+              (f"AttributeSet of {args.attributes}", AttributeSet([build_attribute(index)
+                                                                  for index in range(args.attributes)]),
+               args.iterations),
+              ("SearchRequest of 200 values", search_request, args.iterations * 50),
+              ("Regulation, 20 nested rules", build_regulation(20), args.iterations * 200))
+
+    print(f"{'model':<28} {'reflective':>12} {'pretty':>12} {'compact':>12}")
+    for label, model, iterations in models:
+        # Same document either way, only the layout differs
+        assert json.loads(model.to_json(ReflectiveEncoder)) == json.loads(model.to_json(compact=True))
+        assert model.to_json(ReflectiveEncoder) == model.to_json()
+        reflective = timed(lambda: model.to_json(ReflectiveEncoder), iterations)
+        pretty = timed(lambda: model.to_json(), iterations)
+        compact = timed(lambda: model.to_json(compact=True), iterations)
+        print(f"{label:<28} {reflective * 1e6:10.1f}us {pretty * 1e6:10.1f}us {compact * 1e6:10.1f}us")
+
+
+if __name__ == '__main__':
+    main()
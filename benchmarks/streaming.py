@@ -0,0 +1,71 @@
+"""
+    Measures peak memory and time to the first attribute when reading a user with many attributes with
+    find_by_user, which reads the whole response before building the user, and with stream_user_attributes, which
+    builds each attribute as it is read.
+
+    Usage:
+        python -m benchmarks.streaming [--attributes N] [--chunk-size BYTES]
+
+    Peak memory is measured with tracemalloc over the whole read, including the response body. The stand-in vault
+    runs in the same process, so the memory it takes to build the response is counted for both.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from vizivault import ViziVault, AttributeDefinition
+from benchmarks.compression import build_user
+from benchmarks.vault_stand_in import start_stand_in
+
+
+def measure(read):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first, count = read(start)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, first, elapsed, peak
+
+
+def run(base_url, attributes, chunk_size):
+    with ViziVault(base_url=base_url, api_key='12345', encryption_key='', decryption_key='',
+                   accept_encoding='identity') as vault:
+        definition = AttributeDefinition("BenchmarkAddress")
+        definition.repeatable = True
+        vault.store_attribute_definition(definition)
+        user = build_user("benchmarkUser", attributes)
+        vault.save(user)
+
+        def read_whole(start):
+            attributes_read = vault.find_by_user(user.id).get_attributes()
+            return time.perf_counter() - start, len(attributes_read)
+
+        def read_streamed(start):
+            first, count = None, 0
+            for _ in vault.stream_user_attributes(user.id, chunk_size=chunk_size):
+                if first is None:
+                    first = time.perf_counter() - start
+                count += 1
+            return first, count
+
+        for label, read in (("find_by_user", read_whole), ("stream_user_attributes", read_streamed)):
+            count, first, elapsed, peak = measure(read)
+            print(f"{label:<24} {count} attributes in {elapsed * 1000:9.2f} ms, first after {first * 1000:9.2f} ms, "
+                  f"peak memory {peak / 2 ** 20:8.2f} MiB")
+        vault.purge(user.id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attributes', type=int, default=20000)
+    parser.add_argument('--chunk-size', type=int, default=65536)
+    args = parser.parse_args()
+
+    server, base_url = start_stand_in()
+    run(base_url, args.attributes, args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
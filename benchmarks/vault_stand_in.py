@@ -0,0 +1,347 @@
+"""
+    A small in-memory stand-in for the ViziVault REST API.
+
+    It implements enough of the vault's endpoints to exercise the client end to end (attribute definitions, tags,
+    regulations, users/entities, data points and search) on a local socket, so that the benchmarks in this
+    directory can run without a real vault. It is not a faithful re-implementation of the server: there is no
+    encryption, no authentication and no persistence.
+
+    Request bodies sent with Content-Encoding gzip or deflate are accepted, and responses of at least
+    COMPRESSION_THRESHOLD bytes are gzipped for clients that accept it. Body bytes in both directions are counted in
+    VaultState.bytes_received / bytes_sent, and --bandwidth simulates a slow link by delaying each body
+    by its size.
+
+    Usage:
+        python -m benchmarks.vault_stand_in --port 8083
+"""
+
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class VaultState:
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.definitions = {}
+        self.tags = {}
+        self.regulations = {}
+        self.entities = {}
+        self.data_points = {}
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    def count_bytes(self, received=0, sent=0):
+        with self.lock:
+            self.bytes_received += received
+            self.bytes_sent += sent
+
+    @staticmethod
+    def now():
+        return datetime.datetime.utcnow().isoformat()
+
+    def register_tag(self, name):
+        if name not in self.tags:
+            now = self.now()
+            self.tags[name] = {"name": name, "createdDate": now, "modifiedDate": now}
+
+    def store_attributes(self, entity_id, attributes):
+        with self.lock:
+            for attribute in attributes:
+                if attribute.get('attribute') not in self.definitions:
+                    raise StandInError(400, f"Attribute {attribute.get('attribute')} is not defined")
+            entity = self.entities.setdefault(entity_id, {"id": entity_id, "tags": []})
+            for attribute in attributes:
+                key = attribute['attribute']
+                definition = self.definitions[key]
+                if not definition.get('repeatable'):
+                    for data_point_id in [data_point_id for data_point_id, data_point in self.data_points.items()
+                                          if data_point['userId'] == entity_id and data_point['attribute'] == key]:
+                        del self.data_points[data_point_id]
+                tags = sorted(set(definition.get('tags') or []) | set(entity['tags']) |
+                              set(attribute.get('tags') or []))
+                for tag in tags:
+                    self.register_tag(tag)
+                now = self.now()
+                data_point_id = str(uuid.uuid4())
+                self.data_points[data_point_id] = {
+                    "dataPointId": data_point_id,
+                    "userId": entity_id,
+                    "attribute": key,
+                    "sensitivity": attribute.get('sensitivity'),
+                    "value": attribute.get('value'),
+                    "regulations": attribute.get('regulations') or [],
+                    "tags": tags,
+                    "createdDate": now,
+                    "modifiedDate": now,
+                }
+
+    def entity_data(self, entity_id, key=None):
+        with self.lock:
+            if entity_id not in self.entities:
+                raise StandInError(404, f"Entity {entity_id} not found")
+            return [data_point for data_point in self.data_points.values()
+                    if data_point['userId'] == entity_id and (key is None or data_point['attribute'] == key)]
+
+    def delete_data(self, entity_id, key=None):
+        with self.lock:
+            for data_point_id in [data_point_id for data_point_id, data_point in self.data_points.items()
+                                  if data_point['userId'] == entity_id and
+                                  (key is None or data_point['attribute'] == key)]:
+                del self.data_points[data_point_id]
+
+    def search(self, query, page, count):
+        with self.lock:
+            values = query.get('values') or []
+            value_keys = {value['attribute'] for value in values}
+            requested_keys = value_keys | set(query.get('attributes') or [])
+            users = {data_point['userId'] for data_point in self.data_points.values()
+                     if not values or any(data_point['attribute'] == value['attribute'] and
+                                          data_point['value'] == value['value'] for value in values)}
+            regulations = set(query.get('regulations') or [])
+            results = [data_point for data_point in self.data_points.values()
+                       if data_point['userId'] in users and
+                       (not requested_keys or data_point['attribute'] in requested_keys) and
+                       (not regulations or regulations & set(data_point['regulations'])) and
+                       (query.get('userId') is None or data_point['userId'] == query['userId'])]
+            results.sort(key=lambda data_point: (data_point['userId'], data_point['createdDate'],
+                                                 data_point['dataPointId']))
+            return results[page * count:(page + 1) * count]
+
+
+class StandInError(Exception):
+
+    def __init__(self, status, message):
+        self.status = status
+        self.message = message
+        Exception.__init__(self, message)
+
+
+class VaultRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state = None
+    bandwidth = None
+    COMPRESSION_THRESHOLD = 1024
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.__dispatch('GET')
+
+    def do_POST(self):
+        self.__dispatch('POST')
+
+    def do_DELETE(self):
+        self.__dispatch('DELETE')
+
+    def __dispatch(self, method):
+        body = self.read_body()
+        try:
+            for pattern, handler_method, handler in self.routes:
+                match = re.fullmatch(pattern, self.path)
+                if match and handler_method == method:
+                    self.send_json(200, {"data": handler(self, body, *match.groups())})
+                    return
+            raise StandInError(404, f"No route for {method} {self.path}")
+        except StandInError as e:
+            self.send_json(e.status, {"message": e.message})
+
+    def simulate_link(self, size):
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return None
+        content = self.rfile.read(length)
+        self.state.count_bytes(received=length)
+        self.simulate_link(length)
+        encoding = self.headers.get('Content-Encoding')
+        if encoding == 'gzip':
+            content = gzip.decompress(content)
+        elif encoding == 'deflate':
+            content = zlib.decompress(content)
+        return json.loads(content)
+
+    def send_json(self, status, payload):
+        content = json.dumps(payload).encode('utf-8')
+        etag = None
+        if self.command == 'GET' and status == 200:
+            etag = '"' + hashlib.sha1(content).hexdigest() + '"'
+            if etag in self.headers.get('If-None-Match', ''):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        compress = len(content) >= self.COMPRESSION_THRESHOLD and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if compress:
+            content = gzip.compress(content, compresslevel=6)
+        self.state.count_bytes(sent=len(content))
+        self.simulate_link(len(content))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def store_definition(self, body):
+        with self.state.lock:
+            now = self.state.now()
+            previous = self.state.definitions.get(body['key'], {})
+            body.setdefault('hint', None)
+            body.setdefault('repeatable', False)
+            body.setdefault('indexed', False)
+            body.setdefault('tags', [])
+            body['createdDate'] = previous.get('createdDate', now)
+            body['modifiedDate'] = now
+            self.state.definitions[body['key']] = body
+
+    def get_definition(self, body, key):
+        with self.state.lock:
+            if key not in self.state.definitions:
+                raise StandInError(404, f"Attribute {key} not found")
+            return self.state.definitions[key]
+
+    def delete_definition(self, body, key):
+        with self.state.lock:
+            if self.state.definitions.pop(key, None) is None:
+                raise StandInError(404, f"Attribute {key} not found")
+
+    def store_tag(self, body):
+        with self.state.lock:
+            self.state.register_tag(body['name'])
+
+    def get_tag(self, body, name):
+        with self.state.lock:
+            if name not in self.state.tags:
+                raise StandInError(404, f"Tag {name} not found")
+            return self.state.tags[name]
+
+    def delete_tag(self, body, name):
+        with self.state.lock:
+            if self.state.tags.pop(name, None) is None:
+                raise StandInError(404, f"Tag {name} not found")
+
+    def store_regulation(self, body):
+        with self.state.lock:
+            now = self.state.now()
+            previous = self.state.regulations.get(body['key'], {})
+            body.setdefault('url', None)
+            body['createdDate'] = previous.get('createdDate', now)
+            body['modifiedDate'] = now
+            self.state.regulations[body['key']] = body
+
+    def get_regulation(self, body, key):
+        with self.state.lock:
+            if key not in self.state.regulations:
+                raise StandInError(404, f"Regulation {key} not found")
+            return self.state.regulations[key]
+
+    def delete_regulation(self, body, key):
+        with self.state.lock:
+            if self.state.regulations.pop(key, None) is None:
+                raise StandInError(404, f"Regulation {key} not found")
+
+    def store_entity(self, body):
+        with self.state.lock:
+            self.state.entities[body['id']] = {"id": body['id'], "tags": body.get('tags') or []}
+
+    def get_data_point(self, body, data_point_id):
+        with self.state.lock:
+            if data_point_id not in self.state.data_points:
+                raise StandInError(404, f"Data point {data_point_id} not found")
+            return self.state.data_points[data_point_id]
+
+    def delete_data_point(self, body, data_point_id):
+        with self.state.lock:
+            if self.state.data_points.pop(data_point_id, None) is None:
+                raise StandInError(404, f"Data point {data_point_id} not found")
+
+    routes = [
+        (r"/attributes/?", 'GET', lambda self, body: list(self.state.definitions.values())),
+        (r"/attributes", 'POST', lambda self, body: self.store_definition(body)),
+        (r"/attributes/([^/]+)", 'GET', get_definition),
+        (r"/attributes/([^/]+)", 'DELETE', delete_definition),
+        (r"/tags/?", 'GET', lambda self, body: list(self.state.tags.values())),
+        (r"/tags", 'POST', lambda self, body: self.store_tag(body)),
+        (r"/tags/([^/]+)", 'GET', get_tag),
+        (r"/tags/([^/]+)", 'DELETE', delete_tag),
+        (r"/regulations/?", 'GET', lambda self, body: list(self.state.regulations.values())),
+        (r"/regulations", 'POST', lambda self, body: self.store_regulation(body)),
+        (r"/regulations/([^/]+)", 'GET', get_regulation),
+        (r"/regulations/([^/]+)", 'DELETE', delete_regulation),
+        (r"/(?:users|entities)", 'POST', lambda self, body: self.store_entity(body)),
+        (r"/(?:users|entities)/([^/]+)/attributes", 'GET',
+         lambda self, body, entity_id: self.state.entity_data(entity_id)),
+        (r"/(?:users|entities)/([^/]+)/attributes", 'POST',
+         lambda self, body, entity_id: self.state.store_attributes(entity_id, body['data'])),
+        (r"/(?:users|entities)/([^/]+)/attributes/([^/]+)", 'GET',
+         lambda self, body, entity_id, key: self.state.entity_data(entity_id, key)),
+        (r"/(?:users|entities)/([^/]+)/attributes/([^/]+)", 'DELETE',
+         lambda self, body, entity_id, key: self.state.delete_data(entity_id, key)),
+        (r"/(?:users|entities)/([^/]+)/data", 'DELETE',
+         lambda self, body, entity_id: self.state.delete_data(entity_id)),
+        (r"/data/([^/]+)", 'GET', get_data_point),
+        (r"/data/([^/]+)", 'DELETE', delete_data_point),
+        (r"/search/?", 'POST',
+         lambda self, body: self.state.search(body['query'], body['page'], body['count'])),
+    ]
+
+
+def create_server(host='127.0.0.1', port=0, bandwidth=None):
+    """
+    :param host: str
+    :param port: int - 0 picks a free port
+    :param bandwidth: float - simulated link speed in bytes per second, None for no limit
+    :return: ThreadingHTTPServer; its VaultState is server.RequestHandlerClass.state
+    """
+    handler = type('BoundVaultRequestHandler', (VaultRequestHandler,), {'state': VaultState(),
+                                                                        'bandwidth': bandwidth})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_stand_in(host='127.0.0.1', port=0, bandwidth=None):
+    """
+    Starts a stand-in vault on a background thread.
+
+    :return: (ThreadingHTTPServer, base_url)
+    """
+    server = create_server(host, port, bandwidth)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory stand-in for the ViziVault REST API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8083)
+    parser.add_argument('--bandwidth', type=float, help="simulated link speed in bytes per second")
+    args = parser.parse_args()
+    server = create_server(args.host, args.port, args.bandwidth)
+    print(f"Stand-in vault listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
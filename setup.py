@@ -24,6 +24,12 @@ REQUIRES = [
     "requests>=2.24.0"
 ]
 
+EXTRAS_REQUIRE = {
+    "async": ["aiohttp>=3.7.0"],
+    "analytics": ["numpy>=1.17", "pandas>=1.0"],
+    "fast": ["orjson>=3.0"],
+}
+
 
 setup(
     name=NAME,
@@ -33,7 +39,8 @@ setup(
     url="",
     keywords=["Nox API"],
     install_requires=REQUIRES,
-    packages=find_packages(),
+    extras_require=EXTRAS_REQUIRE,
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     include_package_data=True,
     long_description="""\
     A service for securely and safely managing user data  # noqa: E501
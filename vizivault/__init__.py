@@ -1,4 +1,5 @@
 from vizivault.vizivault import ViziVault
+from vizivault.async_vizivault import AsyncViziVault
 from vizivault.json_object import JSONObject
 from vizivault.user import User
 from vizivault.attribute_definition import AttributeDefinition
@@ -9,6 +10,22 @@ from vizivault.tag import Tag
 from vizivault.attribute import Attribute
 from vizivault.vault_response_excption import VaultResponseException
 from vizivault.vault_communication_exception import VaultCommunicationException
+from vizivault.vault_circuit_open_exception import VaultCircuitOpenException
+from vizivault.vault_deadline_exceeded_exception import VaultDeadlineExceededException
+from vizivault.retry_policy import RetryPolicy
+from vizivault.circuit_breaker import CircuitBreaker
+from vizivault.circuit_breaker import CircuitState
+from vizivault.hedging_policy import HedgingPolicy
+from vizivault.concurrency_limiter import AdaptiveConcurrencyLimiter
+from vizivault.token_bucket import TokenBucket
+from vizivault.bulk import BulkResult
+from vizivault.search_cache import SearchCache
+from vizivault.search_frame import SearchFrame
+from vizivault.search_planner import SearchPlanner
+from vizivault.metadata_catalog import MetadataCatalog
+from vizivault.entity_cache import EntityCache
+from vizivault.metadata_snapshot import MetadataSnapshot
+from vizivault.lazy_attributes import LazyAttributeList
 from vizivault.rules.conjunctive_rule import ConjunctiveRule
 from vizivault.rules.disjunctive_rule import DisjunctiveRule
 from vizivault.rules.attribute_rule import AttributeRule
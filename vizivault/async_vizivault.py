@@ -0,0 +1,413 @@
+import os
+import asyncio
+import time
+from typing import List
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from vizivault import json_backend
+from vizivault.entity import Entity
+from vizivault.user import User
+from vizivault.vault_response_excption import VaultResponseException
+from vizivault.vault_communication_exception import VaultCommunicationException
+from vizivault.attribute import Attribute
+from vizivault.tag import Tag
+from vizivault.regulation import Regulation
+from vizivault.search_request import SearchRequest
+from vizivault.entity_definition import EntityDefinition
+from vizivault.attribute_definition import AttributeDefinition
+from vizivault.attribute_set import AttributeSet
+from vizivault.retry_policy import RetryPolicy
+from vizivault.circuit_breaker import CircuitBreaker
+from vizivault.compression import compress_body, SUPPORTED_ENCODINGS
+
+
+class AsyncViziVault:
+    """
+    asyncio counterpart of ViziVault. Every vault call is a coroutine, so thousands of them can be in flight
+    on a single event loop. Requires the optional aiohttp dependency (pip install vizivault[async]).
+    """
+
+    def __init__(self, base_url: str, api_key: str, encryption_key: str = None, decryption_key: str = None,
+                 pool_maxsize: int = 100, pool_maxsize_per_host: int = 0, keep_alive: bool = True,
+                 retry_policy: RetryPolicy = None, circuit_breaker: CircuitBreaker = None,
+                 timeout=(10.0, 60.0), compress_requests_above: int = None, request_compression: str = 'gzip',
+                 accept_encoding: str = 'gzip, deflate'):
+        """
+        :param base_url: str - address of the vault server, e.g. https://my.host:8080
+        :param api_key: str - api key (application key) of your application
+        :param encryption_key: str - defaults to the VV_ENCRYPT_KEY environment variable
+        :param decryption_key: str - defaults to the VV_DECRYPT_KEY environment variable
+        :param pool_maxsize: int - maximum number of simultaneous connections, 0 for no limit
+        :param pool_maxsize_per_host: int - maximum number of simultaneous connections to one host, 0 for no limit
+        :param keep_alive: bool - reuse connections between calls; False opens a new connection for every request
+        :param retry_policy: RetryPolicy - when and how failed calls are retried, defaults to RetryPolicy();
+            RetryPolicy(max_attempts=1) disables retries
+        :param circuit_breaker: CircuitBreaker - fail fast while the vault is unhealthy; None disables it
+        :param timeout: (float, float) - connect and read timeouts in seconds for every request; None waits forever
+        :param compress_requests_above: int - compress request bodies of at least this many bytes; None never does
+        :param request_compression: str - 'gzip' or 'deflate'
+        :param accept_encoding: str - response encodings offered to the vault; 'identity' asks for uncompressed data
+        """
+        if aiohttp is None:
+            raise ImportError('AsyncViziVault requires aiohttp; install it with "pip install vizivault[async]"')
+        if request_compression not in SUPPORTED_ENCODINGS:
+            raise ValueError(f'Unsupported request compression {request_compression!r}, '
+                             f'expected one of {SUPPORTED_ENCODINGS}')
+        self.content_type = "application/json"
+        self.base_url = base_url
+        self.encryption_key = encryption_key or os.environ.get('VV_ENCRYPT_KEY', None)
+        self.decryption_key = decryption_key or os.environ.get('VV_DECRYPT_KEY', None)
+        self.set_api_key(api_key)
+
+        self.pool_maxsize = pool_maxsize
+        self.pool_maxsize_per_host = pool_maxsize_per_host
+        self.keep_alive = keep_alive
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.timeout = timeout
+        self.compress_requests_above = compress_requests_above
+        self.request_compression = request_compression
+        self.accept_encoding = accept_encoding
+        self.__session = None
+
+    def set_api_key(self, api_key: str) -> str:
+        self.api_key = 'Bearer ' + api_key
+        return self.api_key
+
+    @property
+    def session(self):
+        # The aiohttp session has to be created inside a running event loop, so it is opened on first use
+        if self.__session is None or self.__session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize, limit_per_host=self.pool_maxsize_per_host,
+                                             force_close=not self.keep_alive)
+            connect_timeout, read_timeout = self.timeout or (None, None)
+            timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+            self.__session = aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                                   headers={"Accept-Encoding": self.accept_encoding})
+        return self.__session
+
+    async def close(self):
+        """
+        Closes all pooled connections held by this client.
+        """
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def __get_with_decryption_key(self, url_suffix) -> bytes:
+        headers = {"X-Decryption-Key": self.decryption_key}
+        return await self.__get(url_suffix=url_suffix, headers=headers)
+
+    async def __post_with_encryption_key(self, url_suffix, body) -> bytes:
+        headers = {"X-Encryption-Key": self.encryption_key, "Content-Type": self.content_type}
+        return await self.__post(url_suffix=url_suffix, body=body, headers=headers)
+
+    async def __post(self, url_suffix, body, headers=None, idempotent=False) -> bytes:
+        headers = headers or {"Content-Type": self.content_type, "Authorization": self.api_key}
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        elif not isinstance(body, bytes):
+            body = json_backend.dumps(body)
+        if self.compress_requests_above is not None and len(body) >= self.compress_requests_above:
+            body = compress_body(body, self.request_compression)
+            headers = dict(headers, **{"Content-Encoding": self.request_compression})
+        return await self.__request('POST', url_suffix, headers=headers, idempotent=idempotent, data=body)
+
+    async def __get(self, url_suffix, headers=None) -> bytes:
+        headers = headers or {"Authorization": self.api_key}
+        return await self.__request('GET', url_suffix, headers=headers)
+
+    async def __delete(self, url_suffix) -> bytes:
+        headers = {"Authorization": self.api_key}
+        return await self.__request('DELETE', url_suffix, headers=headers)
+
+    async def __request(self, method, url_suffix, headers, idempotent=None, data=None) -> bytes:
+        if idempotent is None:
+            idempotent = RetryPolicy.is_idempotent(method)
+        attempt = 0
+        while True:
+            trial = self.circuit_breaker.before_request() if self.circuit_breaker is not None else False
+            attempt += 1
+            try:
+                async with self.session.request(method, self.base_url + url_suffix, headers=headers,
+                                                data=data) as response:
+                    status = response.status
+                    retry_after = response.headers.get('Retry-After')
+                    content = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.__record_outcome(failed=True)
+                if self.retry_policy is not None and self.retry_policy.should_retry(attempt, idempotent):
+                    await asyncio.sleep(self.retry_policy.backoff(attempt))
+                    continue
+                raise VaultCommunicationException from e
+            except BaseException:
+                # Nothing was learned about the vault, e.g. the call was cancelled
+                if trial:
+                    self.circuit_breaker.release_trial()
+                raise
+
+            self.__record_outcome(failed=status == 429 or status >= 500)
+            if status < 400:
+                return content
+            if self.retry_policy is not None and self.retry_policy.should_retry(
+                    attempt, idempotent, status=status, retry_after=retry_after):
+                await asyncio.sleep(self.retry_policy.backoff(attempt, retry_after=retry_after))
+                continue
+            raise VaultResponseException.from_content(content=content, status=status)
+
+    def __record_outcome(self, failed):
+        if self.circuit_breaker is None:
+            return
+        if failed:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+
+    async def find_by_entity(self, entity_id: str) -> Entity:
+        """
+        Retrieves all attributes for an entity with the specified ID, as well as entity-level metadata.
+        :param entity_id: str
+        :return: Entity
+        """
+        data = json_backend.loads(await self.__get_with_decryption_key(f"/entities/{entity_id}/attributes"))['data']
+        return Entity(entity_id=entity_id, data=data)
+
+    async def find_by_user(self, entity_id: str) -> User:
+        """
+        Retrieves all attributes for a user with the specified ID, as well as user-level metadata.
+        :param entity_id: str
+        :return: User
+        """
+        data = json_backend.loads(await self.__get_with_decryption_key(f"/users/{entity_id}/attributes"))['data']
+        return User(entity_id=entity_id, data=data)
+
+    async def get_user_attribute(self, user_id: str, attribute_key: str) -> List:
+        """
+        Retrieves attribute for a user with the specified ID and name
+        :param user_id: str
+        :param attribute_key: str
+        :return: Attribute
+        """
+        data = await self.__get_with_decryption_key(f"/users/{user_id}/attributes/{attribute_key}")
+        return Attribute.from_json(data)
+
+    async def save(self, entity: Entity, timings: bool = False):
+        """
+        Updates a user or entity to match changes that have been made client-side,
+        by deleting or creating attributes in the vault as necessary.
+
+        As with ViziVault.save, only requests with something to write are sent, and attribute deletions are sent
+        concurrently with each other and with the entity definition.
+
+        :param entity: Entity
+        :param timings: bool - return how long each request took
+        :return: dict - seconds taken by each request sent, by method and path, if timings is set
+        """
+        if not isinstance(entity, Entity):
+            raise TypeError(
+                'Argument entity is not of type Entity'
+            )
+        deleted_attributes = entity.deleted_attributes
+        changed_attributes = entity.changed_attributes
+        definition = entity.definition_snapshot() if entity.definition_changed else None
+        request_timings = {}
+
+        async def timed(label, request):
+            start = time.monotonic()
+            try:
+                await request
+            finally:
+                request_timings[label] = time.monotonic() - start
+
+        first = [timed(f"DELETE /users/{entity.id}/attributes/{attribute}",
+                       self.__delete(f"/users/{entity.id}/attributes/{attribute}"))
+                 for attribute in deleted_attributes]
+        if definition is not None:
+            entity_definition = json_backend.dumps(EntityDefinition(entity), default=lambda o: o.__dict__)
+            url_suffix = "/users" if isinstance(entity, User) else "/entities"
+            first.append(timed(f"POST {url_suffix}", self.__post(url_suffix, entity_definition)))
+        outcomes = await asyncio.gather(*first, return_exceptions=True)
+        entity.clear_pending_changes(
+            deleted_attributes=[attribute for attribute, outcome in zip(deleted_attributes, outcomes)
+                                if not isinstance(outcome, BaseException)],
+            definition=definition if definition is not None and not isinstance(outcomes[-1], BaseException) else None)
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException):
+                raise outcome
+        if changed_attributes:
+            storage_request = AttributeSet(changed_attributes).to_json_bytes()
+            url_suffix = f"/users/{entity.id}/attributes"
+            await timed(f"POST {url_suffix}", self.__post_with_encryption_key(url_suffix, storage_request))
+            entity.clear_pending_changes(changed_attributes=changed_attributes)
+        return request_timings if timings else None
+
+    async def purge(self, entity_id: str):
+        """
+        Deletes all attributes of a user/entity
+        :param entity_id: str
+        """
+        await self.__delete(f"/users/{entity_id}/data")
+
+    async def store_attribute_definition(self, attribute_definition: AttributeDefinition):
+        """
+        Creates or updates an attribute definition.
+
+        :param attribute_definition: AttributeDefinition
+        """
+        if not isinstance(attribute_definition, AttributeDefinition):
+            raise TypeError(
+                'Argument attribute_definition is not of type Attribute Definition'
+            )
+        await self.__post("/attributes", attribute_definition.to_json_bytes())
+
+    async def get_attribute_definition(self, attribute_key: str) -> AttributeDefinition:
+        """
+        Gets an attribute definition with the specified name
+
+        :param attribute_key:
+        :return: AttributeDefinition
+        """
+        return AttributeDefinition.from_json(await self.__get_with_decryption_key(f"/attributes/{attribute_key}"))
+
+    async def get_attribute_definitions(self) -> List[AttributeDefinition]:
+        """
+        Lists all attribute definitions in the vault
+        :rtype list[AttributeDefinition]
+        :return: list of all attribute definition in the vault
+        """
+        return AttributeDefinition.from_json(await self.__get_with_decryption_key("/attributes"))
+
+    async def delete_attribute_definition(self, attribute_key: str) -> bytes:
+        """
+        Deletes an attribute definition with the specified name, unless it is in use
+
+        :param attribute_key:
+        :return: bytes (http response body)
+        """
+        return await self.__delete(f"/attributes/{attribute_key}")
+
+    async def store_tag(self, tag: Tag):
+        """
+        Creates or updates a tag
+
+        :param tag: Tag
+        """
+        if not isinstance(tag, Tag):
+            raise TypeError(
+                'Argument tag is not of type Tag'
+            )
+        await self.__post("/tags", tag.to_json_bytes())
+
+    async def get_tag(self, name: str) -> Tag:
+        """
+        Get a Tag
+        :param name: primary key for tag
+        :return: Tag
+        :rtype: Tag
+        """
+        return Tag.from_json(await self.__get(f'/tags/{name}'))
+
+    async def get_tags(self) -> List[Tag]:
+        """
+        List all tags in vault
+        :rtype list[Tag]
+        :return: list of all tags in vault
+        """
+        return Tag.from_json(await self.__get_with_decryption_key('/tags/'))
+
+    async def delete_tag(self, tag: str) -> bool:
+        """
+        Deletes a tag. This will remove all tag from the vault
+
+        :rtype: bool
+        :param tag: str
+        :return: true/false if delete was successful
+        """
+        try:
+            await self.__delete(f"/tags/{tag}")
+            return True
+        except VaultResponseException:
+            return False
+
+    async def store_regulation(self, regulation: Regulation):
+        """
+        Creates or updates a regulation
+        :param regulation: Regulation object
+        """
+        if not isinstance(regulation, Regulation):
+            raise TypeError('Argument regulation is not of type Regulation')
+        await self.__post("/regulations", regulation.to_json_bytes())
+
+    async def get_regulations(self) -> List[Regulation]:
+        """
+        Lists all regulations in the vault
+
+        :rtype: list[Regulations]
+        :return: list of all regulations in the vault
+        """
+        return Regulation.from_json(await self.__get_with_decryption_key('/regulations/'))
+
+    async def get_regulation(self, key: str) -> Regulation:
+        """
+        Get a regulation with the specified key
+
+        :rtype: Regulation
+        :param key: primary key value of regulation
+        :return: Regulation
+        """
+        return Regulation.from_json(await self.__get_with_decryption_key(f'/regulations/{key}'))
+
+    async def delete_regulation(self, regulation) -> bool:
+        """
+        Deletes a regulation
+
+        :rtype: bool
+        :param regulation: regulation object
+        :return: True/False
+        """
+        try:
+            await self.__delete(f"/regulations/{regulation}")
+            return True
+        except VaultResponseException:
+            return False
+
+    async def search(self, search_request: SearchRequest, page: int, count: int) -> List[Attribute]:
+        """
+
+        :rtype: List[Attribute]
+        :param search_request: SearchRequest
+        :param page: (int) - THe page offset of search results
+        :param count: (int) - The number of attributes in a result
+        :return: List of attributes found in search
+        """
+        if not isinstance(search_request, SearchRequest):
+            raise TypeError('Argument search_request is not of type SearchRequest')
+        query = search_request.to_json_bytes()
+        paginated_search_request = b'{"query":%s,"page":%d,"count":%d}' % (query, page, count)
+        return Attribute.from_json(await self.__post("/search/", paginated_search_request, idempotent=True))
+
+    async def get_data_point(self, data_point_id: str) -> Attribute:
+        """
+
+        :rtype: Attribute
+        :param data_point_id: (str) unique id of attribute (datapoint id)
+        :return: Attribute with the desired datapoint id
+        """
+        return Attribute.from_json(await self.__get_with_decryption_key(f"/data/{data_point_id}"))
+
+    async def delete_data_point(self, data_point_id: str):
+        """
+
+        :param data_point_id: (str) unique id of attribute (datapoint id)
+        """
+        await self.__delete(f"/data/{data_point_id}")
@@ -2,6 +2,8 @@ from vizivault.json_object import JSONObject
 
 
 class Attribute(JSONObject):
+    __slots__ = ('dataPointId', 'userId', 'attribute', 'sensitivity', 'value', 'regulations', 'tags', 'createdDate',
+                 'modifiedDate')
 
     def __init__(self, data_point_id=None, userId=None, attribute=None, sensitivity=None, value=None, regulations=None,
                  tags=None, created_date=None, modified_date=None):
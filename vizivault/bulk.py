@@ -0,0 +1,83 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from vizivault.vault_response_excption import VaultResponseException
+
+
+class BulkResult:
+    """
+    Outcome of one item of a bulk operation: either a value or the exception the item failed with.
+    """
+
+    def __init__(self, item, value=None, error: Exception = None):
+        self.item = item
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def missing(self) -> bool:
+        """
+        True if the item failed because the vault does not know it
+        """
+        return isinstance(self.error, VaultResponseException) and self.error.code == 404
+
+    def __repr__(self):
+        outcome = f'error={self.error!r}' if self.error is not None else f'value={self.value!r}'
+        return f'BulkResult(item={self.item!r}, {outcome})'
+
+
+def _run(function, item) -> BulkResult:
+    try:
+        return BulkResult(item, value=function(item))
+    except Exception as e:
+        return BulkResult(item, error=e)
+
+
+def bounded_map(function, items, max_workers: int = 8, ordered: bool = False, max_pending: int = None):
+    """
+    Applies `function` to every item on a pool of threads and yields a BulkResult per item. The items are
+    consumed lazily and at most `max_pending` of them are in flight at once, so memory stays bounded however
+    long the input is. A failing item is reported in its BulkResult and does not stop the others.
+
+    :param function: callable taking one item
+    :param items: iterable
+    :param max_workers: int - number of threads
+    :param ordered: bool - yield results in input order instead of as they complete
+    :param max_pending: int - items submitted but not yet yielded, defaults to twice max_workers
+    :return: generator of BulkResult
+    """
+    max_pending = max_pending or 2 * max_workers
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque() if ordered else set()
+    try:
+        for item in items:
+            if len(pending) >= max_pending:
+                if ordered:
+                    yield pending.popleft().result()
+                else:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            future = executor.submit(_run, function, item)
+            if ordered:
+                pending.append(future)
+            else:
+                pending.add(future)
+
+        if ordered:
+            while pending:
+                yield pending.popleft().result()
+        else:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    finally:
+        # Also reached when the caller stops iterating early; items not started yet are dropped
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
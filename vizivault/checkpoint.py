@@ -0,0 +1,87 @@
+import os
+import threading
+
+
+class CheckpointLog:
+    """
+    Append-only log of completed work items, one per line, so that an interrupted job can skip them on restart.
+
+    Every entry is flushed to the operating system as soon as it is recorded, which survives the process dying;
+    every sync_every entries the file is also fsynced, which bounds what a machine crash can lose. A last line
+    cut short by a crash is ignored.
+    """
+
+    def __init__(self, path: str, sync_every: int = 1000):
+        """
+        :param path: str - file to append to; it is created if it does not exist
+        :param sync_every: int - entries between fsyncs
+        """
+        self.path = path
+        self.sync_every = sync_every
+        self.__lock = threading.Lock()
+        self.__file = None
+        self.__unsynced = 0
+
+    def entries(self):
+        """
+        :return: generator of str - entries recorded so far, oldest first
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as checkpoint_file:
+            for line in checkpoint_file:
+                if line.endswith('\n'):
+                    yield line[:-1]
+
+    def last_entry(self):
+        """
+        :return: str - the most recent entry, or None if nothing was recorded yet
+        """
+        last = None
+        for last in self.entries():
+            pass
+        return last
+
+    def completed(self) -> set:
+        """
+        :return: set of str - entries recorded so far
+        """
+        return set(self.entries())
+
+    def record(self, entry: str):
+        """
+        :param entry: str - must not contain line breaks
+        """
+        if '\n' in entry or '\r' in entry:
+            raise ValueError(f'Checkpoint entries cannot contain line breaks: {entry!r}')
+        with self.__lock:
+            if self.__file is None:
+                self.__file = open(self.path, 'a', encoding='utf-8')
+                # Terminate a line cut short by a crash so that it cannot run into this entry
+                if self.__file.tell() > 0 and not self.__ends_with_newline():
+                    self.__file.write('\n')
+            self.__file.write(entry + '\n')
+            self.__file.flush()
+            self.__unsynced += 1
+            if self.__unsynced >= self.sync_every:
+                os.fsync(self.__file.fileno())
+                self.__unsynced = 0
+
+    def __ends_with_newline(self):
+        with open(self.path, 'rb') as checkpoint_file:
+            checkpoint_file.seek(-1, os.SEEK_END)
+            return checkpoint_file.read(1) == b'\n'
+
+    def close(self):
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.flush()
+                os.fsync(self.__file.fileno())
+                self.__file.close()
+                self.__file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
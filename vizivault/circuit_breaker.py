@@ -0,0 +1,124 @@
+import threading
+import time
+from enum import Enum
+
+from vizivault.vault_circuit_open_exception import VaultCircuitOpenException
+
+
+class CircuitState(Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a vault that keeps failing.
+
+    After failure_threshold consecutive failures the circuit opens and every call fails fast with a
+    VaultCircuitOpenException. Once recovery_timeout seconds have passed, up to half_open_max_calls trial requests
+    are let through: a success closes the circuit again, a failure re-opens it. A trial whose outcome is never
+    reported stops holding its slot after half_open_timeout seconds.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0, half_open_max_calls: int = 1,
+                 half_open_timeout: float = 60.0):
+        """
+        :param failure_threshold: int - consecutive failures that open the circuit
+        :param recovery_timeout: float - seconds to stay open before letting trial requests through
+        :param half_open_max_calls: int - trial requests allowed at once while half open
+        :param half_open_timeout: float - seconds after which trial requests that have not reported an outcome
+            no longer count against half_open_max_calls
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.half_open_timeout = half_open_timeout
+
+        self.__lock = threading.Lock()
+        self.__state = CircuitState.CLOSED
+        self.__consecutive_failures = 0
+        self.__opened_at = None
+        self.__half_open_calls = 0
+        self.__trial_started_at = None
+        self.total_failures = 0
+        self.total_successes = 0
+        self.times_opened = 0
+        self.rejected_calls = 0
+
+    @property
+    def state(self) -> CircuitState:
+        with self.__lock:
+            return self.__current_state()
+
+    def __current_state(self):
+        if self.__state == CircuitState.OPEN and time.monotonic() - self.__opened_at >= self.recovery_timeout:
+            self.__state = CircuitState.HALF_OPEN
+            self.__half_open_calls = 0
+        elif (self.__state == CircuitState.HALF_OPEN and self.__half_open_calls
+              and time.monotonic() - self.__trial_started_at >= self.half_open_timeout):
+            # The trials were lost, e.g. abandoned without an outcome, and must not keep the circuit wedged
+            self.__half_open_calls = 0
+        return self.__state
+
+    def before_request(self) -> bool:
+        """
+        Raises a VaultCircuitOpenException if the request should not be sent.
+
+        :return: bool - whether the request is a trial request of a half open circuit
+        """
+        with self.__lock:
+            state = self.__current_state()
+            if state == CircuitState.CLOSED:
+                return False
+            if state == CircuitState.HALF_OPEN and self.__half_open_calls < self.half_open_max_calls:
+                self.__half_open_calls += 1
+                self.__trial_started_at = time.monotonic()
+                return True
+            self.rejected_calls += 1
+            retry_after = max(0.0, self.recovery_timeout - (time.monotonic() - self.__opened_at))
+            raise VaultCircuitOpenException(retry_after=retry_after)
+
+    def release_trial(self):
+        """
+        Frees the slot of a trial request that ended without telling anything about the vault, e.g. because it
+        timed out waiting for a client-side limit before being sent.
+        """
+        with self.__lock:
+            if self.__state == CircuitState.HALF_OPEN and self.__half_open_calls:
+                self.__half_open_calls -= 1
+
+    def record_success(self):
+        with self.__lock:
+            self.total_successes += 1
+            self.__consecutive_failures = 0
+            self.__state = CircuitState.CLOSED
+
+    def record_failure(self):
+        with self.__lock:
+            self.total_failures += 1
+            self.__consecutive_failures += 1
+            if self.__state == CircuitState.HALF_OPEN or self.__consecutive_failures >= self.failure_threshold:
+                if self.__state != CircuitState.OPEN:
+                    self.times_opened += 1
+                self.__state = CircuitState.OPEN
+                self.__opened_at = time.monotonic()
+
+    def reset(self):
+        with self.__lock:
+            self.__state = CircuitState.CLOSED
+            self.__consecutive_failures = 0
+
+    def stats(self) -> dict:
+        """
+        :return: dict - current state and counters, for monitoring
+        """
+        with self.__lock:
+            return {
+                "state": self.__current_state().value,
+                "consecutive_failures": self.__consecutive_failures,
+                "total_failures": self.total_failures,
+                "total_successes": self.total_successes,
+                "times_opened": self.times_opened,
+                "rejected_calls": self.rejected_calls,
+            }
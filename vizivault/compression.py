@@ -0,0 +1,20 @@
+import gzip
+import zlib
+
+SUPPORTED_ENCODINGS = ('gzip', 'deflate')
+
+
+def compress_body(body: bytes, encoding: str = 'gzip', level: int = 6) -> bytes:
+    """
+    Compresses a request body for sending with a matching Content-Encoding header.
+
+    :param body: bytes - the encoded request body
+    :param encoding: str - 'gzip' or 'deflate'
+    :param level: int - compression level from 1 (fastest) to 9 (smallest)
+    :return: bytes
+    """
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=level)
+    elif encoding == 'deflate':
+        return zlib.compress(body, level)
+    raise ValueError(f'Unsupported request compression {encoding!r}, expected one of {SUPPORTED_ENCODINGS}')
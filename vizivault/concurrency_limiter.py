@@ -0,0 +1,97 @@
+import threading
+import time
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps the number of requests a client has in flight, and adapts that cap to how the vault is coping.
+
+    The limit follows additive-increase/multiplicative-decrease: every healthy response raises it by roughly one
+    request per round trip, while a 429 or 5xx, a failed request or a response much slower than the best latency
+    seen recently cuts it by backoff_ratio. Decreases are spaced at least one round trip apart, so a single burst
+    of slow responses only counts once.
+    """
+
+    def __init__(self, initial_limit: int = 10, min_limit: int = 1, max_limit: int = 200,
+                 backoff_ratio: float = 0.5, latency_tolerance: float = 2.0, baseline_smoothing: float = 0.01):
+        """
+        :param initial_limit: int - requests allowed in flight at first
+        :param min_limit: int - the limit never drops below this
+        :param max_limit: int - the limit never grows above this
+        :param backoff_ratio: float - factor applied to the limit on congestion
+        :param latency_tolerance: float - responses slower than this multiple of the baseline count as congestion
+        :param baseline_smoothing: float - how quickly the baseline latency follows slower responses, from 0 to 1
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.baseline_smoothing = baseline_smoothing
+
+        self.__condition = threading.Condition()
+        self.__limit = float(initial_limit)
+        self.__in_flight = 0
+        self.__baseline_latency = None
+        self.__last_decrease = 0.0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self.__limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self.__in_flight
+
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        Waits for a free slot.
+
+        :param timeout: float - seconds to wait at most, None waits forever
+        :return: True if a slot was taken, False on timeout
+        """
+        with self.__condition:
+            if not self.__condition.wait_for(lambda: self.__in_flight < self.limit, timeout):
+                return False
+            self.__in_flight += 1
+            return True
+
+    def release(self, latency: float = None, overloaded: bool = False):
+        """
+        Frees a slot and adjusts the limit to the outcome of the request that held it.
+
+        :param latency: float - seconds the request took, None if it failed without a response
+        :param overloaded: bool - the vault reported overload (429 or 5xx) or the request failed
+        """
+        with self.__condition:
+            self.__in_flight -= 1
+            baseline = self.__baseline_latency
+            congested = overloaded or (latency is not None and baseline is not None and
+                                       latency > baseline * self.latency_tolerance)
+            if latency is not None and not overloaded:
+                if baseline is None or latency < baseline:
+                    self.__baseline_latency = latency
+                else:
+                    self.__baseline_latency = baseline + self.baseline_smoothing * (latency - baseline)
+
+            now = time.monotonic()
+            if congested:
+                if now - self.__last_decrease >= (self.__baseline_latency or 0.0):
+                    self.__limit = max(float(self.min_limit), self.__limit * self.backoff_ratio)
+                    self.__last_decrease = now
+                    self.decreases += 1
+            else:
+                self.__limit = min(float(self.max_limit), self.__limit + 1.0 / self.__limit)
+            self.__condition.notify_all()
+
+    def stats(self) -> dict:
+        """
+        :return: dict - current limit, requests in flight and adjustments, for monitoring
+        """
+        with self.__condition:
+            return {
+                "limit": self.limit,
+                "in_flight": self.__in_flight,
+                "baseline_latency": self.__baseline_latency,
+                "decreases": self.decreases,
+            }
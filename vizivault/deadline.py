@@ -0,0 +1,44 @@
+import time
+
+from vizivault.vault_deadline_exceeded_exception import VaultDeadlineExceededException
+
+
+class Deadline:
+    """
+    A time budget shared by every request made while it is active, e.g. all the DELETEs and POSTs of one save().
+    """
+
+    def __init__(self, seconds: float):
+        """
+        :param seconds: float - total time budget
+        """
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self):
+        """
+        Raises a VaultDeadlineExceededException if no time is left in the budget.
+        """
+        if self.expired:
+            raise VaultDeadlineExceededException(seconds=self.seconds)
+
+    def clamp(self, timeout):
+        """
+        Shortens a (connect, read) timeout so that it does not outlast the deadline.
+
+        :param timeout: (float, float) or None
+        :return: (float, float)
+        """
+        remaining = max(self.remaining(), 0.001)
+        if timeout is None:
+            return remaining, remaining
+        connect_timeout, read_timeout = timeout
+        return (remaining if connect_timeout is None else min(connect_timeout, remaining),
+                remaining if read_timeout is None else min(read_timeout, remaining))
@@ -1,11 +1,18 @@
 from vizivault.attribute import Attribute
 from itertools import chain
 from vizivault.json_object import JSONObject
+from vizivault.lazy_attributes import attribute_values
 
 
 class Entity(JSONObject):
 
-    def __init__(self, entity_id, data=None):
+    def __init__(self, entity_id, data=None, lazy=False):
+        """
+        :param entity_id: str
+        :param data: list of dict - attributes as the vault returns them
+        :param lazy: bool - keep the fields of each attribute and only build an Attribute when its key is first
+            accessed, which is much cheaper for entities with many attributes of which few are read
+        """
         super().__init__()
         self.id = entity_id
         self.tags = []
@@ -18,7 +25,16 @@ class Entity(JSONObject):
         self.__changed_attributes = set()
         self.__deleted_attributes = set()
 
-        if data is not None:
+        # Fields of the attributes not built yet, by attribute key
+        self.__unbuilt_attributes = {}
+
+        # The id and tags as last written to the vault; None for an entity that may not be in the vault yet
+        self.__saved_definition = None if data is None else self.definition_snapshot()
+
+        if data is not None and lazy:
+            for attribute in data:
+                self.__unbuilt_attributes.setdefault(attribute['attribute'], []).append(attribute_values(attribute))
+        elif data is not None:
             for attribute in data:
                 attribute_to_add = Attribute(data_point_id=attribute['dataPointId'],
                                              userId=attribute['userId'],
@@ -39,11 +55,26 @@ class Entity(JSONObject):
     def deleted_attributes(self):
         return list(self.__deleted_attributes)
 
+    def definition_snapshot(self) -> tuple:
+        """
+        :return: tuple - the id and tags, as the vault stores them for the entity
+        """
+        return self.id, tuple(self.tags)
+
+    @property
+    def definition_changed(self) -> bool:
+        """
+        True if the id or tags differ from what was last written to the vault, or the entity was created
+        client-side and has not been saved yet
+        """
+        return self.__saved_definition != self.definition_snapshot()
+
     def add_attribute(self, attribute=None, value=None):
         if value is not None:
             attribute = Attribute(attribute=attribute, value=value)
 
         if isinstance(attribute, Attribute):
+            self.__build_attributes(attribute.attribute)
             self.__add_attribute_without_pending_change(attribute)
             self.__changed_attributes.add(attribute)
         else:
@@ -64,7 +95,17 @@ class Entity(JSONObject):
         else:
             self.__attributes[attribute_key] = attribute
 
+    def __build_attributes(self, attribute_key):
+        for values in self.__unbuilt_attributes.pop(attribute_key, ()):
+            self.__add_attribute_without_pending_change(Attribute(*values))
+
+    def __build_all_attributes(self):
+        for attribute_key in list(self.__unbuilt_attributes):
+            self.__build_attributes(attribute_key)
+
     def get_attribute(self, attribute_key):
+        if attribute_key in self.__unbuilt_attributes:
+            self.__build_attributes(attribute_key)
         # We have to search repeated attribute and the attribute lists to determine what to return
         if attribute_key in self.__repeated_attributes:
             if len(self.__repeated_attributes[attribute_key]) == 1:
@@ -78,16 +119,40 @@ class Entity(JSONObject):
         return attribute
 
     def get_attributes(self):
+        self.__build_all_attributes()
         return list(self.__attributes.values()) + list(chain.from_iterable(self.__repeated_attributes.values()))
 
     def purge(self):
+        self.__build_all_attributes()
         self.__attributes.clear()
 
     def clear_attribute(self, attribute_key):
-        del (self.__attributes[attribute_key])
-        del (self.__repeated_attributes[attribute_key])
+        self.__unbuilt_attributes.pop(attribute_key, None)
+        self.__attributes.pop(attribute_key, None)
+        self.__repeated_attributes.pop(attribute_key, None)
+        self.__changed_attributes = {attribute for attribute in self.__changed_attributes
+                                     if attribute.attribute != attribute_key}
         self.__deleted_attributes.add(attribute_key)
 
+    def clear_pending_changes(self, changed_attributes=None, deleted_attributes=None, definition=None):
+        """
+        Forgets changes once they have been written to the vault. Only the given attributes and keys are
+        forgotten, so changes made while a save was in progress stay pending; with no arguments, all are.
+
+        :param changed_attributes: list of Attribute
+        :param deleted_attributes: list of attribute keys
+        :param definition: tuple - the definition_snapshot that was written
+        """
+        if changed_attributes is None and deleted_attributes is None and definition is None:
+            self.__changed_attributes.clear()
+            self.__deleted_attributes.clear()
+            self.__saved_definition = self.definition_snapshot()
+            return
+        if definition is not None:
+            self.__saved_definition = definition
+        self.__changed_attributes.difference_update(changed_attributes or [])
+        self.__deleted_attributes.difference_update(deleted_attributes or [])
+
     @classmethod
     def from_json_dict(cls, json_dict):
         return cls(
@@ -0,0 +1,145 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from vizivault import json_backend
+
+
+class _CachedEntity:
+    def __init__(self, entity_id: str, content: bytes, expires_at: float):
+        self.entity_id = entity_id
+        self.content = content
+        self.expires_at = expires_at
+        self.size = sys.getsizeof(content)
+        self.data_points = _data_point_ids(content)
+
+
+def _data_point_ids(content: bytes) -> set:
+    try:
+        data = json_backend.loads(content)['data']
+    except (TypeError, ValueError, KeyError):
+        return set()
+    items = data if isinstance(data, list) else [data]
+    return {item.get('dataPointId') for item in items if isinstance(item, dict)}
+
+
+class EntityCache:
+    """
+    A bounded LRU cache of the responses find_by_user, find_by_entity and get_user_attribute are built from, each
+    kept for at most `ttl` seconds.
+
+    Responses are cached as the bytes the vault sent, and every read builds new User, Entity or Attribute objects
+    from them, so changes a caller makes to what it got back are never seen by other callers. Saves, purges and
+    data point deletions made through the ViziVault client that owns the cache drop the entity's entries. Writes
+    made by other clients are only seen once the entries expire.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 2 ** 20, ttl: float = 30.0):
+        """
+        :param max_entries: int - responses kept at most; the least recently used one is evicted first
+        :param max_bytes: int - estimated memory the cached responses may take up
+        :param ttl: float - seconds a response is served from the cache
+        """
+        if max_entries <= 0 or max_bytes <= 0:
+            raise ValueError('Arguments max_entries and max_bytes must be positive')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+
+    def get(self, path: str):
+        """
+        :param path: str - the path the response was read from
+        :return: bytes - the cached response body, or None on a miss
+        """
+        with self.__lock:
+            cached = self.__entries.get(path)
+            if cached is not None and cached.expires_at <= time.monotonic():
+                self.__remove(path)
+                cached = None
+            if cached is None:
+                self.misses += 1
+                return None
+            self.__entries.move_to_end(path)
+            self.hits += 1
+            return cached.content
+
+    def put(self, entity_id: str, path: str, content: bytes, generation: int = None):
+        """
+        :param entity_id: str - the user or entity the response belongs to
+        :param path: str - the path the response was read from
+        :param content: bytes - the response body
+        :param generation: int - the cache generation read before the request was sent; the response is not
+            stored if anything was invalidated since, as it may predate that write
+        """
+        cached = _CachedEntity(entity_id, content, time.monotonic() + self.ttl)
+        if cached.size > self.max_bytes:
+            return
+        with self.__lock:
+            if generation is not None and generation != self.generation:
+                return
+            if path in self.__entries:
+                self.__remove(path)
+            self.__entries[path] = cached
+            self.bytes += cached.size
+            while len(self.__entries) > self.max_entries or self.bytes > self.max_bytes:
+                self.__remove(next(iter(self.__entries)))
+                self.evictions += 1
+
+    def invalidate_entity(self, entity_id: str):
+        """
+        Drops every response read for the user or entity.
+        """
+        with self.__lock:
+            self.__drop([path for path, cached in self.__entries.items() if cached.entity_id == entity_id])
+
+    def invalidate_data_point(self, data_point_id: str):
+        """
+        Drops every response read for the user or entity owning the data point. A data point that is not in any
+        cached response cannot make one stale, so nothing is dropped for it.
+        """
+        with self.__lock:
+            owners = {cached.entity_id for cached in self.__entries.values() if data_point_id in cached.data_points}
+            self.__drop([path for path, cached in self.__entries.items() if cached.entity_id in owners])
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.bytes = 0
+            self.generation += 1
+
+    def __drop(self, paths):
+        self.generation += 1
+        for path in paths:
+            self.__remove(path)
+            self.invalidations += 1
+
+    def __remove(self, path):
+        self.bytes -= self.__entries.pop(path).size
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def stats(self) -> dict:
+        """
+        :return: dict - counters, for monitoring
+        """
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.__entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,198 @@
+"""
+    Streaming export of search results to NDJSON, for audits and analytics.
+
+    Results are fetched one page at a time, with the next page requested while the current one is written, so
+    memory use depends on the page size and not on the size of the result. Each record can be projected onto a
+    subset of its fields, or transformed by any function. Output files ending in .gz are gzipped.
+
+    With a checkpoint file, the page number and output size are recorded after every page, and a restarted
+    export truncates the output to the last recorded size and carries on with the next page.
+
+    Usage:
+        python -m vizivault.exporter OUTPUT --base-url URL [--api-key KEY] [--value ATTRIBUTE=VALUE ...]
+                                     [--attribute ATTRIBUTE ...] [--regulation KEY ...] [--user-id ID]
+                                     [--fields FIELD,FIELD...] [--page-size N] [--checkpoint FILE]
+
+    The api key defaults to the VV_API_KEY environment variable.
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+
+from vizivault import json_backend
+from vizivault.vizivault import ViziVault
+from vizivault.search_request import SearchRequest
+from vizivault.checkpoint import CheckpointLog
+
+
+class ExportReport:
+    """
+    Running totals of a SearchExporter.
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.records = 0
+        self.bytes_written = 0
+        self.resumed_at_page = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """
+        :return: float - records exported per second
+        """
+        return self.records / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        resumed = f', resumed at page {self.resumed_at_page}' if self.resumed_at_page else ''
+        return (f'{self.records} records in {self.pages} pages, {self.bytes_written} bytes written{resumed} '
+                f'in {self.elapsed:.1f}s ({self.throughput:.1f} records/s)')
+
+
+def project_fields(fields):
+    """
+    :param fields: list of str - record fields to keep, in output order
+    :return: callable taking a record dict and returning a dict with only those fields
+    """
+    fields = tuple(fields)
+    return lambda record: {field: record.get(field) for field in fields}
+
+
+class SearchExporter:
+    """
+    Writes the results of a search to an NDJSON file page by page, with optional checkpointing.
+    """
+
+    def __init__(self, vault: ViziVault, search_request: SearchRequest, path: str, page_size: int = 1000,
+                 projection=None, compress: bool = None, checkpoint_path: str = None, prefetch: int = 1):
+        """
+        :param vault: ViziVault
+        :param search_request: SearchRequest
+        :param path: str - output file
+        :param page_size: int - records requested per search call
+        :param projection: list of field names to keep, or a callable taking a record dict and returning the
+            dict to write, or None to skip the record; all fields are written by default
+        :param compress: bool - gzip the output, defaults to whether the path ends in .gz
+        :param checkpoint_path: str - where progress is recorded, to resume an interrupted export
+        :param prefetch: int - pages fetched ahead of the one being written
+        """
+        if page_size <= 0:
+            raise ValueError('Argument page_size must be positive')
+        self.vault = vault
+        self.search_request = search_request
+        self.path = path
+        self.page_size = page_size
+        if projection is not None and not callable(projection):
+            projection = project_fields(projection)
+        self.projection = projection
+        self.compress = path.endswith('.gz') if compress is None else compress
+        self.checkpoint_path = checkpoint_path
+        self.prefetch = prefetch
+
+    def run(self, progress=None) -> ExportReport:
+        """
+        :param progress: callable taking the ExportReport, called after every page
+        :return: ExportReport
+        """
+        report = ExportReport()
+        checkpoint = CheckpointLog(self.checkpoint_path) if self.checkpoint_path else None
+        try:
+            page, offset = 0, 0
+            last_entry = checkpoint.last_entry() if checkpoint else None
+            if last_entry:
+                last_page, offset = (int(value) for value in last_entry.split('\t'))
+                page = report.resumed_at_page = last_page + 1
+
+            with open(self.path, 'r+b' if offset else 'wb') as output:
+                # Drop whatever was written after the last checkpoint, so no record is exported twice
+                output.truncate(offset)
+                output.seek(offset)
+                # The next page is fetched while this one is written
+                pages = self.vault.search_pages(self.search_request, page_size=self.page_size,
+                                                prefetch=self.prefetch, start_page=page)
+                for page, records in enumerate(pages, start=page):
+                    self.__write_page(output, records, report)
+                    if checkpoint:
+                        output.flush()
+                        os.fsync(output.fileno())
+                        checkpoint.record(f'{page}\t{output.tell()}')
+                    report.pages += 1
+                    if progress is not None:
+                        progress(report)
+        finally:
+            if checkpoint:
+                checkpoint.close()
+        report.finished_at = time.monotonic()
+        return report
+
+    def __write_page(self, output, records, report):
+        lines = []
+        for record in records:
+            if self.projection is not None:
+                record = self.projection(record)
+                if record is None:
+                    continue
+            lines.append(json_backend.dumps(record))
+        report.records += len(lines)
+        if not lines:
+            return
+        data = b'\n'.join(lines) + b'\n'
+        start = output.tell()
+        if self.compress:
+            # One gzip member per page: members concatenate into a valid gzip file, and a file truncated at a
+            # page boundary stays valid
+            with gzip.GzipFile(fileobj=output, mode='wb') as compressed:
+                compressed.write(data)
+        else:
+            output.write(data)
+        report.bytes_written += output.tell() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m vizivault.exporter', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help="NDJSON file to write, gzipped if it ends in .gz")
+    parser.add_argument('--base-url', required=True)
+    parser.add_argument('--api-key', default=os.environ.get('VV_API_KEY'))
+    parser.add_argument('--value', action='append', default=[], metavar='ATTRIBUTE=VALUE',
+                        help="match attributes with this value; may be repeated")
+    parser.add_argument('--attribute', action='append', default=[], help="attribute to export; may be repeated")
+    parser.add_argument('--regulation', action='append', default=[], help="regulation key; may be repeated")
+    parser.add_argument('--user-id')
+    parser.add_argument('--fields', help="comma separated record fields to keep, e.g. userId,attribute,value")
+    parser.add_argument('--page-size', type=int, default=1000)
+    parser.add_argument('--checkpoint', help="progress file, used to resume an interrupted export")
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error("an api key is required, via --api-key or the VV_API_KEY environment variable")
+
+    search_request = SearchRequest()
+    for value_query in args.value:
+        attribute, separator, value = value_query.partition('=')
+        if not separator:
+            parser.error(f"--value expects ATTRIBUTE=VALUE, got {value_query!r}")
+        search_request.add_value_query(attribute, value)
+    search_request.attributes = args.attribute
+    search_request.regulations = args.regulation
+    search_request.userId = args.user_id
+
+    with ViziVault(base_url=args.base_url, api_key=args.api_key) as vault:
+        exporter = SearchExporter(vault, search_request, args.output, page_size=args.page_size,
+                                  projection=args.fields.split(',') if args.fields else None,
+                                  checkpoint_path=args.checkpoint)
+        report = exporter.run()
+    print(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
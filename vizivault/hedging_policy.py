@@ -0,0 +1,55 @@
+import threading
+from collections import deque
+
+
+class HedgingPolicy:
+    """
+    Decides when a read is hedged: if the first request has not answered by the time it is slower than
+    `percentile` percent of recent reads, an identical second request is sent and whichever answers first wins.
+    """
+
+    def __init__(self, percentile: float = 95.0, min_samples: int = 20, window: int = 500, min_delay: float = 0.0):
+        """
+        :param percentile: float - latency percentile of recent reads after which a hedge is sent
+        :param min_samples: int - reads to observe before hedging starts
+        :param window: int - number of recent read latencies the percentile is computed over
+        :param min_delay: float - never hedge sooner than this many seconds
+        """
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.__latencies = deque(maxlen=window)
+        self.__lock = threading.Lock()
+        self.__delay = None
+        self.__samples_since_update = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def record(self, latency: float):
+        with self.__lock:
+            self.__latencies.append(latency)
+            self.__samples_since_update += 1
+
+    def record_hedge(self, won: bool):
+        """
+        :param won: bool - whether the hedge answered before the first request
+        """
+        with self.__lock:
+            self.hedges_sent += 1
+            if won:
+                self.hedges_won += 1
+
+    def hedge_delay(self):
+        """
+        :return: float - seconds to wait for the first request before hedging, or None if too few reads were seen
+        """
+        with self.__lock:
+            if len(self.__latencies) < self.min_samples:
+                return None
+            # Re-sorting the window on every read would cost more than the hedge saves, so refresh periodically
+            if self.__delay is None or self.__samples_since_update >= max(1, len(self.__latencies) // 10):
+                latencies = sorted(self.__latencies)
+                index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+                self.__delay = max(self.min_delay, latencies[index])
+                self.__samples_since_update = 0
+            return self.__delay
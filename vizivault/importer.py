@@ -0,0 +1,333 @@
+"""
+    Streaming import of users from CSV or NDJSON files into the vault.
+
+    Rows are read one at a time and their columns are mapped onto attribute keys using the attribute definitions
+    stored in the vault: a column named like a definition (ignoring case, spaces and punctuation, so EYE_COLOR
+    matches EyeColor) becomes that attribute, and columns named like the fields of a definition with an object
+    schema are combined into one value for it. Consecutive rows with the same user ID are saved together, and
+    users are saved concurrently with a bounded number of rows held in memory.
+
+    Rows that cannot be imported are appended to a rejects file, as NDJSON with the row number and the reason,
+    and the import carries on. The checkpoint file records the last row of each user whose save has finished,
+    successfully or not, so that a restarted run resumes after it. Rows that were being saved when a run died are
+    saved again on restart, and rows rejected after the last finished user, e.g. at the end of the file, are
+    rejected again and appear in the rejects file once per run.
+
+    Usage:
+        python -m vizivault.importer FILE --user-id-column COLUMN --base-url URL [--api-key KEY]
+                                     [--format csv|ndjson] [--map COLUMN=ATTRIBUTE[.FIELD] ...]
+                                     [--checkpoint FILE] [--rejects FILE] [--workers N]
+
+    The api key and encryption key default to the VV_API_KEY and VV_ENCRYPT_KEY environment variables.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+from vizivault import json_backend
+from vizivault.vizivault import ViziVault
+from vizivault.user import User
+from vizivault.bulk import bounded_map
+from vizivault.checkpoint import CheckpointLog
+
+
+def normalize_column(name: str) -> str:
+    return re.sub(r'[^0-9a-z]', '', name.lower())
+
+
+class ImportReport:
+    """
+    Running totals of an Importer.
+    """
+
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_skipped = 0
+        self.rows_rejected = 0
+        self.users_saved = 0
+        self.users_failed = 0
+        self.unmapped_columns = set()
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """
+        :return: float - rows imported or rejected per second, not counting rows skipped on resume
+        """
+        return (self.rows_read - self.rows_skipped) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f'{self.rows_read} rows read, {self.rows_skipped} skipped from checkpoint, '
+                f'{self.rows_rejected} rejected; {self.users_saved} users saved, {self.users_failed} failed '
+                f'in {self.elapsed:.1f}s ({self.throughput:.1f} rows/s)')
+
+
+class ColumnMapping:
+    """
+    Maps the columns of a row onto attribute keys, based on the attribute definitions stored in the vault.
+    """
+
+    def __init__(self, attribute_definitions, user_id_column: str, column_map: dict = None):
+        """
+        :param attribute_definitions: list of AttributeDefinition
+        :param user_id_column: str - column holding the user ID
+        :param column_map: dict - explicit column to "Attribute" or "Attribute.field" mappings, which take
+            precedence over matching by name
+        """
+        self.user_id_column = user_id_column
+        self.column_map = column_map or {}
+        self.__attributes = {normalize_column(definition.name): definition.name
+                             for definition in attribute_definitions}
+        # Fields of object schemas, e.g. first_name of a ClientName definition; ambiguous fields are left out
+        fields = {}
+        for definition in attribute_definitions:
+            if isinstance(definition.schema, dict):
+                for field in definition.schema:
+                    fields.setdefault(normalize_column(field), []).append((definition.name, field))
+        self.__fields = {field: targets[0] for field, targets in fields.items() if len(targets) == 1}
+        self.__plans = {}
+
+    def plan(self, columns):
+        """
+        :param columns: tuple of str - the columns of a row
+        :return: list of (column, attribute key, field or None), and the columns that map to nothing
+        """
+        if columns not in self.__plans:
+            plan = []
+            unmapped = []
+            for column in columns:
+                if column == self.user_id_column:
+                    continue
+                if column in self.column_map:
+                    attribute, _, field = self.column_map[column].partition('.')
+                    plan.append((column, attribute, field or None))
+                elif normalize_column(column) in self.__attributes:
+                    plan.append((column, self.__attributes[normalize_column(column)], None))
+                elif normalize_column(column) in self.__fields:
+                    attribute, field = self.__fields[normalize_column(column)]
+                    plan.append((column, attribute, field))
+                else:
+                    unmapped.append(column)
+            self.__plans[columns] = (plan, unmapped)
+        return self.__plans[columns]
+
+    def attributes(self, row: dict):
+        """
+        :param row: dict - column to value
+        :return: list of (attribute key, value); empty values are left out
+        """
+        plan, _ = self.plan(tuple(row))
+        values = []
+        objects = {}
+        for column, attribute, field in plan:
+            value = row[column]
+            if value is None or value == '':
+                continue
+            if field is None:
+                values.append((attribute, value))
+            else:
+                objects.setdefault(attribute, {})[field] = value
+        return values + list(objects.items())
+
+
+class _UserRows:
+    def __init__(self, user_id, first_row):
+        self.user = User(user_id)
+        self.last_row = first_row
+        self.rows = []
+
+
+class Importer:
+    """
+    Imports rows into the vault as users, with checkpointing and a rejects log.
+    """
+
+    def __init__(self, vault: ViziVault, user_id_column: str, column_map: dict = None,
+                 checkpoint_path: str = None, rejects_path: str = None, max_workers: int = 8,
+                 max_rows_per_user: int = 1000, attribute_definitions=None):
+        """
+        :param vault: ViziVault
+        :param user_id_column: str - column holding the user ID
+        :param column_map: dict - explicit column to "Attribute" or "Attribute.field" mappings
+        :param checkpoint_path: str - where progress is recorded, to resume an interrupted import
+        :param rejects_path: str - file that rejected rows are appended to
+        :param max_workers: int - number of users saved at once
+        :param max_rows_per_user: int - consecutive rows of one user saved in a single request at most
+        :param attribute_definitions: list of AttributeDefinition - defaults to those stored in the vault
+        """
+        self.vault = vault
+        self.checkpoint_path = checkpoint_path
+        self.rejects_path = rejects_path
+        self.max_workers = max_workers
+        self.max_rows_per_user = max_rows_per_user
+        if attribute_definitions is None:
+            attribute_definitions = vault.get_attribute_definitions()
+        self.mapping = ColumnMapping(attribute_definitions, user_id_column, column_map)
+
+    def run(self, rows) -> ImportReport:
+        """
+        :param rows: iterable of (row number, dict, error) as produced by read_rows; consumed lazily
+        :return: ImportReport
+        """
+        report = ImportReport()
+        checkpoint = CheckpointLog(self.checkpoint_path) if self.checkpoint_path else None
+        rejects = open(self.rejects_path, 'a', encoding='utf-8') if self.rejects_path else None
+        try:
+            resume_after = int(checkpoint.last_entry() or 0) if checkpoint else 0
+            groups = self.__group(rows, report, rejects, resume_after)
+            for result in bounded_map(self.vault.bind_call_options(lambda group: self.vault.save(group.user)), groups,
+                                      max_workers=self.max_workers, ordered=True):
+                group = result.item
+                if result.ok:
+                    report.users_saved += 1
+                else:
+                    report.users_failed += 1
+                    for row_number, row in group.rows:
+                        self.__reject(report, rejects, row_number, f'save failed: {result.error}', row)
+                if checkpoint:
+                    checkpoint.record(str(group.last_row))
+        finally:
+            if checkpoint:
+                checkpoint.close()
+            if rejects:
+                rejects.close()
+        report.finished_at = time.monotonic()
+        return report
+
+    def __group(self, rows, report, rejects, resume_after):
+        group = None
+        for row_number, row, error in rows:
+            report.rows_read += 1
+            if row_number <= resume_after:
+                report.rows_skipped += 1
+                continue
+            if error is not None:
+                self.__reject(report, rejects, row_number, error, row)
+                continue
+
+            user_id = row.get(self.mapping.user_id_column)
+            attributes = self.mapping.attributes(row)
+            report.unmapped_columns.update(self.mapping.plan(tuple(row))[1])
+            if user_id is None or user_id == '':
+                self.__reject(report, rejects, row_number, 'missing user ID', row)
+                continue
+            # NDJSON can hold numeric IDs, which must group with each other like the strings they are saved as
+            user_id = str(user_id)
+            if not attributes:
+                self.__reject(report, rejects, row_number, 'no columns map to an attribute', row)
+                continue
+
+            if group is not None and (group.user.id != user_id or len(group.rows) >= self.max_rows_per_user):
+                yield group
+                group = None
+            if group is None:
+                group = _UserRows(user_id, row_number)
+            for attribute, value in attributes:
+                group.user.add_attribute(attribute=attribute, value=value)
+            group.rows.append((row_number, row))
+            group.last_row = row_number
+        if group is not None:
+            yield group
+
+    @staticmethod
+    def __reject(report, rejects, row_number, reason, row):
+        report.rows_rejected += 1
+        if rejects is not None:
+            rejects.write(json.dumps({"row": row_number, "reason": str(reason), "data": row}) + '\n')
+            rejects.flush()
+
+
+def read_csv(path: str, delimiter: str = ','):
+    """
+    :param path: str
+    :param delimiter: str
+    :return: generator of (row number, dict, error); row numbers count data rows from 1
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as csv_file:
+        reader = csv.DictReader(csv_file, delimiter=delimiter)
+        for row_number, row in enumerate(reader, start=1):
+            if None in row:
+                yield row_number, row, f'{len(row[None])} more values than columns'
+            else:
+                yield row_number, row, None
+
+
+def read_ndjson(path: str):
+    """
+    :param path: str - one JSON object per line
+    :return: generator of (row number, dict, error); row numbers count lines from 1
+    """
+    with open(path, 'r', encoding='utf-8') as ndjson_file:
+        for row_number, line in enumerate(ndjson_file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json_backend.loads(line)
+            except ValueError as e:
+                yield row_number, line.rstrip('\n'), f'invalid JSON: {e}'
+                continue
+            if isinstance(row, dict):
+                yield row_number, row, None
+            else:
+                yield row_number, row, 'row is not a JSON object'
+
+
+def read_rows(path: str, file_format: str = None):
+    """
+    :param path: str
+    :param file_format: str - 'csv' or 'ndjson', guessed from the file extension if not given
+    :return: generator of (row number, dict, error)
+    """
+    file_format = file_format or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    if file_format == 'csv':
+        return read_csv(path)
+    elif file_format == 'ndjson':
+        return read_ndjson(path)
+    raise ValueError(f'Unsupported format {file_format!r}, expected csv or ndjson')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m vizivault.importer', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file')
+    parser.add_argument('--user-id-column', required=True)
+    parser.add_argument('--base-url', required=True)
+    parser.add_argument('--api-key', default=os.environ.get('VV_API_KEY'))
+    parser.add_argument('--format', choices=['csv', 'ndjson'])
+    parser.add_argument('--map', action='append', default=[], metavar='COLUMN=ATTRIBUTE[.FIELD]',
+                        help="map a column explicitly; may be repeated")
+    parser.add_argument('--checkpoint', help="progress file, used to resume an interrupted import")
+    parser.add_argument('--rejects', help="file to append rejected rows to")
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error("an api key is required, via --api-key or the VV_API_KEY environment variable")
+    column_map = {}
+    for mapping in args.map:
+        column, separator, attribute = mapping.partition('=')
+        if not separator:
+            parser.error(f"--map expects COLUMN=ATTRIBUTE, got {mapping!r}")
+        column_map[column] = attribute
+
+    with ViziVault(base_url=args.base_url, api_key=args.api_key, pool_maxsize=args.workers) as vault:
+        importer = Importer(vault, user_id_column=args.user_id_column, column_map=column_map,
+                            checkpoint_path=args.checkpoint, rejects_path=args.rejects, max_workers=args.workers)
+        report = importer.run(read_rows(args.file, args.format))
+    if report.unmapped_columns:
+        print(f"Ignored columns: {', '.join(sorted(report.unmapped_columns))}", file=sys.stderr)
+    print(report)
+    return 1 if report.rows_rejected else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+    The JSON library used to decode responses and encode request bodies.
+
+    orjson is used if it is installed (pip install vizivault[fast]), then ujson, then the json module. The
+    VV_JSON_BACKEND environment variable or set_backend picks one explicitly.
+
+    Decoding takes the response bytes as they are, without decoding them to str first. Documents a faster library
+    rejects but the json module accepts, such as integers beyond 64 bits or NaN, are decoded with the json module.
+
+    Encoding is compact and produces the same bytes whatever the backend: UTF-8 without escaping non-ASCII
+    characters, no whitespace, and keys in insertion order. Where orjson formats a document differently from the
+    json module, namely floats with an exponent, floats below 1e-4 (which orjson writes without one), non-finite
+    floats (which orjson writes as null), non-string keys or integers beyond 64 bits, the document is encoded
+    with the json module instead. ujson is only used for decoding, as it formats floats differently.
+    Objects are encoded through `default`, which orjson also calls for dataclasses and dates; enums are encoded
+    natively by orjson, so model fields holding them are converted by the models before encoding.
+"""
+
+import json
+import os
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+BACKENDS = ('orjson', 'ujson', 'stdlib')
+
+# A float with an exponent outside a string, which orjson writes as 1e16 or 1e-7 and the json module as 1e+16
+# or 1e-07. Strings that look like one only cost a second encoding. The end of one is searched for first, as
+# that is much faster than searching for the whole number.
+_EXPONENT_END = re.compile(rb'e-?\d+(?:[,\]}]|$)')
+_EXPONENT = re.compile(rb'(?:^|[\[:,])-?\d+(?:\.\d+)?e-?\d+(?:[,\]}]|$)')
+# A float below 1e-4, which orjson writes as 0.00001 and the json module as 1e-05
+_SMALL_FLOAT = re.compile(rb'(?:^|[\[:,])-?0\.0000\d')
+# A null, which orjson also writes for NaN and infinities where the json module writes NaN and Infinity
+_NULL = re.compile(rb'(?:^|[\[:,])null(?:[,\]}]|$)')
+
+
+def _stdlib_loads(data):
+    return json.loads(data)
+
+
+def _stdlib_dumps(obj, default=None) -> bytes:
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _formats_differently(content: bytes) -> bool:
+    """
+    :return: bool - whether the orjson output may differ from what the json module writes for the same document
+    """
+    for end in _EXPONENT_END.finditer(content):
+        if _EXPONENT.search(content, max(0, end.start() - 32), end.end()):
+            return True
+    if b'0.0000' in content and _SMALL_FLOAT.search(content):
+        return True
+    return b'null' in content and _NULL.search(content) is not None
+
+
+def _orjson_loads(data):
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(data)
+
+
+def _orjson_dumps(obj, default=None) -> bytes:
+    try:
+        content = orjson.dumps(obj, default=default,
+                               option=orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME)
+    except orjson.JSONEncodeError:
+        return _stdlib_dumps(obj, default)
+    if _formats_differently(content):
+        return _stdlib_dumps(obj, default)
+    return content
+
+
+def _ujson_loads(data):
+    try:
+        return ujson.loads(data)
+    except ValueError:
+        return json.loads(data)
+
+
+_IMPLEMENTATIONS = {
+    'orjson': (lambda: orjson, _orjson_loads, _orjson_dumps),
+    'ujson': (lambda: ujson, _ujson_loads, _stdlib_dumps),
+    'stdlib': (lambda: json, _stdlib_loads, _stdlib_dumps),
+}
+
+_backend = None
+_loads = _stdlib_loads
+_dumps = _stdlib_dumps
+
+
+def available_backends() -> list:
+    """
+    :return: list of str - the backends that can be used here, fastest first
+    """
+    return [name for name in BACKENDS if _IMPLEMENTATIONS[name][0]() is not None]
+
+
+def set_backend(name: str = None):
+    """
+    :param name: str - 'orjson', 'ujson' or 'stdlib'; None picks the fastest one installed
+    """
+    global _backend, _loads, _dumps
+    if name is None:
+        name = available_backends()[0]
+    if name not in _IMPLEMENTATIONS:
+        raise ValueError(f'Unknown JSON backend {name!r}, expected one of {BACKENDS}')
+    module, loads_function, dumps_function = _IMPLEMENTATIONS[name]
+    if module() is None:
+        raise ImportError(f'The {name} JSON backend requires {name}; install it with pip install {name}')
+    _backend, _loads, _dumps = name, loads_function, dumps_function
+
+
+def backend_name() -> str:
+    return _backend
+
+
+def loads(data):
+    """
+    :param data: bytes or str
+    :return: the decoded document
+    """
+    return _loads(data)
+
+
+def dumps(obj, default=None) -> bytes:
+    """
+    :param obj: the document
+    :param default: callable returning a serializable version of objects the backend cannot encode
+    :return: bytes - compact UTF-8 JSON
+    """
+    return _dumps(obj, default)
+
+
+set_backend(os.environ.get('VV_JSON_BACKEND') or None)
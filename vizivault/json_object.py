@@ -4,37 +4,150 @@ import datetime
 from enum import Enum
 from json import JSONEncoder
 import re
+from operator import attrgetter
+
+from vizivault import json_backend
+
+_MANGLED_PREFIX = re.compile(r'^_{1,2}\w+_{2,}')
+
+# Per class, the JSON key of every instance attribute seen so far, with name-mangling prefixes stripped
+_field_plans = {}
+
+# Per class, a getter for the values of its slots and their JSON keys
+_slot_plans = {}
+
+
+def field_plan(cls) -> dict:
+    """
+    :param cls: type
+    :return: dict - the JSON key of each instance attribute of cls encountered so far, None for attributes that
+        are not serialized; keys are added as instances with new attributes are encoded
+    """
+    plan = _field_plans.get(cls)
+    if plan is None:
+        plan = _field_plans.setdefault(cls, {})
+    return plan
+
+
+def slot_plan(cls):
+    """
+    :param cls: type
+    :return: (callable, tuple, tuple) - a function returning the values of the slots of an instance of cls, the
+        slot names and their JSON keys; None if cls has no slots
+    """
+    try:
+        return _slot_plans[cls]
+    except KeyError:
+        pass
+    names = []
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get('__slots__', ())
+        for slot in (slots,) if isinstance(slots, str) else slots:
+            if slot in ('__dict__', '__weakref__'):
+                continue
+            if slot.startswith('__') and not slot.endswith('__'):
+                slot = f"_{klass.__name__.lstrip('_')}{slot}"
+            names.append(slot)
+    plan = None
+    if names:
+        getter = attrgetter(*names)
+        plan = (getter if len(names) > 1 else lambda obj: (getter(obj),), tuple(names),
+                tuple(_json_key(name) for name in names))
+    return _slot_plans.setdefault(cls, plan)
+
+
+def _json_key(attribute_name: str):
+    if attribute_name == "default_encoder":
+        return None
+    return _MANGLED_PREFIX.sub('', attribute_name)
+
+
+def encode_fields(obj) -> dict:
+    """
+    :return: dict - the attributes of obj that are not None, by JSON key, with enums replaced by their values
+    """
+    encoded = {}
+    slots = slot_plan(type(obj))
+    if slots is not None:
+        values, names, keys = slots
+        try:
+            encoded = {key: value for key, value in zip(keys, values(obj)) if value is not None}
+        except AttributeError:
+            # Some slot was never assigned
+            encoded = {key: getattr(obj, name) for name, key in zip(names, keys)
+                       if getattr(obj, name, None) is not None}
+    fields = getattr(obj, '__dict__', None)
+    if fields:
+        plan = field_plan(type(obj))
+        try:
+            encoded.update((plan[name], value) for name, value in fields.items()
+                           if value is not None and plan[name] is not None)
+        except KeyError:
+            plan.update((name, _json_key(name)) for name in fields if name not in plan)
+            encoded.update((plan[name], value) for name, value in fields.items()
+                           if value is not None and plan[name] is not None)
+    for key, value in encoded.items():
+        # Encoded here rather than left to the encoder, as orjson encodes enums itself
+        if isinstance(value, Enum):
+            encoded[key] = value.value[0]
+        elif type(value) is list and any(isinstance(item, Enum) for item in value):
+            encoded[key] = [item.value[0] if isinstance(item, Enum) else item for item in value]
+    return encoded
+
+
+def encode_default(obj):
+    """
+    Serializable version of an object the JSON encoder does not handle itself.
+    """
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()
+    elif isinstance(obj, Enum):
+        return obj.value[0]
+    else:
+        return encode_fields(obj)
 
 
 class JSONObject(ABC):
+    # Empty, so that subclasses declaring __slots__ have no per-instance __dict__
+    __slots__ = ()
+
     def __init__(self):
-        self.default_encoder = self.MyJSONEncoder
+        pass
 
-    def to_json(self, encoder_class=None):
+    def to_json(self, encoder_class=None, compact=False):
+        """
+        :param encoder_class: JSONEncoder subclass - defaults to MyJSONEncoder
+        :param compact: bool - no whitespace and keys in attribute order, for sending to the vault; the default
+            pretty-prints with sorted keys, for reading
+        :return: str
+        """
         encoder_class = encoder_class or self.default_encoder
+        if compact:
+            if encoder_class is JSONObject.MyJSONEncoder:
+                return self.to_json_bytes().decode('utf-8')
+            return json.dumps(self, cls=encoder_class, ensure_ascii=False, separators=(',', ':'))
         return json.dumps(self, cls=encoder_class,
                           sort_keys=True, indent=4)
 
+    def to_json_bytes(self) -> bytes:
+        """
+        :return: bytes - the compact JSON as UTF-8, encoded by the fastest JSON backend available
+        """
+        if self.default_encoder is not JSONObject.MyJSONEncoder:
+            return json.dumps(self, cls=self.default_encoder, ensure_ascii=False,
+                              separators=(',', ':')).encode('utf-8')
+        return json_backend.dumps(self, default=encode_default)
+
     class MyJSONEncoder(JSONEncoder):
         def default(self, obj):
-            if isinstance(obj, (datetime.date, datetime.datetime)):
-                return obj.isoformat
-            elif isinstance(obj, Enum):
-                return obj.value[0]
-            else:
-                d = {}
-                for key, value in obj.__dict__.items():
-                    if value is None:
-                        continue
-                    elif key == "default_encoder":
-                        continue
-                    else:
-                        d[re.sub(r'^_{1,2}\w+_{2,}', '', key)] = value
-                return d
+            return encode_default(obj)
+
+    # The encoder to_json uses, for all instances of a class
+    default_encoder = MyJSONEncoder
 
     @classmethod
     def from_json(cls, json_bytes):
-        json_obj = json.loads(json_bytes)['data']
+        json_obj = json_backend.loads(json_bytes)['data']
         if isinstance(json_obj, list):
             return [cls.from_json_dict(json_dict) for json_dict in json_obj]
         else:
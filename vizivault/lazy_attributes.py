@@ -0,0 +1,46 @@
+from collections.abc import Sequence
+from operator import itemgetter
+
+from vizivault.attribute import Attribute
+
+# The fields of a record the vault returns, in the order of Attribute's constructor arguments
+attribute_values = itemgetter('dataPointId', 'userId', 'attribute', 'sensitivity', 'value', 'regulations', 'tags',
+                              'createdDate', 'modifiedDate')
+
+
+class LazyAttributeList(Sequence):
+    """
+    A list of attributes that keeps the fields of each record as a tuple and only builds the Attribute the first
+    time it is accessed, reusing it afterwards. Cheaper than building every Attribute when only some of a large
+    result are looked at.
+    """
+
+    def __init__(self, records):
+        """
+        :param records: list of dict - attributes as the vault returns them
+        """
+        self.__values = [attribute_values(record) for record in records]
+        self.__attributes = [None] * len(self.__values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        attribute = self.__attributes[index]
+        if attribute is None:
+            attribute = self.__attributes[index] = Attribute(*self.__values[index])
+            self.__values[index] = None
+        return attribute
+
+    def __len__(self):
+        return len(self.__attributes)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, LazyAttributeList)):
+            return len(self) == len(other) and all(mine == theirs for mine, theirs in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        built = sum(attribute is not None for attribute in self.__attributes)
+        return f'<LazyAttributeList of {len(self)} attributes, {built} built>'
@@ -0,0 +1,131 @@
+import threading
+import time
+
+from vizivault import json_backend
+
+
+class _CatalogEntry:
+    def __init__(self, content: bytes, etag: str, last_modified: str, expires_at: float):
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    def validators(self) -> dict:
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+def _modified_dates(content: bytes):
+    try:
+        data = json_backend.loads(content)['data']
+    except (TypeError, ValueError, KeyError):
+        return None
+    items = data if isinstance(data, list) else [data]
+    if not all(isinstance(item, dict) and item.get('modifiedDate') for item in items):
+        return None
+    return sorted((str(item.get('key', item.get('name'))), item['modifiedDate']) for item in items)
+
+
+class MetadataCatalog:
+    """
+    Client-side cache of attribute definitions, tags and regulations, by the path they are read from.
+
+    Responses are served from the cache for `ttl` seconds. After that, the next read revalidates them with a
+    conditional request (If-None-Match / If-Modified-Since), which the vault answers with 304 Not Modified and no
+    body if nothing changed. When the vault sent no validators, the response is fetched again and the cached one
+    kept if the modifiedDate of every item is unchanged. Stores and deletes made through the client drop the
+    entries they change.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        """
+        :param ttl: float - seconds a response is served without revalidating it
+        """
+        self.ttl = ttl
+        self.__entries = {}
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.not_modified = 0
+
+    def lookup(self, path: str, revalidate: bool = False):
+        """
+        :param path: str
+        :param revalidate: bool - treat a fresh entry as stale, for reads that must be current
+        :return: (bytes, dict) - the cached content if it is fresh, otherwise None and the headers to revalidate
+            the stale entry with, if any
+        """
+        with self.__lock:
+            entry = self.__entries.get(path)
+            if entry is None:
+                self.misses += 1
+                return None, {}
+            if entry.expires_at > time.monotonic() and not revalidate:
+                self.hits += 1
+                return entry.content, {}
+            self.revalidations += 1
+            return None, entry.validators()
+
+    def store(self, path: str, status: int, content: bytes, etag: str = None, last_modified: str = None) -> bytes:
+        """
+        Records the response to a read, conditional or not.
+
+        :param path: str
+        :param status: int - 304 if the vault confirmed the cached content is current
+        :param content: bytes - the response body
+        :param etag: str - the response's ETag header
+        :param last_modified: str - the response's Last-Modified header
+        :return: bytes - the content to use, or None if a 304 came for an entry that is gone
+        """
+        with self.__lock:
+            previous = self.__entries.get(path)
+            if previous is not None and (status == 304 or (
+                    etag is None and last_modified is None and
+                    _modified_dates(content) is not None and
+                    _modified_dates(content) == _modified_dates(previous.content))):
+                self.not_modified += 1
+                previous.expires_at = time.monotonic() + self.ttl
+                return previous.content
+            if status == 304:
+                # The entry was dropped while it was being revalidated, so the content has to be read again
+                return None
+            self.__entries[path] = _CatalogEntry(content, etag, last_modified, time.monotonic() + self.ttl)
+            return content
+
+    def put(self, path: str, content: bytes):
+        """
+        Caches content that was not read from `path` itself, e.g. an item taken from a list.
+        """
+        with self.__lock:
+            self.__entries[path] = _CatalogEntry(content, None, None, time.monotonic() + self.ttl)
+
+    def invalidate(self, *paths: str):
+        with self.__lock:
+            for path in paths:
+                self.__entries.pop(path, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def stats(self) -> dict:
+        """
+        :return: dict - counters, for monitoring
+        """
+        with self.__lock:
+            return {
+                "entries": len(self.__entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "not_modified": self.not_modified,
+            }
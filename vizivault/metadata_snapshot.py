@@ -0,0 +1,273 @@
+"""
+    Read-only snapshot of every attribute definition, tag and regulation, shared by many processes on a host.
+
+    One process writes the snapshot, and again whenever it should be refreshed; the file is replaced atomically,
+    so readers see either the old or the new snapshot and never a partial one. Every other process memory-maps
+    it and looks items up without parsing the rest of the file, so workers start without asking the vault for
+    the full lists, and the operating system keeps a single copy of the file in memory for all of them.
+
+    File layout, little-endian:
+        header   magic b"VVMETA1\\n", entry count (uint32), reserved (uint32), creation time (float64)
+        index    one 16-byte entry per item, sorted by kind and key: kind (uint8), padding, key length (uint16),
+                 key offset, value offset and value length (uint32 each)
+        data     the UTF-8 key of every item, followed by the item as compact JSON, in the vault's format
+
+    Usage:
+        python -m vizivault.metadata_snapshot PATH --base-url URL [--api-key KEY] [--interval SECONDS]
+
+    The api key defaults to the VV_API_KEY environment variable, and the decryption key is read from
+    VV_DECRYPT_KEY. With --interval, the snapshot is refreshed every so many seconds until interrupted.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+from vizivault import json_backend
+from vizivault.attribute_definition import AttributeDefinition
+from vizivault.regulation import Regulation
+from vizivault.tag import Tag
+
+MAGIC = b"VVMETA1\n"
+_HEADER = struct.Struct('<8sIId')
+_ENTRY = struct.Struct('<BxHIII')
+
+# Kind code, JSONObject class and the field an item is looked up by, per kind
+KINDS = {
+    'attributes': (0, AttributeDefinition, 'key'),
+    'tags': (1, Tag, 'name'),
+    'regulations': (2, Regulation, 'key'),
+}
+
+
+def write_snapshot(path: str, attributes, tags, regulations, created_at: float = None) -> int:
+    """
+    Writes a snapshot to a temporary file next to `path`, then moves it over `path`.
+
+    :param path: str
+    :param attributes: iterable of dict - attribute definitions as the vault returns them
+    :param tags: iterable of dict - tags as the vault returns them
+    :param regulations: iterable of dict - regulations as the vault returns them
+    :param created_at: float - time the items were read, as from time.time()
+    :return: int - the number of items written
+    """
+    items = []
+    for kind, records in (('attributes', attributes), ('tags', tags), ('regulations', regulations)):
+        code, _, key_field = KINDS[kind]
+        for record in records:
+            items.append((code, str(record[key_field]).encode('utf-8'),
+                          json.dumps(record, separators=(',', ':'), sort_keys=True).encode('utf-8')))
+    items.sort(key=lambda item: item[:2])
+
+    index = bytearray()
+    data = bytearray()
+    offset = _HEADER.size + _ENTRY.size * len(items)
+    for code, key, value in items:
+        index += _ENTRY.pack(code, len(key), offset + len(data), offset + len(data) + len(key), len(value))
+        data += key
+        data += value
+
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.')
+    try:
+        # Readable by workers running as other users, like a file created with open()
+        os.chmod(temporary_path, 0o644)
+        with os.fdopen(descriptor, 'wb') as temporary:
+            temporary.write(_HEADER.pack(MAGIC, len(items), 0, time.time() if created_at is None else created_at))
+            temporary.write(index)
+            temporary.write(data)
+            temporary.flush()
+            os.fsync(temporary.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+    return len(items)
+
+
+class _Mapping:
+    def __init__(self, path: str):
+        with open(path, 'rb') as snapshot_file:
+            status = os.fstat(snapshot_file.fileno())
+            self.buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.identity = (status.st_ino, status.st_mtime_ns, status.st_size)
+        magic, self.count, _, self.created_at = _HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a metadata snapshot')
+
+    def entry(self, position: int):
+        return _ENTRY.unpack_from(self.buffer, _HEADER.size + position * _ENTRY.size)
+
+    def key(self, entry) -> bytes:
+        _, key_length, key_offset, _, _ = entry
+        return self.buffer[key_offset:key_offset + key_length]
+
+    def value(self, entry) -> bytes:
+        _, _, _, value_offset, value_length = entry
+        return self.buffer[value_offset:value_offset + value_length]
+
+    def lower_bound(self, code: int, key: bytes) -> int:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry = self.entry(middle)
+            if (entry[0], self.key(entry)) < (code, key):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, code: int, key: bytes):
+        position = self.lower_bound(code, key)
+        if position < self.count:
+            entry = self.entry(position)
+            if entry[0] == code and self.key(entry) == key:
+                return entry
+        return None
+
+    def entries(self, code: int):
+        for position in range(self.lower_bound(code, b''), self.count):
+            entry = self.entry(position)
+            if entry[0] != code:
+                return
+            yield entry
+
+
+class MetadataSnapshot:
+    """
+    A memory-mapped snapshot file written by write_snapshot or ViziVault.export_metadata_snapshot.
+
+    Only the items looked up are decoded. With a check_interval, lookups notice at most that many seconds late
+    that the file was replaced and map the new one; reload_if_changed does the same on demand.
+    """
+
+    def __init__(self, path: str, check_interval: float = None):
+        """
+        :param path: str
+        :param check_interval: float - seconds between checks for a new snapshot; None only checks when
+            reload_if_changed is called
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.__mapping = _Mapping(path)
+        self.__checked_at = time.monotonic()
+        self.__lock = threading.Lock()
+
+    @property
+    def created_at(self) -> float:
+        return self.__current().created_at
+
+    def reload_if_changed(self) -> bool:
+        """
+        :return: bool - whether the file was replaced since it was mapped, and the new one mapped instead
+        """
+        with self.__lock:
+            self.__checked_at = time.monotonic()
+            status = os.stat(self.path)
+            if (status.st_ino, status.st_mtime_ns, status.st_size) == self.__mapping.identity:
+                return False
+            # The old mapping is left for the garbage collector, as other threads may still be reading it
+            self.__mapping = _Mapping(self.path)
+            return True
+
+    def record(self, kind: str, key: str):
+        """
+        :param kind: str - 'attributes', 'tags' or 'regulations'
+        :param key: str - the attribute or regulation key, or the tag name
+        :return: dict - the item as the vault returned it, or None if there is no such item
+        """
+        mapping = self.__current()
+        entry = mapping.find(KINDS[kind][0], key.encode('utf-8'))
+        return None if entry is None else json_backend.loads(mapping.value(entry))
+
+    def keys(self, kind: str) -> list:
+        """
+        :param kind: str - 'attributes', 'tags' or 'regulations'
+        :return: list of str - the keys or names of every item of that kind, sorted
+        """
+        mapping = self.__current()
+        return [mapping.key(entry).decode('utf-8') for entry in mapping.entries(KINDS[kind][0])]
+
+    def records(self, kind: str) -> list:
+        """
+        :param kind: str - 'attributes', 'tags' or 'regulations'
+        :return: list of dict - every item of that kind
+        """
+        mapping = self.__current()
+        return [json_backend.loads(mapping.value(entry)) for entry in mapping.entries(KINDS[kind][0])]
+
+    def get_attribute_definition(self, attribute_key: str) -> AttributeDefinition:
+        return self.__get('attributes', attribute_key)
+
+    def get_attribute_definitions(self):
+        return self.__get_all('attributes')
+
+    def get_tag(self, name: str) -> Tag:
+        return self.__get('tags', name)
+
+    def get_tags(self):
+        return self.__get_all('tags')
+
+    def get_regulation(self, key: str) -> Regulation:
+        return self.__get('regulations', key)
+
+    def get_regulations(self):
+        return self.__get_all('regulations')
+
+    def __get(self, kind, key):
+        record = self.record(kind, key)
+        if record is None:
+            raise KeyError(key)
+        return KINDS[kind][1].from_json_dict(record)
+
+    def __get_all(self, kind):
+        return [KINDS[kind][1].from_json_dict(record) for record in self.records(kind)]
+
+    def __current(self) -> _Mapping:
+        if self.check_interval is not None and time.monotonic() - self.__checked_at >= self.check_interval:
+            self.reload_if_changed()
+        return self.__mapping
+
+    def __len__(self):
+        return self.__current().count
+
+    def close(self):
+        self.__mapping.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main(argv=None):
+    from vizivault.vizivault import ViziVault
+
+    parser = argparse.ArgumentParser(prog='python -m vizivault.metadata_snapshot', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help="snapshot file to write")
+    parser.add_argument('--base-url', required=True)
+    parser.add_argument('--api-key', default=os.environ.get('VV_API_KEY'))
+    parser.add_argument('--interval', type=float, help="refresh the snapshot every so many seconds")
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error("an api key is required, via --api-key or the VV_API_KEY environment variable")
+
+    with ViziVault(base_url=args.base_url, api_key=args.api_key) as vault:
+        while True:
+            count = vault.export_metadata_snapshot(args.path)
+            print(f"Wrote {count} items to {args.path}")
+            if args.interval is None:
+                return 0
+            time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+    Bulk erasure of users from the vault, e.g. for GDPR erasure requests.
+
+    IDs are streamed from a file (one per line) and purged with bounded concurrency. Every purged ID is written to
+    a checkpoint log, so that a run that is interrupted can be restarted with the same arguments and will skip the
+    IDs it already erased.
+
+    Usage:
+        python -m vizivault.purge IDS_FILE --checkpoint CHECKPOINT_FILE --base-url URL [--api-key KEY]
+                                  [--workers N] [--failures FAILURES_FILE]
+
+    The api key defaults to the VV_API_KEY environment variable.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from vizivault.vizivault import ViziVault
+from vizivault.checkpoint import CheckpointLog
+
+
+class PurgeReport:
+    """
+    Running totals of a PurgeJob.
+    """
+
+    def __init__(self):
+        self.purged = 0
+        self.absent = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    @property
+    def processed(self) -> int:
+        return self.purged + self.absent + self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """
+        :return: float - IDs processed per second, not counting skipped ones
+        """
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f'{self.purged} purged, {self.absent} already absent, {self.failed} failed, '
+                f'{self.skipped} skipped from checkpoint in {self.elapsed:.1f}s ({self.throughput:.1f} IDs/s)')
+
+
+class PurgeJob:
+    """
+    Purges many users with bounded concurrency, recording progress in a checkpoint log.
+    """
+
+    def __init__(self, vault: ViziVault, checkpoint_path: str, max_workers: int = 8, failures_path: str = None):
+        """
+        :param vault: ViziVault
+        :param checkpoint_path: str - log of purged IDs; IDs already in it are skipped
+        :param max_workers: int - number of purges running at once
+        :param failures_path: str - optional file that failed IDs and their errors are appended to
+        """
+        self.vault = vault
+        self.checkpoint_path = checkpoint_path
+        self.max_workers = max_workers
+        self.failures_path = failures_path
+        self.__failures_lock = threading.Lock()
+
+    def run(self, entity_ids, progress=None, progress_interval: float = 10.0) -> PurgeReport:
+        """
+        :param entity_ids: iterable of str - consumed lazily
+        :param progress: callable taking the PurgeReport, called every progress_interval seconds
+        :param progress_interval: float
+        :return: PurgeReport
+        """
+        report = PurgeReport()
+        last_progress = time.monotonic()
+        with CheckpointLog(self.checkpoint_path) as checkpoint:
+            completed = checkpoint.completed()
+
+            def pending_ids():
+                for entity_id in entity_ids:
+                    if entity_id in completed:
+                        report.skipped += 1
+                    else:
+                        yield entity_id
+
+            for result in self.vault.purge_many(pending_ids(), max_workers=self.max_workers):
+                if result.ok or result.missing:
+                    checkpoint.record(result.item)
+                    if result.ok:
+                        report.purged += 1
+                    else:
+                        report.absent += 1
+                else:
+                    report.failed += 1
+                    self.__record_failure(result.item, result.error)
+
+                if progress is not None and time.monotonic() - last_progress >= progress_interval:
+                    progress(report)
+                    last_progress = time.monotonic()
+
+        report.finished_at = time.monotonic()
+        return report
+
+    def __record_failure(self, entity_id, error):
+        if self.failures_path is None:
+            return
+        with self.__failures_lock, open(self.failures_path, 'a', encoding='utf-8') as failures_file:
+            failures_file.write(f'{entity_id}\t{error!r}\n')
+
+
+def read_ids(path: str):
+    """
+    :param path: str - file with one ID per line; blank lines are ignored
+    :return: generator of str
+    """
+    with open(path, 'r', encoding='utf-8') as ids_file:
+        for line in ids_file:
+            entity_id = line.strip()
+            if entity_id:
+                yield entity_id
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m vizivault.purge', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('ids_file', help="file with one user ID per line")
+    parser.add_argument('--checkpoint', required=True, help="log of purged IDs, used to resume an interrupted run")
+    parser.add_argument('--base-url', required=True)
+    parser.add_argument('--api-key', default=os.environ.get('VV_API_KEY'))
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--failures', help="file to append failed IDs and their errors to")
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error("an api key is required, via --api-key or the VV_API_KEY environment variable")
+
+    with ViziVault(base_url=args.base_url, api_key=args.api_key, pool_maxsize=args.workers) as vault:
+        job = PurgeJob(vault, checkpoint_path=args.checkpoint, max_workers=args.workers,
+                       failures_path=args.failures)
+        report = job.run(read_ids(args.ids_file), progress=lambda running: print(running, file=sys.stderr))
+    print(report)
+    return 1 if report.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,6 +2,8 @@ from vizivault.json_object import JSONObject
 
 
 class Regulation(JSONObject):
+    __slots__ = ('key', 'name', 'url', 'rule', '__created_date', '__modified_date')
+
     def __init__(self, name=None, key=None, url=None, rule=None):
         super().__init__()
         self.key = key
@@ -0,0 +1,83 @@
+import random
+import datetime
+from email.utils import parsedate_to_datetime
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed vault call is retried, and how long to wait before the next attempt.
+
+    Waits use exponential backoff with full jitter, so that many clients failing at once do not retry in lockstep.
+    A Retry-After header sent by the vault takes precedence over the computed backoff.
+    """
+
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+    def __init__(self, max_attempts: int = 3, backoff_base: float = 0.1, backoff_max: float = 10.0,
+                 retry_statuses=(429, 502, 503, 504), retry_non_idempotent: bool = False,
+                 respect_retry_after: bool = True, max_retry_after: float = 60.0):
+        """
+        :param max_attempts: int - total number of attempts per call, including the first one
+        :param backoff_base: float - seconds; the n-th retry waits a random time up to backoff_base * 2 ** n
+        :param backoff_max: float - upper bound in seconds for a single backoff
+        :param retry_statuses: HTTP status codes that are worth retrying
+        :param retry_non_idempotent: bool - also retry calls that may not be safe to repeat, such as attribute POSTs
+        :param respect_retry_after: bool - wait as long as the vault's Retry-After header asks for
+        :param max_retry_after: float - give up instead of waiting when Retry-After asks for longer than this
+        """
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_non_idempotent = retry_non_idempotent
+        self.respect_retry_after = respect_retry_after
+        self.max_retry_after = max_retry_after
+
+    @classmethod
+    def is_idempotent(cls, method: str) -> bool:
+        return method.upper() in cls.IDEMPOTENT_METHODS
+
+    def should_retry(self, attempt: int, idempotent: bool, status: int = None, retry_after: str = None) -> bool:
+        """
+        :param attempt: int - number of attempts made so far
+        :param idempotent: bool - whether the call can safely be repeated
+        :param status: int - HTTP status of the failed attempt, or None if it failed to communicate at all
+        :param retry_after: str - value of the Retry-After response header, if any
+        :return: True if another attempt should be made
+        """
+        if attempt >= self.max_attempts:
+            return False
+        if status is not None and status not in self.retry_statuses:
+            return False
+        # A 429 is rejected before the vault acts on it, so it is safe to repeat whatever the method
+        if not (idempotent or self.retry_non_idempotent or status == 429):
+            return False
+        delay = self.parse_retry_after(retry_after)
+        return delay is None or delay <= self.max_retry_after
+
+    def backoff(self, attempt: int, retry_after: str = None) -> float:
+        """
+        :param attempt: int - number of attempts made so far
+        :param retry_after: str - value of the Retry-After response header, if any
+        :return: float - seconds to wait before the next attempt
+        """
+        delay = self.parse_retry_after(retry_after) if self.respect_retry_after else None
+        if delay is not None:
+            return delay
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def parse_retry_after(retry_after):
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            retry_date = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        if retry_date.tzinfo is None:
+            retry_date = retry_date.replace(tzinfo=datetime.timezone.utc)
+        return max(0.0, (retry_date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
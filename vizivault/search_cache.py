@@ -0,0 +1,189 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from vizivault.search_request import SearchRequest
+
+
+class _CachedPage:
+    def __init__(self, query, content: bytes, records, expires_at: float):
+        self.query = query
+        self.content = content
+        self.expires_at = expires_at
+        self.user_ids = {record.get('userId') for record in records}
+        self.data_points = {record.get('dataPointId'): (record.get('userId'), record.get('attribute'))
+                            for record in records}
+
+
+class _Query:
+    """
+    The parts of a SearchRequest that decide which writes can change its results.
+    """
+
+    def __init__(self, search_request: SearchRequest):
+        self.user_id = search_request.userId
+        self.attributes = {_value_attribute(value) for value in search_request.values} | set(search_request.attributes)
+        self.has_regulations = bool(search_request.regulations)
+
+    def affected_by(self, user_id, attribute_keys) -> bool:
+        if self.user_id is not None and self.user_id != user_id:
+            return False
+        if attribute_keys is None or self.has_regulations or not self.attributes:
+            return True
+        return not self.attributes.isdisjoint(attribute_keys)
+
+
+def _value_attribute(value):
+    return value['attribute'] if isinstance(value, dict) else value.attribute
+
+
+def _value_pair(value):
+    if isinstance(value, dict):
+        return value['attribute'], value['value']
+    return value.attribute, value.value
+
+
+def search_key(search_request: SearchRequest) -> str:
+    """
+    :param search_request: SearchRequest
+    :return: str - encoding of the request that is the same for requests differing only in the order of their
+        values, regulations or attributes
+    """
+    values = sorted(json.dumps(_value_pair(value), sort_keys=True, default=str) for value in search_request.values)
+    return json.dumps([
+        values,
+        sorted(search_request.regulations),
+        sorted(search_request.attributes),
+        search_request.sensitivity,
+        search_request.userId,
+        search_request.country,
+        search_request.subdivision,
+        search_request.city,
+        search_request.minCreatedDate,
+        search_request.maxCreatedDate,
+        search_request.minModifiedDate,
+        search_request.maxModifiedDate,
+    ], sort_keys=True, default=str)
+
+
+class SearchCache:
+    """
+    A bounded LRU cache of search result pages, each kept for at most `ttl` seconds.
+
+    Writes made through the ViziVault client that owns the cache invalidate the searches they can affect, with
+    every page of such a search dropped together since records can move between pages. Writes made by other
+    clients are only seen once the cached pages expire.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        """
+        :param max_entries: int - pages kept at most; the least recently used page is evicted first
+        :param ttl: float - seconds a page is served from the cache
+        """
+        if max_entries <= 0:
+            raise ValueError('Argument max_entries must be positive')
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.__pages = OrderedDict()
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.generation = 0
+
+    @staticmethod
+    def key(search_request: SearchRequest, page: int, count: int):
+        return search_key(search_request), page, count
+
+    def get(self, search_request: SearchRequest, page: int, count: int):
+        """
+        :return: bytes - the cached response body, or None on a miss
+        """
+        key = self.key(search_request, page, count)
+        with self.__lock:
+            cached = self.__pages.get(key)
+            if cached is not None and cached.expires_at <= time.monotonic():
+                del self.__pages[key]
+                cached = None
+            if cached is None:
+                self.misses += 1
+                return None
+            self.__pages.move_to_end(key)
+            self.hits += 1
+            return cached.content
+
+    def put(self, search_request: SearchRequest, page: int, count: int, content: bytes, records,
+            generation: int = None):
+        """
+        :param content: bytes - the response body
+        :param records: list of dict - the records decoded from it
+        :param generation: int - the cache generation read before the search was sent; the page is not stored if
+            anything was invalidated since, as it may predate that write
+        """
+        key = self.key(search_request, page, count)
+        cached = _CachedPage(_Query(search_request), content, records, time.monotonic() + self.ttl)
+        with self.__lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.__pages[key] = cached
+            self.__pages.move_to_end(key)
+            while len(self.__pages) > self.max_entries:
+                self.__pages.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_entity(self, entity_id: str, attribute_keys=None):
+        """
+        Drops every search that a write to the entity can change: those with the entity in their results, and
+        those whose filters could match the written attributes.
+
+        :param entity_id: str
+        :param attribute_keys: set of str - attributes written, None if any may have changed
+        """
+        with self.__lock:
+            searches = {key[0] for key, cached in self.__pages.items()
+                        if entity_id in cached.user_ids or cached.query.affected_by(entity_id, attribute_keys)}
+            self.__drop(searches)
+
+    def invalidate_data_point(self, data_point_id: str):
+        """
+        Drops every search that deleting the data point can change. If the data point is not in any cached page,
+        which user and attribute it belongs to is unknown and everything is dropped.
+        """
+        with self.__lock:
+            owner = next((cached.data_points[data_point_id] for cached in self.__pages.values()
+                          if data_point_id in cached.data_points), None)
+            if owner is None:
+                self.__drop({key[0] for key in self.__pages})
+                return
+        self.invalidate_entity(owner[0], {owner[1]})
+
+    def clear(self):
+        with self.__lock:
+            self.__pages.clear()
+            self.generation += 1
+
+    def __drop(self, searches):
+        self.generation += 1
+        for key in [key for key in self.__pages if key[0] in searches]:
+            del self.__pages[key]
+            self.invalidations += 1
+
+    def __len__(self):
+        return len(self.__pages)
+
+    def stats(self) -> dict:
+        """
+        :return: dict - counters, for monitoring
+        """
+        with self.__lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.__pages),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
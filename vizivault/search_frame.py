@@ -0,0 +1,397 @@
+import datetime
+import math
+from array import array
+from collections import Counter
+from itertools import accumulate, chain, islice, repeat
+
+from vizivault.attribute import Attribute
+
+
+class _Dictionary:
+    """
+    Interns the distinct values of a column and gives each one an integer code; None is coded as -1.
+    """
+
+    def __init__(self):
+        self.values = []
+        self.codes = {None: -1}
+
+    def encode(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode_all(self, values) -> list:
+        codes, encode = self.codes, self.encode
+        return [codes[value] if value in codes else encode(value) for value in values]
+
+    def decode(self, code: int):
+        return None if code < 0 else self.values[code]
+
+
+class _ListColumn:
+    """
+    A column holding a list of strings per row, e.g. tags, stored as the codes of all rows back to back plus
+    the offset at which each row starts, with the rows holding each code indexed for filtering.
+    """
+
+    def __init__(self, dictionary: _Dictionary):
+        self.dictionary = dictionary
+        self.offsets = array('q', [0])
+        self.codes = array('i')
+        self.rows_by_code = {}
+
+    def encode(self, rows):
+        """
+        :return: (list, list) - the rows and the codes of all their values, for extend
+        """
+        rows = [row or () for row in rows]
+        return rows, self.dictionary.encode_all([value for row in rows for value in row])
+
+    def extend(self, rows, codes):
+        first_row = len(self.offsets) - 1
+        start = self.offsets[-1]
+        self.codes.extend(codes)
+        self.offsets.extend(start + end for end in accumulate(len(row) for row in rows))
+        row_numbers = chain.from_iterable(map(repeat, range(first_row, first_row + len(rows)), map(len, rows)))
+        rows_by_code = self.rows_by_code
+        for row_number, code in zip(row_numbers, codes):
+            code_rows = rows_by_code.get(code)
+            if code_rows is None:
+                code_rows = rows_by_code[code] = array('q')
+            # A row listing the same value twice is indexed once
+            if not code_rows or code_rows[-1] != row_number:
+                code_rows.append(row_number)
+
+    def row_codes(self, index: int):
+        return self.codes[self.offsets[index]:self.offsets[index + 1]]
+
+    def row(self, index: int) -> list:
+        return [self.dictionary.values[code] for code in self.row_codes(index)]
+
+    def row_code_sets(self, indices=None):
+        codes, offsets = self.codes, self.offsets
+        if indices is None:
+            return (set(codes[start:end]) for start, end in zip(offsets, islice(offsets, 1, None)))
+        return (set(codes[offsets[index]:offsets[index + 1]]) for index in indices)
+
+    def rows_with(self, code: int):
+        """
+        :return: array of int - rows holding the code, in order
+        """
+        return self.rows_by_code.get(code, array('q'))
+
+
+def _timestamp(value) -> float:
+    if value is None:
+        return math.nan
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def _isoformat(timestamp: float):
+    if math.isnan(timestamp):
+        return None
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+
+
+def _check_resizable(arrays):
+    # Arrays exported with to_numpy(copy=False) cannot grow; checked before any column is changed, so that a
+    # failed extend leaves all columns the same length
+    for values in arrays:
+        try:
+            values.append(0)
+        except BufferError:
+            raise BufferError('Cannot add records while arrays from to_numpy(copy=False) are in use') from None
+        values.pop()
+
+
+def _wanted(dictionary: _Dictionary, value) -> set:
+    values = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+    return {dictionary.codes.get(value, -2) for value in values}
+
+
+class _Columns:
+    def __init__(self):
+        self.dictionaries = {name: _Dictionary() for name in SearchFrame.CODED_COLUMNS + SearchFrame.LIST_COLUMNS}
+        self.data_point_ids = []
+        self.values = []
+        self.codes = {name: array('i') for name in SearchFrame.CODED_COLUMNS}
+        self.lists = {name: _ListColumn(self.dictionaries[name]) for name in SearchFrame.LIST_COLUMNS}
+        self.timestamps = {name: array('d') for name in SearchFrame.TIMESTAMP_COLUMNS}
+
+
+class SearchFrame:
+    """
+    Search results stored column by column instead of as one Attribute per data point.
+
+    User IDs, attribute keys and sensitivities are interned and stored as integer codes, tags and regulations as
+    codes into a shared dictionary, and created and modified dates as seconds since the epoch (NaN when missing),
+    all in flat arrays. Filtering and grouping work on the codes without building an object per row, and give
+    frames that share the columns of the frame they came from and only hold the numbers of their rows.
+    to_numpy(copy=False) wraps the arrays of an unfiltered frame without copying them. to_numpy and to_pandas
+    need the optional numpy and pandas dependencies (pip install vizivault[analytics]).
+    """
+
+    CODED_COLUMNS = ('userId', 'attribute', 'sensitivity')
+    LIST_COLUMNS = ('tags', 'regulations')
+    TIMESTAMP_COLUMNS = ('createdDate', 'modifiedDate')
+
+    def __init__(self):
+        self.__columns = _Columns()
+        # Rows of the columns in this frame, or None for all of them
+        self.__rows = None
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        :param records: iterable of dict - search result records, as returned by ViziVault.search_records
+        :return: SearchFrame
+        """
+        frame = cls()
+        frame.extend(records)
+        return frame
+
+    def __view(self, rows) -> 'SearchFrame':
+        frame = SearchFrame.__new__(SearchFrame)
+        frame.__columns = self.__columns
+        frame.__rows = rows if isinstance(rows, array) else array('q', rows)
+        return frame
+
+    def __indices(self):
+        return range(len(self.__columns.data_point_ids)) if self.__rows is None else self.__rows
+
+    def append(self, record: dict):
+        """
+        :param record: dict - one search result record
+        """
+        self.extend([record])
+
+    def extend(self, records, batch_size: int = 10000):
+        """
+        :param records: iterable of dict - search result records, consumed batch_size at a time
+        :param batch_size: int
+        """
+        if self.__rows is not None:
+            raise ValueError('Cannot add records to a filtered frame')
+        columns = self.__columns
+        _check_resizable(chain(columns.codes.values(), columns.timestamps.values()))
+        records = iter(records)
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                return
+            # Everything that can fail, e.g. parsing a malformed date, is done before any column grows, so that
+            # the columns always stay the same length
+            # Dates repeat a lot in bulk loaded data, so each distinct one is parsed once per batch
+            parsed = {}
+            timestamps = {name: [parsed[value] if value in parsed else parsed.setdefault(value, _timestamp(value))
+                                 for value in (record.get(name) for record in batch)]
+                          for name in columns.timestamps}
+            codes = {name: columns.dictionaries[name].encode_all([record.get(name) for record in batch])
+                     for name in columns.codes}
+            lists = {name: column.encode([record.get(name) for record in batch])
+                     for name, column in columns.lists.items()}
+
+            columns.data_point_ids.extend([record.get('dataPointId') for record in batch])
+            columns.values.extend([record.get('value') for record in batch])
+            for name, column_codes in columns.codes.items():
+                column_codes.extend(codes[name])
+            for name, column in columns.lists.items():
+                column.extend(*lists[name])
+            for name, column_timestamps in columns.timestamps.items():
+                column_timestamps.extend(timestamps[name])
+
+    def __len__(self):
+        return len(self.__indices())
+
+    def row(self, index: int) -> Attribute:
+        """
+        Builds an Attribute for one row. Dates are given back in UTC ISO 8601 format.
+
+        :param index: int
+        :return: Attribute
+        """
+        columns = self.__columns
+        if self.__rows is not None:
+            index = self.__rows[index]
+        decode = {name: columns.dictionaries[name].decode(codes[index]) for name, codes in columns.codes.items()}
+        return Attribute(data_point_id=columns.data_point_ids[index],
+                         userId=decode['userId'],
+                         attribute=decode['attribute'],
+                         sensitivity=decode['sensitivity'],
+                         value=columns.values[index],
+                         regulations=columns.lists['regulations'].row(index),
+                         tags=columns.lists['tags'].row(index),
+                         created_date=_isoformat(columns.timestamps['createdDate'][index]),
+                         modified_date=_isoformat(columns.timestamps['modifiedDate'][index]))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.row(index)
+
+    def column(self, name: str) -> list:
+        """
+        :param name: str - an Attribute field, e.g. 'userId' or 'tags'
+        :return: list - the decoded values of the column; timestamps as seconds since the epoch
+        """
+        columns = self.__columns
+        indices = self.__indices()
+        if name == 'dataPointId':
+            return [columns.data_point_ids[index] for index in indices]
+        if name == 'value':
+            return [columns.values[index] for index in indices]
+        if name in columns.codes:
+            codes, decode = columns.codes[name], columns.dictionaries[name].decode
+            return [decode(codes[index]) for index in indices]
+        if name in columns.lists:
+            return [columns.lists[name].row(index) for index in indices]
+        if name in columns.timestamps:
+            timestamps = columns.timestamps[name]
+            return [timestamps[index] for index in indices]
+        raise KeyError(f'Unknown column {name!r}')
+
+    def categories(self, name: str) -> list:
+        """
+        :param name: str - 'userId', 'attribute', 'sensitivity', 'tags' or 'regulations'
+        :return: list - the distinct values the codes of the column refer to
+        """
+        return list(self.__columns.dictionaries[name].values)
+
+    def take(self, indices) -> 'SearchFrame':
+        """
+        :param indices: iterable of int - rows of this frame to keep, in the order to keep them
+        :return: SearchFrame - a frame sharing this frame's columns
+        """
+        if self.__rows is None:
+            return self.__view(list(indices))
+        return self.__view([self.__rows[index] for index in indices])
+
+    def filter(self, user_id=None, attribute=None, sensitivity=None, tag=None, regulation=None,
+               created_from: float = None, created_to: float = None, where=None) -> 'SearchFrame':
+        """
+        Keeps the rows matching every criterion given. Criteria other than `where` compare codes, so no object is
+        built per row.
+
+        :param user_id: str or collection of str
+        :param attribute: str or collection of str
+        :param sensitivity: str or collection of str
+        :param tag: str - rows with this tag
+        :param regulation: str - rows with this regulation
+        :param created_from: float - rows created at or after this many seconds since the epoch
+        :param created_to: float - rows created before this many seconds since the epoch
+        :param where: callable taking a value and returning whether to keep its row
+        :return: SearchFrame - a frame sharing this frame's columns
+        """
+        columns = self.__columns
+        indices = self.__indices()
+        for name, value in (('userId', user_id), ('attribute', attribute), ('sensitivity', sensitivity)):
+            if value is not None:
+                wanted = _wanted(columns.dictionaries[name], value)
+                codes = columns.codes[name]
+                indices = [index for index in indices if codes[index] in wanted]
+        for name, value in (('tags', tag), ('regulations', regulation)):
+            if value is not None:
+                rows = columns.lists[name].rows_with(columns.dictionaries[name].codes.get(value, -2))
+                if isinstance(indices, range):
+                    # Still every row of the columns, so the index is the answer; copied, as it grows with them
+                    indices = array('q', rows)
+                else:
+                    rows = set(rows)
+                    indices = [index for index in indices if index in rows]
+        created = columns.timestamps['createdDate']
+        if created_from is not None:
+            indices = [index for index in indices if created[index] >= created_from]
+        if created_to is not None:
+            indices = [index for index in indices if created[index] < created_to]
+        if where is not None:
+            indices = [index for index in indices if where(columns.values[index])]
+        return self.__view(indices)
+
+    def __code_sets(self, name: str):
+        columns = self.__columns
+        if name in columns.codes:
+            codes = columns.codes[name]
+            return ((codes[index],) for index in self.__indices())
+        if name in columns.lists:
+            return columns.lists[name].row_code_sets(self.__rows)
+        raise KeyError(f'Cannot group by column {name!r}')
+
+    def group_by(self, name: str) -> dict:
+        """
+        :param name: str - 'userId', 'attribute', 'sensitivity', 'tags' or 'regulations'; a row with several
+            tags or regulations is in the group of each
+        :return: dict of value to SearchFrame, each sharing this frame's columns
+        """
+        groups = {}
+        for index, codes in zip(self.__indices(), self.__code_sets(name)):
+            for code in codes:
+                groups.setdefault(code, []).append(index)
+        decode = self.__columns.dictionaries[name].decode
+        return {decode(code): self.__view(indices) for code, indices in groups.items()}
+
+    def count_by(self, name: str) -> dict:
+        """
+        :param name: str - 'userId', 'attribute', 'sensitivity', 'tags' or 'regulations'
+        :return: dict of value to number of rows
+        """
+        if name in self.__columns.codes:
+            codes = self.__columns.codes[name]
+            counts = Counter(codes if self.__rows is None else map(codes.__getitem__, self.__rows))
+        else:
+            counts = Counter(code for codes in self.__code_sets(name) for code in codes)
+        decode = self.__columns.dictionaries[name].decode
+        return {decode(code): count for code, count in counts.items()}
+
+    def to_numpy(self, copy: bool = True) -> dict:
+        """
+        :param copy: bool - False makes the arrays of coded columns and dates share memory with an unfiltered
+            frame instead of copying them; the frame then cannot be extended until those arrays are released
+        :return: dict of column to numpy array; coded columns give their codes (see categories) and dates
+            seconds since the epoch, and other columns object arrays
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('SearchFrame.to_numpy requires numpy; '
+                              'install it with "pip install vizivault[analytics]"')
+        columns = self.__columns
+        # The trailing None stops numpy from turning values that are lists of equal length into a 2-D array
+        arrays = {'dataPointId': numpy.array(columns.data_point_ids, dtype=object),
+                  'value': numpy.array(columns.values + [None], dtype=object)[:-1]}
+        for name, codes in columns.codes.items():
+            arrays[name] = numpy.frombuffer(codes, dtype=f'i{codes.itemsize}')
+        for name, timestamps in columns.timestamps.items():
+            arrays[name] = numpy.frombuffer(timestamps, dtype='f8')
+        if self.__rows is not None:
+            # Indexing copies
+            rows = numpy.frombuffer(self.__rows, dtype='i8')
+            arrays = {name: values[rows] for name, values in arrays.items()}
+        elif copy:
+            arrays.update((name, arrays[name].copy()) for name in chain(columns.codes, columns.timestamps))
+        return arrays
+
+    def to_pandas(self):
+        """
+        :return: pandas.DataFrame - coded columns as categoricals over the frame's codes, dates as UTC
+            datetimes, and tags and regulations as lists
+        """
+        try:
+            import pandas
+        except ImportError:
+            raise ImportError('SearchFrame.to_pandas requires pandas; '
+                              'install it with "pip install vizivault[analytics]"')
+        arrays = self.to_numpy()
+        frame = {'dataPointId': arrays['dataPointId']}
+        for name in self.CODED_COLUMNS:
+            frame[name] = pandas.Categorical.from_codes(arrays[name], categories=self.categories(name))
+        frame['value'] = arrays['value']
+        for name in self.LIST_COLUMNS:
+            frame[name] = self.column(name)
+        for name in self.TIMESTAMP_COLUMNS:
+            frame[name] = pandas.to_datetime(arrays[name], unit='s', utc=True)
+        return pandas.DataFrame(frame)
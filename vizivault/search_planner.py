@@ -0,0 +1,188 @@
+import copy
+import itertools
+from typing import List
+
+from vizivault.attribute import Attribute
+from vizivault.bulk import bounded_map
+from vizivault.search_request import SearchRequest
+
+
+def _chunks(items: list, size: int) -> list:
+    return [items[start:start + size] for start in range(0, len(items), size)] or [[]]
+
+
+def _value_attribute(value):
+    return value['attribute'] if isinstance(value, dict) else value.attribute
+
+
+def default_sort_key(record: dict):
+    return record.get('userId') or '', record.get('createdDate') or '', record.get('dataPointId') or ''
+
+
+class SearchPlan:
+    """
+    The sub-queries a SearchRequest is split into.
+    """
+
+    def __init__(self, search_request: SearchRequest, sub_requests: List[SearchRequest], chunk_counts: tuple,
+                 max_workers: int):
+        self.search_request = search_request
+        self.sub_requests = sub_requests
+        self.chunk_counts = chunk_counts
+        self.max_workers = max_workers
+
+    @property
+    def split(self) -> bool:
+        return len(self.sub_requests) > 1
+
+    def __str__(self):
+        values, attributes, regulations = self.chunk_counts
+        lines = [f'{len(self.sub_requests)} sub-quer{"ies" if self.split else "y"} '
+                 f'({values} value x {attributes} attribute x {regulations} regulation chunks), '
+                 f'up to {self.max_workers} at a time']
+        for number, sub_request in enumerate(self.sub_requests, start=1):
+            lines.append(f'  {number}: {len(sub_request.values)} values, {len(sub_request.attributes)} attributes, '
+                         f'{len(sub_request.regulations)} regulations')
+        return '\n'.join(lines)
+
+
+class SearchPlanner:
+    """
+    Splits a SearchRequest with too many values, attributes or regulations for the vault into smaller ones, runs
+    them concurrently and merges their results.
+
+    The split assumes the vault's search semantics: a user matches if any of the values matches, and results are
+    the records of matching users whose attribute is one of the value or requested attributes and that have any
+    of the regulations. Every sub-query therefore asks for all the attributes of the original request's values,
+    and results are the union of the sub-queries' results, deduplicated by data point ID.
+    """
+
+    def __init__(self, vault, max_values: int = 50, max_attributes: int = 100, max_regulations: int = 50,
+                 max_workers: int = 4, page_size: int = 1000, sort_key=default_sort_key):
+        """
+        :param vault: ViziVault
+        :param max_values: int - value queries per sub-query
+        :param max_attributes: int - attributes per sub-query
+        :param max_regulations: int - regulations per sub-query
+        :param max_workers: int - sub-queries running at once
+        :param page_size: int - records requested at a time from each sub-query
+        :param sort_key: callable taking a record dict - the order the vault returns search results in, which
+            merged results are put in to keep pages consistent
+        """
+        self.vault = vault
+        self.max_values = max_values
+        self.max_attributes = max_attributes
+        self.max_regulations = max_regulations
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.sort_key = sort_key
+
+    def plan(self, search_request: SearchRequest) -> SearchPlan:
+        """
+        :param search_request: SearchRequest
+        :return: SearchPlan
+        """
+        if not isinstance(search_request, SearchRequest):
+            raise TypeError('Argument search_request is not of type SearchRequest')
+        values = list(search_request.values)
+        attributes = list(search_request.attributes)
+        regulations = list(search_request.regulations)
+        if len(values) > self.max_values:
+            # Users matched by one chunk of values must still get the attributes of the other chunks' values
+            attributes = list(dict.fromkeys(attributes + [_value_attribute(value) for value in values]))
+
+        value_chunks = _chunks(values, self.max_values)
+        attribute_chunks = _chunks(attributes, self.max_attributes)
+        regulation_chunks = _chunks(regulations, self.max_regulations)
+        if len(value_chunks) == len(attribute_chunks) == len(regulation_chunks) == 1:
+            return SearchPlan(search_request, [search_request], (1, 1, 1), self.max_workers)
+
+        sub_requests = []
+        for value_chunk, attribute_chunk, regulation_chunk in itertools.product(value_chunks, attribute_chunks,
+                                                                                regulation_chunks):
+            sub_request = copy.copy(search_request)
+            sub_request.values = value_chunk
+            sub_request.attributes = attribute_chunk
+            sub_request.regulations = regulation_chunk
+            sub_requests.append(sub_request)
+        return SearchPlan(search_request, sub_requests,
+                          (len(value_chunks), len(attribute_chunks), len(regulation_chunks)), self.max_workers)
+
+    def explain(self, search_request: SearchRequest, page: int = None, count: int = None) -> str:
+        """
+        Describes how a search would be run, without running it.
+
+        :param search_request: SearchRequest
+        :param page: int - page that would be requested
+        :param count: int - page size that would be requested
+        :return: str
+        """
+        plan = self.plan(search_request)
+        explanation = str(plan)
+        if page is not None and count is not None and plan.split:
+            explanation += (f'\npage {page} of {count}: the first {(page + 1) * count} results of each sub-query are '
+                            f'merged in vault order, deduplicated by data point ID, and results '
+                            f'{page * count} to {(page + 1) * count - 1} returned')
+        return explanation
+
+    def search(self, search_request: SearchRequest, page: int, count: int) -> List[Attribute]:
+        """
+        Like ViziVault.search, for requests of any size.
+
+        :param search_request: SearchRequest
+        :param page: (int) - The page offset of search results
+        :param count: (int) - The number of attributes in a result
+        :return: List of attributes found in search
+        """
+        plan = self.plan(search_request)
+        if not plan.split:
+            return self.vault.search(search_request, page, count)
+        # A result among the first `needed` of the merged results is among the first `needed` of its sub-query
+        needed = (page + 1) * count
+        results = bounded_map(self.vault.bind_call_options(lambda sub_request: self.__first(sub_request, needed)),
+                              plan.sub_requests, max_workers=self.max_workers)
+        merged = self.__merge(results)
+        merged.sort(key=self.sort_key)
+        return [Attribute.from_json_dict(record) for record in merged[page * count:needed]]
+
+    def search_iter(self, search_request: SearchRequest):
+        """
+        Yields every attribute matching a search of any size, one sub-query's results at a time, with
+        sub-queries running concurrently. Results are not in vault order when the search is split.
+
+        :param search_request: SearchRequest
+        :return: generator of Attribute
+        """
+        plan = self.plan(search_request)
+        if not plan.split:
+            yield from self.vault.search_iter(search_request, page_size=self.page_size)
+            return
+        results = bounded_map(self.vault.bind_call_options(lambda sub_request: self.__first(sub_request, None)),
+                              plan.sub_requests, max_workers=self.max_workers)
+        seen = set()
+        for result in results:
+            if not result.ok:
+                raise result.error
+            for record in result.value:
+                if record.get('dataPointId') not in seen:
+                    seen.add(record.get('dataPointId'))
+                    yield Attribute.from_json_dict(record)
+
+    def __first(self, sub_request: SearchRequest, needed) -> list:
+        records = []
+        page_size = self.page_size if needed is None else min(needed, self.page_size)
+        for page in self.vault.search_pages(sub_request, page_size=page_size, prefetch=0):
+            records.extend(page)
+            if needed is not None and len(records) >= needed:
+                return records[:needed]
+        return records
+
+    @staticmethod
+    def __merge(results) -> list:
+        merged = {}
+        for result in results:
+            if not result.ok:
+                raise result.error
+            for record in result.value:
+                merged.setdefault(record.get('dataPointId'), record)
+        return list(merged.values())
@@ -2,6 +2,8 @@ from vizivault.json_object import JSONObject
 
 
 class SearchRequest(JSONObject):
+    __slots__ = ('regulations', 'values', 'attributes', 'sensitivity', 'userId', 'country', 'subdivision', 'city',
+                 'minCreatedDate', 'maxCreatedDate', 'minModifiedDate', 'maxModifiedDate')
 
     def __init__(self, attribute=None, value=None):
         super().__init__()
@@ -26,6 +28,8 @@ class SearchRequest(JSONObject):
         self.values.append(self.ValueSearchRequest(attribute, value))
 
     class ValueSearchRequest:
+        __slots__ = ('attribute', 'value')
+
         def __init__(self, attribute, value):
             self.attribute = attribute
             self.value = value
@@ -0,0 +1,103 @@
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',:]}'
+_decoder = json.JSONDecoder()
+
+
+class _Buffer:
+    """
+    Text decoded from a stream of byte chunks, of which only the part not parsed yet is kept.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.position = 0
+        self.exhausted = False
+
+    def fill(self) -> bool:
+        """
+        :return: bool - whether more text was read, False at the end of the stream
+        """
+        if self.exhausted:
+            return False
+        if self.position:
+            self.text = self.text[self.position:]
+            self.position = 0
+        for chunk in self.chunks:
+            if chunk:
+                self.text += self.decoder.decode(chunk)
+                return True
+        self.text += self.decoder.decode(b'', final=True)
+        self.exhausted = True
+        return False
+
+    def peek(self) -> str:
+        """
+        :return: str - the next character that is not whitespace, without consuming it; '' at the end
+        """
+        while True:
+            while self.position < len(self.text) and self.text[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.text):
+                return self.text[self.position]
+            if not self.fill():
+                return ''
+
+    def expect(self, character: str):
+        if self.peek() != character:
+            raise ValueError(f'Expected {character!r} at {self.text[self.position:self.position + 20]!r}')
+        self.position += 1
+
+    def value(self):
+        """
+        :return: the next JSON value, read from more chunks until it is complete
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.position)
+            except ValueError:
+                if self.fill():
+                    continue
+                raise
+            # A number can be cut at a chunk boundary, e.g. 3.5 read as 3, so it is only complete once it is
+            # followed by a delimiter
+            if (end == len(self.text) or self.text[end] not in _DELIMITERS) and self.fill():
+                continue
+            self.position = end
+            return value
+
+
+def iter_json_array(chunks, key: str = 'data'):
+    """
+    Yields the elements of an array in a JSON object, e.g. the data of a vault response, as each one is read,
+    without holding the whole document in memory. Only the current chunk and element are kept.
+
+    :param chunks: iterable of bytes - the document, in pieces of any size
+    :param key: str - the key of the array in the top-level object
+    :return: generator of the decoded elements
+    """
+    buffer = _Buffer(chunks)
+    buffer.expect('{')
+    if buffer.peek() == '}':
+        return
+    while True:
+        name = buffer.value()
+        buffer.expect(':')
+        if name == key and buffer.peek() == '[':
+            buffer.expect('[')
+            if buffer.peek() == ']':
+                return
+            while True:
+                yield buffer.value()
+                if buffer.peek() == ']':
+                    return
+                buffer.expect(',')
+        buffer.value()
+        if buffer.peek() == '}':
+            return
+        buffer.expect(',')
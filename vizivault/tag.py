@@ -2,6 +2,7 @@ from vizivault.json_object import JSONObject
 
 
 class Tag(JSONObject):
+    __slots__ = ('name', 'createdDate', 'modifiedDate')
 
     def __init__(self, name=None):
         super().__init__()
@@ -1,8 +1,20 @@
 import pytest
 import os
 import csv
-from vizivault import ViziVault, SearchRequest, User, AttributeDefinition, Attribute, Tag, VaultResponseException,\
-    Regulation
+import gzip
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from vizivault import ViziVault, AsyncViziVault, SearchRequest, User, AttributeDefinition, Attribute, Tag,\
+    VaultResponseException, Regulation, RetryPolicy, CircuitBreaker, CircuitState, VaultCommunicationException,\
+    VaultCircuitOpenException, VaultDeadlineExceededException, HedgingPolicy, AdaptiveConcurrencyLimiter, TokenBucket,\
+    SearchCache, SearchFrame, SearchPlanner, MetadataCatalog,\
+    EntityCache, MetadataSnapshot, LazyAttributeList
+from vizivault.purge import PurgeJob, read_ids, main as purge_main
+from vizivault.importer import Importer, read_rows
+from vizivault.exporter import SearchExporter
+from vizivault.streaming import iter_json_array
 from vizivault.rules import ConjunctiveRule, AttributeRule, AttributeListOperator, UserRule, UserValuePredicate
 
 
@@ -82,6 +94,818 @@ def test_repeated_attribute_save(vault):
         vault.purge(new_user.id)
 
 
+def test_pooled_client(new_user):
+    with open('./vizivault/tests/resources/test_decryption_key.txt', 'r') as decryption_file:
+        decryption_key = decryption_file.read()
+
+    with ViziVault(base_url='http://localhost:8083', api_key='12345', decryption_key=decryption_key,
+                   pool_maxsize=2, pool_block=True) as pooled_vault:
+        for _ in range(3):
+            assert pooled_vault.find_by_user(new_user.id).get_attribute('TestAttribute1').value == 'Example1'
+
+
+def test_async_client(vault, attribute_def1):
+    pytest.importorskip("aiohttp")
+
+    async def round_trip():
+        async with AsyncViziVault(base_url='http://localhost:8083', api_key='12345',
+                                  encryption_key=vault.encryption_key,
+                                  decryption_key=vault.decryption_key) as async_vault:
+            users = [User(f"exampleAsyncUser{index}") for index in range(20)]
+            for index, user in enumerate(users):
+                user.add_attribute(attribute=attribute_def1.name, value=f"Example{index}")
+            try:
+                await asyncio.gather(*[async_vault.save(user) for user in users])
+                received_users = await asyncio.gather(*[async_vault.find_by_user(user.id) for user in users])
+                for index, received_user in enumerate(received_users):
+                    assert received_user.get_attribute(attribute_def1.name).value == f"Example{index}"
+
+                with pytest.raises(VaultResponseException):
+                    await async_vault.get_tag("tag5")
+            finally:
+                await asyncio.gather(*[async_vault.purge(user.id) for user in users])
+
+    asyncio.run(round_trip())
+
+
+def test_retry_policy():
+    retry_policy = RetryPolicy(max_attempts=3, backoff_base=0.5, backoff_max=1.0, max_retry_after=10)
+
+    assert retry_policy.should_retry(attempt=1, idempotent=True, status=503)
+    assert not retry_policy.should_retry(attempt=3, idempotent=True, status=503)
+    assert not retry_policy.should_retry(attempt=1, idempotent=True, status=404)
+    assert not retry_policy.should_retry(attempt=1, idempotent=False, status=503)
+    assert retry_policy.should_retry(attempt=1, idempotent=False, status=429)
+    assert not retry_policy.should_retry(attempt=1, idempotent=True, status=429, retry_after="120")
+
+    assert retry_policy.backoff(attempt=2, retry_after="7") == 7
+    assert all(0 <= retry_policy.backoff(attempt=5) <= 1.0 for _ in range(100))
+
+
+def test_circuit_breaker():
+    circuit_breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    unreachable_vault = ViziVault(base_url='http://localhost:1', api_key='12345',
+                                  retry_policy=RetryPolicy(max_attempts=1), circuit_breaker=circuit_breaker)
+
+    for _ in range(2):
+        with pytest.raises(VaultCommunicationException):
+            unreachable_vault.get_tags()
+    assert circuit_breaker.state == CircuitState.OPEN
+
+    with pytest.raises(VaultCircuitOpenException):
+        unreachable_vault.get_tags()
+    assert circuit_breaker.stats()['rejected_calls'] == 1
+
+
+def test_circuit_breaker_half_open_timeout():
+    circuit_breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05, half_open_timeout=0.1)
+    circuit_breaker.record_failure()
+    time.sleep(0.06)
+    # A trial whose outcome is never reported stops blocking others after half_open_timeout
+    assert circuit_breaker.before_request()
+    with pytest.raises(VaultCircuitOpenException):
+        circuit_breaker.before_request()
+    time.sleep(0.11)
+    assert circuit_breaker.before_request()
+    circuit_breaker.release_trial()
+    assert circuit_breaker.before_request()
+
+
+def test_circuit_breaker_trial_without_outcome():
+    circuit_breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    rate_limit = TokenBucket(rate=0.001, capacity=1)
+    limited_vault = ViziVault(base_url='http://localhost:1', api_key='12345', timeout=(0.05, 1),
+                              retry_policy=RetryPolicy(max_attempts=1), circuit_breaker=circuit_breaker,
+                              rate_limits={'read': rate_limit})
+    with pytest.raises(VaultCommunicationException):
+        limited_vault.get_tags()
+    assert circuit_breaker.state == CircuitState.OPEN
+    time.sleep(0.06)
+
+    # The trial request never gets past the rate limit, so its slot is given back
+    for _ in range(2):
+        with pytest.raises(VaultCommunicationException, match='rate limit'):
+            limited_vault.get_tags()
+    assert circuit_breaker.state == CircuitState.HALF_OPEN
+
+
+def test_deadline(vault, new_user):
+    new_user.add_attribute(attribute='TestAttribute1', value="Example2")
+    with pytest.raises(VaultDeadlineExceededException):
+        with vault.deadline(0):
+            vault.save(new_user)
+
+    with vault.deadline(30), vault.call_timeout(connect=5, read=10):
+        vault.save(new_user)
+    assert vault.find_by_user(new_user.id).get_attribute('TestAttribute1').value == 'Example2'
+
+    # Calls that fan out to worker threads honour the caller's deadline too
+    with vault.deadline(0):
+        results = list(vault.find_by_users([new_user.id]))
+        assert isinstance(results[0].error, VaultDeadlineExceededException)
+        with pytest.raises(VaultDeadlineExceededException):
+            list(vault.search_iter(SearchRequest('TestAttribute1', 'Example2')))
+        with pytest.raises(VaultDeadlineExceededException):
+            list(vault.search_parallel(SearchRequest('TestAttribute1', 'Example2')))
+
+
+def test_hedged_reads(new_user):
+    hedging_policy = HedgingPolicy(percentile=50, min_samples=5)
+    with ViziVault(base_url='http://localhost:8083', api_key='12345', hedging_policy=hedging_policy) as hedged_vault:
+        for _ in range(20):
+            received_user = hedged_vault.find_by_user(new_user.id)
+            assert received_user.get_attribute('TestAttribute1').value == 'Example1'
+            for attribute in received_user.get_attributes():
+                assert hedged_vault.get_data_point(attribute.dataPointId).value == attribute.value
+    assert hedging_policy.hedge_delay() is not None
+
+
+def test_compression(vault, attribute_def2):
+    compressing_vault = ViziVault(base_url='http://localhost:8083', api_key='12345',
+                                  encryption_key=vault.encryption_key, decryption_key=vault.decryption_key,
+                                  compress_requests_above=0, request_compression='deflate')
+    new_user = User("exampleCompressedUser")
+    for index in range(200):
+        new_user.add_attribute(attribute=attribute_def2.name, value=f"Example{index}")
+
+    try:
+        compressing_vault.save(new_user)
+        received_user = compressing_vault.find_by_user(new_user.id)
+        assert len(received_user.get_attribute(attribute_def2.name)) == 200
+    finally:
+        compressing_vault.purge(new_user.id)
+
+    with pytest.raises(ValueError):
+        ViziVault(base_url='http://localhost:8083', api_key='12345', request_compression='brotli')
+
+
+def test_token_bucket():
+    token_bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(11):
+        assert token_bucket.acquire()
+    assert time.monotonic() - start >= 0.19
+    assert not token_bucket.acquire(tokens=1, timeout=0.01)
+    with pytest.raises(ValueError):
+        token_bucket.acquire(tokens=10)
+
+
+def test_concurrency_governor(new_user):
+    concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4)
+    governed_vault = ViziVault(base_url='http://localhost:8083', api_key='12345',
+                               concurrency_limiter=concurrency_limiter,
+                               rate_limits={'read': TokenBucket(rate=1000), 'search': TokenBucket(rate=10)})
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        received_users = list(executor.map(lambda _: governed_vault.find_by_user(new_user.id), range(64)))
+    assert all(user.get_attribute('TestAttribute1').value == 'Example1' for user in received_users)
+    assert concurrency_limiter.stats()['in_flight'] == 0
+    assert 1 <= concurrency_limiter.limit <= 4
+
+    with pytest.raises(ValueError):
+        ViziVault(base_url='http://localhost:8083', api_key='12345', rate_limits={'reads': TokenBucket(rate=1)})
+
+
+def test_clear_attribute(vault, new_user):
+    received_user = vault.find_by_user(new_user.id)
+    received_user.clear_attribute('TestAttribute2')
+    assert received_user.get_attribute('TestAttribute2') is None
+    assert received_user.deleted_attributes == ['TestAttribute2']
+
+    vault.save(received_user)
+    assert received_user.deleted_attributes == []
+    assert vault.find_by_user(new_user.id).get_attribute('TestAttribute2') is None
+
+
+def test_save_many(vault, attribute_def1):
+    users = [User(f"exampleBulkUser{index}") for index in range(25)]
+    for index, user in enumerate(users):
+        user.add_attribute(attribute=attribute_def1.name, value=f"Example{index}")
+    users[7].add_attribute(attribute='InvalidAttribute', value="ExampleA")
+
+    try:
+        results = list(vault.save_many(iter(users), max_workers=4, ordered=True))
+        assert [result.item for result in results] == users
+        assert [result.ok for result in results] == [index != 7 for index in range(25)]
+        assert isinstance(results[7].error, VaultResponseException)
+
+        for index, user in enumerate(users):
+            assert len(user.changed_attributes) == (2 if index == 7 else 0)
+        assert vault.find_by_user(users[24].id).get_attribute(attribute_def1.name).value == "Example24"
+    finally:
+        for user in users:
+            vault.purge(user.id)
+
+
+def test_find_by_users(vault, new_user):
+    user_ids = [new_user.id, "exampleMissingUser", new_user.id]
+
+    results = list(vault.find_by_users(user_ids, max_workers=2, ordered=True))
+    assert [result.item for result in results] == user_ids
+    assert results[0].value.get_attribute('TestAttribute1').value == 'Example1'
+    assert results[1].missing and results[1].value is None
+    assert results[2].ok
+
+    results = list(vault.find_by_entities(iter([new_user.id] * 5)))
+    assert all(result.value.get_attribute('TestAttribute1').value == 'Example1' for result in results)
+
+
+def test_purge_job(vault, attribute_def1, tmp_path):
+    users = [User(f"examplePurgeUser{index}") for index in range(10)]
+    for user in users:
+        user.add_attribute(attribute=attribute_def1.name, value="ExampleA")
+    assert all(result.ok for result in vault.save_many(users))
+
+    ids_file = tmp_path / "ids.txt"
+    ids_file.write_text("\n".join(user.id for user in users) + "\n\n")
+    checkpoint_file = tmp_path / "checkpoint.log"
+    # The first three were purged by an earlier run, which died while writing the fourth
+    checkpoint_file.write_text("".join(f"{user.id}\n" for user in users[:3]) + users[3].id[:5])
+
+    report = PurgeJob(vault, checkpoint_path=str(checkpoint_file), max_workers=4).run(read_ids(str(ids_file)))
+    assert (report.skipped, report.purged, report.failed) == (3, 7, 0)
+    assert vault.find_by_user(users[3].id).get_attributes() == []
+    assert vault.find_by_user(users[0].id).get_attribute(attribute_def1.name).value == "ExampleA"
+    assert set(checkpoint_file.read_text().split()) >= {user.id for user in users}
+
+    assert purge_main([str(ids_file), '--checkpoint', str(checkpoint_file), '--base-url', 'http://localhost:8083',
+                       '--api-key', '12345']) == 0
+    assert all(result.ok for result in vault.purge_many(user.id for user in users[:3]))
+
+
+def test_importer(vault, attribute_def1, attribute_def2, tmp_path):
+    address_def = AttributeDefinition(name="BillingAddress", schema={"street": "string", "city": "string"})
+    vault.store_attribute_definition(attribute_definition=address_def)
+
+    csv_file = tmp_path / "users.csv"
+    csv_file.write_text("USER_ID,TEST_ATTRIBUTE_1,testattribute2,Street,CITY,Unknown\n"
+                        "exampleImportUser1,Example1,ExampleA,1 Hacker Way,Menlo Park,x\n"
+                        "exampleImportUser1,,ExampleB,,,\n"
+                        ",Example2,,,,\n"
+                        "exampleImportUser2,Example3,,,,,too many\n"
+                        "exampleImportUser3,,,,,\n"
+                        "exampleImportUser4,Example4,,,,\n")
+    ndjson_file = tmp_path / "users.ndjson"
+    ndjson_file.write_text('{"id": "exampleImportUser5", "first": "Example5"}\n{"id": \n')
+    rejects_file = tmp_path / "rejects.ndjson"
+
+    try:
+        importer = Importer(vault, user_id_column="USER_ID", checkpoint_path=str(tmp_path / "csv.checkpoint"),
+                            rejects_path=str(rejects_file), max_workers=2)
+        report = importer.run(read_rows(str(csv_file)))
+        assert (report.rows_read, report.rows_rejected, report.users_saved) == (6, 3, 2)
+        assert report.unmapped_columns == {"Unknown"}
+        assert [json.loads(line)["row"] for line in rejects_file.read_text().splitlines()] == [3, 4, 5]
+
+        received_user = vault.find_by_user("exampleImportUser1")
+        assert received_user.get_attribute(attribute_def1.name).value == "Example1"
+        assert sorted(attribute.value for attribute in received_user.get_attribute(attribute_def2.name)) == \
+            ["ExampleA", "ExampleB"]
+        assert received_user.get_attribute("BillingAddress").value == {"street": "1 Hacker Way", "city": "Menlo Park"}
+
+        report = importer.run(read_rows(str(csv_file)))
+        assert (report.rows_skipped, report.users_saved) == (6, 0)
+
+        importer = Importer(vault, user_id_column="id", column_map={"first": attribute_def1.name},
+                            checkpoint_path=str(tmp_path / "ndjson.checkpoint"), rejects_path=str(rejects_file))
+        report = importer.run(read_rows(str(ndjson_file)))
+        assert (report.users_saved, report.rows_rejected) == (1, 1)
+        assert vault.find_by_user("exampleImportUser5").get_attribute(attribute_def1.name).value == "Example5"
+        # Only rows up to the last saved user are checkpointed, so the trailing rejected row is rejected again
+        report = importer.run(read_rows(str(ndjson_file)))
+        assert (report.rows_skipped, report.users_saved, report.rows_rejected) == (1, 0, 1)
+        assert [json.loads(line)["row"] for line in rejects_file.read_text().splitlines()] == [3, 4, 5, 2, 2]
+
+        numeric_file = tmp_path / "numeric.ndjson"
+        numeric_file.write_text('{"id": 7, "second": "ExampleA"}\n{"id": 7, "second": "ExampleB"}\n'
+                                '{"id": 7, "second": "ExampleC"}\n{"id": 0, "second": "Example0"}\n')
+        report = Importer(vault, user_id_column="id", column_map={"second": attribute_def2.name},
+                          max_workers=4).run(read_rows(str(numeric_file)))
+        assert (report.users_saved, report.rows_rejected) == (2, 0)
+        assert sorted(attribute.value for attribute in vault.find_by_user("7").get_attribute(attribute_def2.name)) \
+            == ["ExampleA", "ExampleB", "ExampleC"]
+        assert vault.find_by_user("0").get_attribute(attribute_def2.name).value == "Example0"
+    finally:
+        for user_id in [f"exampleImportUser{index}" for index in range(1, 6)] + ["7", "0"]:
+            vault.purge(user_id)
+
+
+def test_search_iter(vault, attribute_def1):
+    users = [User(f"exampleSearchIterUser{index}") for index in range(5)]
+    for user in users:
+        user.add_attribute(attribute=attribute_def1.name, value="ExampleIter")
+    all(result.ok for result in vault.save_many(users))
+    search_request = SearchRequest(attribute_def1.name, "ExampleIter")
+
+    try:
+        for page_size, prefetch in [(2, 1), (5, 2), (10, 0)]:
+            results = list(vault.search_iter(search_request, page_size=page_size, prefetch=prefetch))
+            assert sorted(result.userId for result in results) == [user.id for user in users]
+            assert all(isinstance(result, Attribute) for result in results)
+
+        assert [len(page) for page in vault.search_pages(search_request, page_size=2, start_page=1)] == [2, 1]
+
+        results = vault.search_iter(search_request, page_size=1, prefetch=3)
+        assert next(results).attribute == attribute_def1.name
+        results.close()
+    finally:
+        all(vault.purge_many(user.id for user in users))
+
+
+def test_search_parallel(vault, attribute_def1, monkeypatch):
+    users = [User(f"exampleParallelUser{index}") for index in range(7)]
+    for user in users:
+        user.add_attribute(attribute=attribute_def1.name, value="ExampleParallel")
+    all(result.ok for result in vault.save_many(users))
+    search_request = SearchRequest(attribute_def1.name, "ExampleParallel")
+
+    requested_pages = []
+    search_records = vault.search_records
+
+    def recording_search_records(request, page, count):
+        requested_pages.append(page)
+        return search_records(request, page, count)
+    monkeypatch.setattr(vault, "search_records", recording_search_records)
+
+    try:
+        results = list(vault.search_parallel(search_request, page_size=2, max_workers=3))
+        assert [result.dataPointId for result in results] == \
+            [result.dataPointId for result in vault.search_iter(search_request, page_size=2)]
+        assert sorted(result.userId for result in results) == [user.id for user in users]
+
+        results = list(vault.search_parallel(search_request, page_size=2, max_workers=3, ordered=False))
+        assert sorted(result.userId for result in results) == [user.id for user in users]
+        assert len({result.dataPointId for result in results}) == len(results)
+
+        # Beyond the estimated 4 pages, pages are fetched one at a time, so nothing past the last is requested
+        requested_pages.clear()
+        results = list(vault.search_parallel(search_request, page_size=2, max_workers=8, estimated_total=7))
+        assert len(results) == 7
+        assert sorted(requested_pages) == [0, 1, 2, 3]
+    finally:
+        monkeypatch.undo()
+        all(vault.purge_many(user.id for user in users))
+
+
+def test_search_cache(attribute_def1, attribute_def2):
+    search_cache = SearchCache(max_entries=2, ttl=60)
+    cached_vault = ViziVault(base_url='http://localhost:8083', api_key='12345', search_cache=search_cache)
+    user = User("exampleCachedSearchUser")
+    user.add_attribute(attribute=attribute_def1.name, value="ExampleCached")
+    cached_vault.save(user)
+
+    try:
+        search_request = SearchRequest(attribute_def1.name, "ExampleCached")
+        search_request.attributes = [attribute_def1.name, attribute_def2.name]
+        assert len(cached_vault.search(search_request, 0, 10)) == 1
+        reordered_request = SearchRequest(attribute_def1.name, "ExampleCached")
+        reordered_request.attributes = [attribute_def2.name, attribute_def1.name]
+        assert len(cached_vault.search(reordered_request, 0, 10)) == 1
+        assert (search_cache.hits, search_cache.misses) == (1, 1)
+
+        # Results are copies, so changing them does not change the cache
+        cached_vault.search(search_request, 0, 10)[0].value = "Changed"
+        assert cached_vault.search(search_request, 0, 10)[0].value == "ExampleCached"
+
+        # A write to an unrelated attribute of another user keeps the entry, one that can match drops it
+        other_user = User("exampleUncachedSearchUser")
+        other_user.add_attribute(attribute="ExampleOtherAttribute", value="ExampleCached")
+        search_cache.invalidate_entity(other_user.id, {"ExampleOtherAttribute"})
+        assert len(search_cache) == 1
+        user.add_attribute(attribute=attribute_def2.name, value="ExampleB")
+        cached_vault.save(user)
+        assert len(search_cache) == 0
+        assert len(cached_vault.search(search_request, 0, 10)) == 2
+
+        cached_vault.purge(user.id)
+        assert cached_vault.search(search_request, 0, 10) == []
+        assert search_cache.stats()["invalidations"] == 2
+    finally:
+        cached_vault.purge(user.id)
+        cached_vault.close()
+
+
+def test_search_frame(vault, attribute_def1, attribute_def2):
+    users = [User(f"exampleFrameUser{index}") for index in range(4)]
+    for index, user in enumerate(users):
+        user.add_attribute(attribute=attribute_def1.name, value="ExampleFrame")
+        if index % 2:
+            attribute = Attribute(attribute=attribute_def2.name)
+            attribute.value = f"ExampleB{index}"
+            attribute.tags = ["tagFrame"]
+            user.add_attribute(attribute)
+    all(result.ok for result in vault.save_many(users))
+
+    try:
+        search_request = SearchRequest(attribute_def1.name, "ExampleFrame")
+        search_request.attributes = [attribute_def2.name]
+        frame = vault.search_frame(search_request, page_size=2)
+        assert len(frame) == 6
+        assert frame.count_by("attribute") == {attribute_def1.name: 4, attribute_def2.name: 2}
+        assert frame.count_by("tags") == {"tagFrame": 2}
+
+        tagged = frame.filter(attribute=attribute_def2.name, tag="tagFrame")
+        assert sorted(tagged.column("value")) == ["ExampleB1", "ExampleB3"]
+        assert sorted(frame.group_by("userId")) == [user.id for user in users]
+        assert len(frame.filter(user_id=[users[0].id, users[1].id], where=lambda value: value != "ExampleFrame")) == 1
+        assert len(frame.filter(user_id="exampleUnknownUser")) == 0
+
+        attributes = {attribute.dataPointId: attribute for attribute in vault.search_iter(search_request)}
+        for attribute in frame:
+            assert (attribute.userId, attribute.attribute, attribute.value, attribute.tags) == \
+                (attributes[attribute.dataPointId].userId, attributes[attribute.dataPointId].attribute,
+                 attributes[attribute.dataPointId].value, attributes[attribute.dataPointId].tags)
+    finally:
+        all(vault.purge_many(user.id for user in users))
+        vault.delete_tag("tagFrame")
+
+
+def test_search_frame_to_numpy():
+    numpy = pytest.importorskip("numpy")
+    frame = SearchFrame.from_records([
+        {"dataPointId": "1", "userId": "exampleUser", "attribute": "TestAttribute1", "sensitivity": None,
+         "value": "ExampleA", "regulations": [], "tags": ["tag1"], "createdDate": "2021-03-10T17:05:27+00:00",
+         "modifiedDate": None},
+        {"dataPointId": "2", "userId": "exampleUser2", "attribute": "TestAttribute1", "sensitivity": None,
+         "value": "ExampleB", "regulations": [], "tags": [], "createdDate": None, "modifiedDate": None}])
+    arrays = frame.to_numpy()
+    assert [frame.categories("userId")[code] for code in arrays["userId"]] == ["exampleUser", "exampleUser2"]
+    assert arrays["createdDate"][0] == 1615395927.0 and numpy.isnan(arrays["createdDate"][1])
+    assert list(frame.filter(tag="tag1").to_numpy()["value"]) == ["ExampleA"]
+
+    tagged = frame.filter(tag="tag1")
+    shared = frame.to_numpy(copy=False)
+    with pytest.raises(BufferError):
+        frame.append({"dataPointId": "3", "userId": "exampleUser", "attribute": "TestAttribute1", "tags": ["tag1"]})
+    assert len(frame) == 2 and all(len(values) == 2 for values in frame.to_numpy().values())
+    del shared
+    frame.append({"dataPointId": "3", "userId": "exampleUser", "attribute": "TestAttribute1", "tags": ["tag1"]})
+    assert len(frame) == 3 and list(arrays["userId"]) == [0, 1] and len(tagged) == 1
+    assert all(len(values) == 3 for values in frame.to_numpy().values())
+
+    # A malformed date fails the batch before any column grows
+    with pytest.raises(ValueError):
+        frame.extend([{"dataPointId": "4", "createdDate": "2021-03-10T17:05:27+00:00", "tags": ["tag1"]},
+                      {"dataPointId": "5", "createdDate": "March 10"}])
+    assert len(frame) == 3 and len(list(frame)) == 3 and len(frame.filter(tag="tag1")) == 2
+    assert all(len(values) == 3 for values in frame.to_numpy().values())
+
+
+def test_search_planner(vault, attribute_def1, attribute_def2):
+    users = [User(f"examplePlannerUser{index}") for index in range(6)]
+    for index, user in enumerate(users):
+        user.add_attribute(attribute=attribute_def1.name, value=f"ExamplePlanner{index}")
+        user.add_attribute(attribute=attribute_def2.name, value="ExampleB")
+    all(result.ok for result in vault.save_many(users))
+
+    try:
+        search_request = SearchRequest()
+        for index in range(6):
+            search_request.add_value_query(attribute_def1.name, f"ExamplePlanner{index}")
+        search_request.attributes = [attribute_def2.name]
+        expected = vault.search(search_request, 0, 100)
+        assert len(expected) == 12
+
+        planner = SearchPlanner(vault, max_values=2, max_attributes=1, max_workers=3, page_size=2)
+        plan = planner.plan(search_request)
+        assert len(plan.sub_requests) == 6
+        assert all(len(sub_request.values) <= 2 and len(sub_request.attributes) == 1
+                   for sub_request in plan.sub_requests)
+        assert planner.explain(search_request, page=1, count=5).startswith("6 sub-queries (3 value x 2 attribute")
+
+        for page in range(3):
+            assert [result.dataPointId for result in planner.search(search_request, page, 5)] == \
+                [result.dataPointId for result in vault.search(search_request, page, 5)]
+        assert sorted(result.dataPointId for result in planner.search_iter(search_request)) == \
+            sorted(result.dataPointId for result in expected)
+        assert not SearchPlanner(vault).plan(search_request).split
+    finally:
+        all(vault.purge_many(user.id for user in users))
+
+
+def test_search_exporter(vault, attribute_def1, tmp_path):
+    users = [User(f"exampleExportUser{index}") for index in range(5)]
+    for user in users:
+        user.add_attribute(attribute=attribute_def1.name, value="ExampleExport")
+    all(result.ok for result in vault.save_many(users))
+    search_request = SearchRequest(attribute_def1.name, "ExampleExport")
+
+    try:
+        output_file = tmp_path / "export.ndjson.gz"
+        checkpoint_file = tmp_path / "export.checkpoint"
+        report = SearchExporter(vault, search_request, str(output_file), page_size=2, projection=["userId", "value"],
+                                checkpoint_path=str(checkpoint_file)).run()
+        assert (report.records, report.pages) == (5, 3)
+        lines = gzip.decompress(output_file.read_bytes()).decode().splitlines()
+        assert sorted(json.loads(line)["userId"] for line in lines) == [user.id for user in users]
+        assert set(json.loads(lines[0])) == {"userId", "value"}
+
+        # Resume after the second page, with a partly written third page left behind
+        checkpoint_lines = checkpoint_file.read_text().splitlines()
+        checkpoint_file.write_text("\n".join(checkpoint_lines[:2]) + "\n")
+        with open(output_file, "ab") as output:
+            output.write(b"torn")
+        report = SearchExporter(vault, search_request, str(output_file), page_size=2, projection=["userId", "value"],
+                                checkpoint_path=str(checkpoint_file)).run()
+        assert (report.resumed_at_page, report.records) == (2, 1)
+        assert gzip.decompress(output_file.read_bytes()).decode().splitlines() == lines
+    finally:
+        all(vault.purge_many(user.id for user in users))
+
+
+def test_metadata_catalog(vault, attribute_def1, monkeypatch):
+    catalog = MetadataCatalog(ttl=0)
+    cached_vault = ViziVault(base_url='http://localhost:8083', api_key='12345', encryption_key=vault.encryption_key,
+                             decryption_key=vault.decryption_key, metadata_catalog=catalog)
+    statuses = []
+    send = cached_vault.session.request
+
+    def counting_request(*args, **kwargs):
+        response = send(*args, **kwargs)
+        statuses.append(response.status_code)
+        return response
+
+    monkeypatch.setattr(cached_vault.session, 'request', counting_request)
+    try:
+        # Stale entries are revalidated and answered without a body
+        assert cached_vault.get_attribute_definition(attribute_def1.name).name == attribute_def1.name
+        assert cached_vault.get_attribute_definition(attribute_def1.name).name == attribute_def1.name
+        assert statuses == [200, 304]
+        assert catalog.stats()["not_modified"] == 1
+
+        # Fresh entries are served without a request, until a store or delete through the client drops them
+        catalog.ttl = 300
+        catalog.clear()
+        statuses.clear()
+        cached_vault.store_tag(Tag("tagCatalog"))
+        assert cached_vault.get_tag("tagCatalog").name == "tagCatalog"
+        assert "tagCatalog" in [tag.name for tag in cached_vault.get_tags()]
+        assert "tagCatalog" in [tag.name for tag in cached_vault.get_tags()]
+        assert statuses == [200, 200, 200]
+        cached_vault.delete_tag("tagCatalog")
+        assert "tagCatalog" not in [tag.name for tag in cached_vault.get_tags()]
+
+        # Warming up caches every item, so reading one sends nothing
+        catalog.clear()
+        assert cached_vault.warm_metadata_catalog() >= 1
+        statuses.clear()
+        assert cached_vault.get_attribute_definition(attribute_def1.name).name == attribute_def1.name
+        assert statuses == []
+    finally:
+        vault.delete_tag("tagCatalog")
+        cached_vault.close()
+
+
+def test_entity_cache(vault, attribute_def1, attribute_def2):
+    entity_cache = EntityCache(max_entries=2, ttl=60)
+    cached_vault = ViziVault(base_url='http://localhost:8083', api_key='12345', encryption_key=vault.encryption_key,
+                             decryption_key=vault.decryption_key, entity_cache=entity_cache)
+    user = User("exampleCachedUser")
+    user.add_attribute(attribute=attribute_def1.name, value="ExampleCached")
+    cached_vault.save(user)
+
+    try:
+        # Every read gets its own copy, so local changes do not leak into the cache
+        found = cached_vault.find_by_user(user.id)
+        found.add_attribute(attribute=attribute_def2.name, value="ExampleUnsaved")
+        assert found.changed_attributes
+        found_again = cached_vault.find_by_user(user.id)
+        assert found_again is not found
+        assert found_again.get_attribute(attribute_def2.name) is None
+        assert not found_again.changed_attributes
+        assert cached_vault.get_user_attribute(user.id, attribute_def1.name)[0].value == "ExampleCached"
+        assert entity_cache.stats()["hits"] == 1
+
+        # Saving through the client drops the user's entries
+        found.add_attribute(attribute=attribute_def1.name, value="ExampleChanged")
+        cached_vault.save(found)
+        assert len(entity_cache) == 0
+        assert cached_vault.find_by_user(user.id).get_attribute(attribute_def1.name).value == "ExampleChanged"
+
+        # The least recently used entry is evicted first
+        cached_vault.find_by_entity(user.id)
+        cached_vault.get_user_attribute(user.id, attribute_def2.name)
+        assert len(entity_cache) == 2 and entity_cache.stats()["evictions"] == 1
+
+        cached_vault.purge(user.id)
+        assert len(entity_cache) == 0
+        assert cached_vault.find_by_user(user.id).get_attributes() == []
+    finally:
+        cached_vault.purge(user.id)
+        cached_vault.close()
+
+
+def test_metadata_snapshot(vault, attribute_def1, tmp_path):
+    path = str(tmp_path / "metadata.snapshot")
+    vault.store_tag(Tag("tagSnapshot"))
+    try:
+        assert vault.export_metadata_snapshot(path) >= 2
+        with MetadataSnapshot(path) as snapshot:
+            assert snapshot.get_attribute_definition(attribute_def1.name) == \
+                vault.get_attribute_definition(attribute_def1.name)
+            assert snapshot.get_tag("tagSnapshot").name == "tagSnapshot"
+            assert snapshot.keys("tags") == sorted(tag.name for tag in vault.get_tags())
+            with pytest.raises(KeyError):
+                snapshot.get_tag("tagSnapshotMissing")
+
+            # A refreshed snapshot replaces the file, which readers map again
+            assert not snapshot.reload_if_changed()
+            vault.delete_tag("tagSnapshot")
+            vault.export_metadata_snapshot(path)
+            assert snapshot.reload_if_changed()
+            assert snapshot.record("tags", "tagSnapshot") is None
+            assert os.listdir(str(tmp_path)) == ["metadata.snapshot"]
+
+            # Exported from the vault even while the catalog holds an older list
+            with ViziVault(base_url='http://localhost:8083', api_key='12345', decryption_key=vault.decryption_key,
+                           metadata_catalog=MetadataCatalog(ttl=300)) as cataloged_vault:
+                cataloged_vault.get_tags()
+                vault.store_tag(Tag("tagSnapshot"))
+                cataloged_vault.export_metadata_snapshot(path)
+                assert snapshot.reload_if_changed()
+                assert snapshot.get_tag("tagSnapshot").name == "tagSnapshot"
+    finally:
+        vault.delete_tag("tagSnapshot")
+
+
+def test_to_json_compact():
+    regulation = Regulation(name="Example regulation", key="EXAMPLE", rule=ConjunctiveRule())
+    regulation.rule.add_rule(UserRule("GEOGRAPHIC_REGION", UserValuePredicate.EQUALS, "Region1"))
+    search_request = SearchRequest("TestAttribute1", "Example1")
+    search_request.attributes = ["TestAttribute2"]
+    attribute_definition = AttributeDefinition("TestAttribute1", hint="Example hint")
+    for model in (regulation, search_request, attribute_definition, Attribute(attribute="TestAttribute1", value=1)):
+        compact = model.to_json(compact=True)
+        assert "\n" not in compact and ": " not in compact
+        assert json.loads(compact) == json.loads(model.to_json())
+    assert json.loads(attribute_definition.to_json(compact=True))["key"] == "TestAttribute1"
+    assert "default_encoder" not in regulation.to_json(compact=True)
+
+
+def test_json_backend_parity():
+    from vizivault import json_backend
+    regulation = Regulation(name="Règlement", key="EXAMPLE", rule=ConjunctiveRule())
+    regulation.rule.add_rule(AttributeRule(["TestAttribute1"], AttributeListOperator.ANY))
+    search_request = SearchRequest("TestAttribute1", "Example\u2028\x00/\"")
+    attribute = Attribute(attribute="TestAttribute1", value={"small": 1e-7, "large": 1e16, "float": 0.1,
+                                                             "big": 2 ** 70, "id": "6041e9,", "nested": [None, True]})
+    documents = [{"data": [1.5e300, -0.0, "é", {"1e5": [1e5]}]}, {1: "non-string key"}]
+    expected = [model.to_json_bytes() for model in (regulation, search_request, attribute)] + \
+        [json_backend._stdlib_dumps(document) for document in documents]
+    backend = json_backend.backend_name()
+    try:
+        for name in json_backend.available_backends():
+            json_backend.set_backend(name)
+            encoded = [model.to_json_bytes() for model in (regulation, search_request, attribute)] + \
+                [json_backend.dumps(document) for document in documents]
+            assert encoded == expected, name
+            assert [json_backend.loads(content) for content in encoded] == [json.loads(content) for content in expected]
+            assert json_backend.loads(b'{"data": [NaN, %d]}' % 2 ** 70)["data"][1] == 2 ** 70
+            for value in (1e-05, -2e-05, 1e16, 1e-7, float('nan'), float('inf'), -float('inf'), [None, 1e-05]):
+                assert json_backend.dumps(value) == json_backend._stdlib_dumps(value), (name, value)
+                assert json_backend.dumps({"data": [value]}) == json_backend._stdlib_dumps({"data": [value]}), name
+    finally:
+        json_backend.set_backend(backend)
+    assert json.loads(regulation.to_json_bytes()) == json.loads(regulation.to_json())
+    with pytest.raises(ValueError):
+        json_backend.set_backend("simplejson")
+
+
+def test_lazy_attributes(vault, new_user, attribute_def1, attribute_def2):
+    lazy_vault = ViziVault(base_url='http://localhost:8083', api_key='12345', encryption_key=vault.encryption_key,
+                           decryption_key=vault.decryption_key, lazy_attributes=True)
+    try:
+        user = lazy_vault.find_by_user(new_user.id)
+        assert user.get_attribute(attribute_def1.name).value == "Example1"
+        assert user.get_attribute(attribute_def1.name) is user.get_attribute(attribute_def1.name)
+        assert sorted(attribute.value for attribute in user.get_attribute(attribute_def2.name)) == \
+            ["ExampleA", "ExampleB"]
+
+        # Changes to attributes not built yet behave as they would on an eagerly built user
+        user = lazy_vault.find_by_user(new_user.id)
+        user.add_attribute(attribute=attribute_def2.name, value="ExampleC")
+        assert len(user.get_attribute(attribute_def2.name)) == 3
+        user.clear_attribute(attribute_def1.name)
+        assert user.get_attribute(attribute_def1.name) is None
+        assert len(user.get_attributes()) == 3
+
+        search_request = SearchRequest(attribute_def1.name, "Example1")
+        results = lazy_vault.search(search_request, 0, 10)
+        assert isinstance(results, LazyAttributeList) and len(results) == 1
+        assert results[0] is results[-1] and results[0].value == "Example1"
+        assert lazy_vault.search(SearchRequest(attribute_def1.name, "ExampleMissing"), 0, 10) == []
+    finally:
+        lazy_vault.close()
+
+
+def test_slotted_models():
+    attribute = Attribute(attribute="TestAttribute1", value="Example1", tags=["tag1"])
+    for model in (attribute, Tag("tag1"), Regulation(name="Example", key="EXAMPLE"), SearchRequest("a", "b")):
+        assert not hasattr(model, '__dict__')
+    assert attribute.to_json() == '{\n    "attribute": "TestAttribute1",\n    "regulations": [],\n    "tags": [\n' \
+                                  '        "tag1"\n    ],\n    "value": "Example1"\n}'
+    assert Regulation(name="Example", key="EXAMPLE").to_json(compact=True) == '{"key":"EXAMPLE","name":"Example"}'
+
+
+def test_iter_json_array():
+    document = json.dumps({"status": 200, "data": [{"value": "Exämple", "n": 12345}, [1, 2], 3.5e10, None]},
+                          ensure_ascii=False).encode('utf-8')
+    for chunk_size in (1, 2, 7, len(document)):
+        chunks = (document[start:start + chunk_size] for start in range(0, len(document), chunk_size))
+        assert list(iter_json_array(chunks)) == [{"value": "Exämple", "n": 12345}, [1, 2], 3.5e10, None]
+    assert list(iter_json_array([b'{"status": 200, "data": []}'])) == []
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"data": [1, 2']))
+
+
+def test_streaming(vault, new_user, attribute_def1, attribute_def2):
+    expected = sorted((attribute.attribute, attribute.value) for attribute in vault.find_by_user(new_user.id)
+                      .get_attributes())
+    streamed = vault.stream_user_attributes(new_user.id, chunk_size=16)
+    assert sorted((attribute.attribute, attribute.value) for attribute in streamed) == expected
+
+    search_request = SearchRequest(attribute_def1.name, "Example1")
+    assert [attribute.value for attribute in vault.stream_search(search_request, 0, 10)] == \
+        [attribute.value for attribute in vault.search(search_request, 0, 10)]
+
+    names = {definition.name for definition in vault.stream_attribute_definitions()}
+    assert {attribute_def1.name, attribute_def2.name} <= names
+
+
+def test_streaming_closes_retried_responses(vault, new_user):
+    retrying_vault = ViziVault(base_url='http://localhost:8083', api_key='12345',
+                               decryption_key=vault.decryption_key, retry_policy=RetryPolicy(backoff_base=0.01))
+    discarded = []
+
+    def fail_first_response(response, *args, **kwargs):
+        if not discarded:
+            discarded.append(response)
+            response.status_code = 503
+        return response
+
+    try:
+        retrying_vault.session.hooks['response'].append(fail_first_response)
+        assert len(list(retrying_vault.stream_user_attributes(new_user.id))) == 3
+        assert discarded[0].raw.closed
+    finally:
+        retrying_vault.close()
+
+
+def test_save_elides_requests(vault, new_user, attribute_def1, attribute_def2):
+    sent = []
+    vault.session.hooks['response'].append(
+        lambda response, *args, **kwargs: sent.append(f"{response.request.method} {response.request.path_url}"))
+    # Saved by the fixture, and unchanged since
+    assert vault.save(new_user, timings=True) == {}
+    user = vault.find_by_user(new_user.id)
+    sent.clear()
+    assert vault.save(user) is None and sent == []
+
+    user.clear_attribute(attribute_def1.name)
+    user.add_attribute(attribute=attribute_def2.name, value="ExampleC")
+    timings = vault.save(user, timings=True)
+    assert sorted(timings) == sorted(sent) == [f"DELETE /users/{new_user.id}/attributes/{attribute_def1.name}",
+                                               f"POST /users/{new_user.id}/attributes"]
+    assert not user.changed_attributes and not user.deleted_attributes and vault.save(user, timings=True) == {}
+    reloaded = vault.find_by_user(new_user.id)
+    assert reloaded.get_attribute(attribute_def1.name) is None
+    assert len(reloaded.get_attribute(attribute_def2.name)) == 3
+
+    # A user created client-side may not exist in the vault yet
+    sent.clear()
+    assert list(vault.save(User(new_user.id), timings=True)) == sent == ["POST /users"]
+
+
+def test_save_retry_after_partial_failure(vault, new_user, attribute_def1, attribute_def2):
+    flaky_vault = ViziVault(base_url='http://localhost:8083', api_key='12345', encryption_key=vault.encryption_key,
+                            decryption_key=vault.decryption_key,
+                            retry_policy=RetryPolicy(max_attempts=1))
+    failed = []
+
+    def fail_first_delete(response, *args, **kwargs):
+        if response.request.method == 'DELETE' and not failed:
+            failed.append(response.request.path_url)
+            response.status_code = 500
+        return response
+
+    try:
+        user = flaky_vault.find_by_user(new_user.id)
+        user.clear_attribute(attribute_def1.name)
+        user.add_attribute(attribute=attribute_def2.name, value="ExampleC")
+        flaky_vault.session.hooks['response'].append(fail_first_delete)
+        with pytest.raises(VaultResponseException):
+            flaky_vault.save(user)
+        # Only the deletion is still pending, so the new attribute is not written twice
+        assert user.deleted_attributes == [attribute_def1.name] and not user.changed_attributes
+        assert list(flaky_vault.save(user, timings=True)) == \
+            [f"DELETE /users/{new_user.id}/attributes/{attribute_def1.name}"]
+        reloaded = flaky_vault.find_by_user(new_user.id)
+        assert sorted(attribute.value for attribute in reloaded.get_attribute(attribute_def2.name)) == \
+            ["ExampleA", "ExampleB", "ExampleC"]
+    finally:
+        flaky_vault.close()
+
+
 def test_search(vault):
     attribute_def1 = AttributeDefinition("TestAttribute1")
     attribute_def1.indexed = True
@@ -0,0 +1,46 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    A static request rate limit: tokens refill at `rate` per second up to `capacity`, and each request takes one.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        :param rate: float - requests per second
+        :param capacity: float - largest burst allowed, defaults to one second's worth of requests
+        """
+        if rate <= 0:
+            raise ValueError('Argument rate must be positive')
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.__tokens = self.capacity
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1, timeout: float = None) -> bool:
+        """
+        Waits until `tokens` are available and takes them.
+
+        :param tokens: float
+        :param timeout: float - seconds to wait at most, None waits forever
+        :return: True if the tokens were taken, False on timeout
+        """
+        if tokens > self.capacity:
+            raise ValueError(f'Cannot take {tokens} tokens from a bucket holding at most {self.capacity}')
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+                self.__updated = now
+                if self.__tokens >= tokens:
+                    self.__tokens -= tokens
+                    return True
+                wait = (tokens - self.__tokens) / self.rate
+            if give_up_at is not None:
+                if now + wait > give_up_at:
+                    return False
+            time.sleep(wait)
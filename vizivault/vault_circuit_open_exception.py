@@ -0,0 +1,12 @@
+from vizivault.vault_communication_exception import VaultCommunicationException
+
+
+class VaultCircuitOpenException(VaultCommunicationException):
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        self.message = f'Vault circuit is open, calls are failing fast for another {retry_after:.1f}s'
+        VaultCommunicationException.__init__(self, self.message)
+
+    def __str__(self):
+        return self.message
@@ -0,0 +1,12 @@
+from vizivault.vault_communication_exception import VaultCommunicationException
+
+
+class VaultDeadlineExceededException(VaultCommunicationException):
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.message = f'Deadline of {seconds}s exceeded before the vault call completed'
+        VaultCommunicationException.__init__(self, self.message)
+
+    def __str__(self):
+        return self.message
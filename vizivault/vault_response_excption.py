@@ -1,3 +1,6 @@
+from vizivault import json_backend
+
+
 class VaultResponseException(Exception):
 
     def __init__(self, message, status):
@@ -7,3 +10,15 @@ class VaultResponseException(Exception):
 
     def __str__(self):
         return self.message
+
+    @classmethod
+    def from_content(cls, content, status):
+        """
+        Builds the exception from an error response body, which is usually JSON with a "message" field
+        but may be empty or come from a proxy in front of the vault.
+        """
+        try:
+            message = json_backend.loads(content)['message']
+        except (TypeError, ValueError, KeyError):
+            message = "No message provided"
+        return cls(message=message, status=status)
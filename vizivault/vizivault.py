@@ -1,13 +1,21 @@
 import requests
-import json
+import math
 import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from requests import Response
+from requests.adapters import HTTPAdapter
 from typing import List
 
+from vizivault import json_backend
 from vizivault.entity import Entity
 from vizivault.user import User
 from vizivault.vault_response_excption import VaultResponseException
 from vizivault.vault_communication_exception import VaultCommunicationException
+from vizivault.vault_deadline_exceeded_exception import VaultDeadlineExceededException
 from vizivault.attribute import Attribute
 from vizivault.tag import Tag
 from vizivault.regulation import Regulation
@@ -15,74 +23,355 @@ from vizivault.search_request import SearchRequest
 from vizivault.entity_definition import EntityDefinition
 from vizivault.attribute_definition import AttributeDefinition
 from vizivault.attribute_set import AttributeSet
+from vizivault.retry_policy import RetryPolicy
+from vizivault.circuit_breaker import CircuitBreaker
+from vizivault.deadline import Deadline
+from vizivault.hedging_policy import HedgingPolicy
+from vizivault.compression import compress_body, SUPPORTED_ENCODINGS
+from vizivault.concurrency_limiter import AdaptiveConcurrencyLimiter
+from vizivault.bulk import bounded_map
+from vizivault.search_cache import SearchCache
+from vizivault.search_frame import SearchFrame
+from vizivault.metadata_catalog import MetadataCatalog
+from vizivault.entity_cache import EntityCache
+from vizivault.metadata_snapshot import write_snapshot
+from vizivault.lazy_attributes import LazyAttributeList
+from vizivault.streaming import iter_json_array
 
 
 
 class ViziVault:
+    ENDPOINT_CLASSES = ('read', 'write', 'search')
 
-    def __init__(self, base_url: str, api_key: str, encryption_key: str = None, decryption_key: str = None):
+    def __init__(self, base_url: str, api_key: str, encryption_key: str = None, decryption_key: str = None,
+                 pool_connections: int = 10, pool_maxsize: int = 10, pool_block: bool = False,
+                 keep_alive: bool = True, retry_policy: RetryPolicy = None,
+                 circuit_breaker: CircuitBreaker = None, timeout=(10.0, 60.0),
+                 hedging_policy: HedgingPolicy = None, compress_requests_above: int = None,
+                 request_compression: str = 'gzip', accept_encoding: str = 'gzip, deflate',
+                 concurrency_limiter: AdaptiveConcurrencyLimiter = None, rate_limits: dict = None,
+                 search_cache: SearchCache = None, metadata_catalog: MetadataCatalog = None,
+                 entity_cache: EntityCache = None, lazy_attributes: bool = False):
+        """
+        :param base_url: str - address of the vault server, e.g. https://my.host:8080
+        :param api_key: str - api key (application key) of your application
+        :param encryption_key: str - defaults to the VV_ENCRYPT_KEY environment variable
+        :param decryption_key: str - defaults to the VV_DECRYPT_KEY environment variable
+        :param pool_connections: int - number of per-host connection pools to keep
+        :param pool_maxsize: int - maximum number of connections kept open to a single host
+        :param pool_block: bool - block when all connections to a host are in use, instead of opening extra ones
+        :param keep_alive: bool - reuse connections between calls; False opens a new connection for every request
+        :param retry_policy: RetryPolicy - when and how failed calls are retried, defaults to RetryPolicy();
+            RetryPolicy(max_attempts=1) disables retries
+        :param circuit_breaker: CircuitBreaker - fail fast while the vault is unhealthy; None disables it
+        :param timeout: (float, float) - connect and read timeouts in seconds for every request; None waits forever
+        :param hedging_policy: HedgingPolicy - hedge slow find_by_user/get_data_point reads; None disables hedging
+        :param compress_requests_above: int - compress request bodies of at least this many bytes; None never does
+        :param request_compression: str - 'gzip' or 'deflate'
+        :param accept_encoding: str - response encodings offered to the vault; 'identity' asks for uncompressed data
+        :param concurrency_limiter: AdaptiveConcurrencyLimiter - adaptive cap on requests in flight across all
+            threads using this client; None leaves concurrency to the caller
+        :param rate_limits: dict - TokenBucket per endpoint class ('read', 'write' or 'search') that requests of
+            that class must take a token from
+        :param search_cache: SearchCache - serve repeated searches from memory; None sends every search
+        :param metadata_catalog: MetadataCatalog - cache attribute definitions, tags and regulations; None reads
+            them from the vault every time
+        :param entity_cache: EntityCache - serve repeated find_by_user, find_by_entity and get_user_attribute
+            reads from memory; None sends every read
+        :param lazy_attributes: bool - have find_by_user, find_by_entity and search build each Attribute the first
+            time it is accessed instead of up front
+        """
+        if request_compression not in SUPPORTED_ENCODINGS:
+            raise ValueError(f'Unsupported request compression {request_compression!r}, '
+                             f'expected one of {SUPPORTED_ENCODINGS}')
+        rate_limits = rate_limits or {}
+        for endpoint_class in rate_limits:
+            if endpoint_class not in self.ENDPOINT_CLASSES:
+                raise ValueError(f'Unknown endpoint class {endpoint_class!r}, expected one of {self.ENDPOINT_CLASSES}')
         self.content_type = "application/json"
         self.base_url = base_url
         self.encryption_key = encryption_key or os.environ.get('VV_ENCRYPT_KEY', None)
         self.decryption_key = decryption_key or os.environ.get('VV_DECRYPT_KEY', None)
         self.set_api_key(api_key)
 
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+        self.session.headers['Accept-Encoding'] = accept_encoding
+        self.compress_requests_above = compress_requests_above
+        self.request_compression = request_compression
+
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.timeout = timeout
+        self.hedging_policy = hedging_policy
+        self.concurrency_limiter = concurrency_limiter
+        self.rate_limits = rate_limits
+        self.search_cache = search_cache
+        self.metadata_catalog = metadata_catalog
+        self.entity_cache = entity_cache
+        self.lazy_attributes = lazy_attributes
+        self.__hedge_executor = ThreadPoolExecutor(max_workers=pool_maxsize) if hedging_policy is not None else None
+        self.__call_options = threading.local()
+        # Sends the independent requests of a save concurrently; only started by a save that needs it
+        self.__save_executor = None
+        self.__executor_lock = threading.Lock()
+        self.__pool_maxsize = pool_maxsize
+
+    def close(self):
+        """
+        Closes all pooled connections held by this client.
+        """
+        if self.__hedge_executor is not None:
+            self.__hedge_executor.shutdown(wait=False)
+        if self.__save_executor is not None:
+            self.__save_executor.shutdown(wait=False)
+        self.session.close()
+
+    @contextmanager
+    def call_timeout(self, connect: float = None, read: float = None):
+        """
+        Overrides the client's connect and/or read timeout for calls made by this thread inside the block.
+
+        :param connect: float - seconds to wait for a connection, None keeps the current value
+        :param read: float - seconds to wait for the vault to send data, None keeps the current value
+        """
+        previous = getattr(self.__call_options, 'timeout', None)
+        current_connect, current_read = previous or self.timeout or (None, None)
+        self.__call_options.timeout = (current_connect if connect is None else connect,
+                                       current_read if read is None else read)
+        try:
+            yield
+        finally:
+            self.__call_options.timeout = previous
+
+    @contextmanager
+    def deadline(self, seconds: float):
+        """
+        Gives every call made by this thread inside the block a shared time budget, so that a multi-request
+        operation such as save() as a whole takes at most `seconds`. Calls that would start after the budget
+        is spent raise a VaultDeadlineExceededException. Nested deadlines can only shorten the budget.
+
+        :param seconds: float - total time budget
+        """
+        previous = getattr(self.__call_options, 'deadline', None)
+        deadline = Deadline(seconds)
+        if previous is not None and previous.expires_at < deadline.expires_at:
+            deadline = previous
+        self.__call_options.deadline = deadline
+        try:
+            yield deadline
+        finally:
+            self.__call_options.deadline = previous
+
+    def bind_call_options(self, function):
+        """
+        Makes a function run with the timeout and deadline the calling thread has now, on whatever thread it is
+        later called from. Used for the worker threads of calls that fan out, so that they honour the caller's
+        call_timeout and deadline blocks.
+
+        :param function: callable
+        :return: callable
+        """
+        timeout = getattr(self.__call_options, 'timeout', None)
+        deadline = getattr(self.__call_options, 'deadline', None)
+
+        def bound(*args, **kwargs):
+            options = self.__call_options
+            previous = (getattr(options, 'timeout', None), getattr(options, 'deadline', None))
+            options.timeout, options.deadline = timeout, deadline
+            try:
+                return function(*args, **kwargs)
+            finally:
+                options.timeout, options.deadline = previous
+
+        return bound
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def set_api_key(self, api_key: str) -> Response:
         self.api_key = 'Bearer ' + api_key
         return self.api_key
 
-    def __get_with_decryption_key(self, url_suffix) -> Response:
-        headers = {"X-Decryption-Key": self.decryption_key}
-        return self.__get(url_suffix=url_suffix, headers=headers)
+    def __decryption_headers(self) -> dict:
+        return {"X-Decryption-Key": self.decryption_key}
+
+    def __get_with_decryption_key(self, url_suffix, hedge=False) -> Response:
+        return self.__get(url_suffix=url_suffix, headers=self.__decryption_headers(), hedge=hedge)
 
     def __post_with_encryption_key(self, url_suffix, body) -> Response:
         headers = {"X-Encryption-Key": self.encryption_key, "Content-Type": self.content_type}
         return self.__post(url_suffix=url_suffix, body=body, headers=headers)
 
-    def __post(self, url_suffix, body, headers=None) -> Response:
+    def __post(self, url_suffix, body, headers=None, idempotent=False, **kwargs) -> Response:
         headers = headers or {"Content-Type": self.content_type, "Authorization": self.api_key}
-        try:
-            if isinstance(body, str):
-                response = requests.post(url=self.base_url + url_suffix, data=body, headers=headers)
-            else:
-                response = requests.post(url=self.base_url + url_suffix, json=body, headers=headers)
-
-            if not response.ok:
-                error_message = "No message provided" if response.content is None else json.loads(response.content)[
-                    'message']
-                raise VaultResponseException(message=error_message, status=response.status_code)
-            return response
-        except TypeError:
-            pass
-        except IOError as e:
-            raise VaultCommunicationException from e
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        elif not isinstance(body, bytes):
+            body = json_backend.dumps(body)
+        if self.compress_requests_above is not None and len(body) >= self.compress_requests_above:
+            body = compress_body(body, self.request_compression)
+            headers = dict(headers, **{"Content-Encoding": self.request_compression})
+        return self.__request('POST', url_suffix, headers=headers, idempotent=idempotent, data=body, **kwargs)
 
-    def __get(self, url_suffix, headers=None) -> Response:
+    def __get(self, url_suffix, headers=None, hedge=False) -> Response:
         headers = headers or {"Authorization": self.api_key}
-        try:
-            response = requests.get(url=self.base_url + url_suffix, headers=headers)
-            if not response.ok:
-                error_message = "No message provided" if response.content is None else json.loads(response.content)[
-                    'message']
-                raise VaultResponseException(message=error_message, status=response.status_code)
-
-            return response
-        except IOError as e:
-            raise VaultCommunicationException from e
+        return self.__request('GET', url_suffix, headers=headers, hedge=hedge)
+
+    def __get_metadata(self, url_suffix, headers=None, revalidate=False) -> bytes:
+        catalog = self.metadata_catalog
+        if catalog is None:
+            return self.__get(url_suffix, headers=headers).content
+        content, validators = catalog.lookup(url_suffix, revalidate=revalidate)
+        if content is not None:
+            return content
+        headers = headers or {"Authorization": self.api_key}
+        response = self.__get(url_suffix, headers=dict(headers, **validators))
+        content = catalog.store(url_suffix, response.status_code, response.content,
+                                etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'))
+        if content is None:
+            response = self.__get(url_suffix, headers=headers)
+            content = catalog.store(url_suffix, response.status_code, response.content,
+                                    etag=response.headers.get('ETag'),
+                                    last_modified=response.headers.get('Last-Modified'))
+        return content
+
+    def __invalidate_metadata(self, *url_suffixes):
+        if self.metadata_catalog is not None:
+            self.metadata_catalog.invalidate(*url_suffixes)
 
     def __delete(self, url_suffix) -> bytes:
+        headers = {"Authorization": self.api_key}
+        return self.__request('DELETE', url_suffix, headers=headers).content
+
+    def __request(self, method, url_suffix, headers, idempotent=None, hedge=False, **kwargs) -> Response:
+        if idempotent is None:
+            idempotent = RetryPolicy.is_idempotent(method)
+        deadline = getattr(self.__call_options, 'deadline', None)
+        attempt = 0
+        while True:
+            if deadline is not None:
+                deadline.check()
+            trial = self.circuit_breaker.before_request() if self.circuit_breaker is not None else False
+            attempt += 1
+            timeout = getattr(self.__call_options, 'timeout', None) or self.timeout
+            if deadline is not None:
+                timeout = deadline.clamp(timeout)
+            try:
+                response = self.__send(method, url_suffix, headers, timeout, hedge, **kwargs)
+            except IOError as e:
+                self.__record_outcome(failed=True)
+                if self.retry_policy is not None and self.retry_policy.should_retry(attempt, idempotent):
+                    self.__backoff(deadline, self.retry_policy.backoff(attempt))
+                    continue
+                raise VaultCommunicationException from e
+            except BaseException:
+                # Nothing was learned about the vault, e.g. the request timed out waiting for a client-side limit
+                if trial:
+                    self.circuit_breaker.release_trial()
+                raise
+
+            self.__record_outcome(failed=response.status_code == 429 or response.status_code >= 500)
+            if response.ok:
+                return response
+            retry_after = response.headers.get('Retry-After')
+            # Closed so that its connection goes back to the pool, which a streamed response is not otherwise
+            content = response.content
+            response.close()
+            if self.retry_policy is not None and self.retry_policy.should_retry(
+                    attempt, idempotent, status=response.status_code, retry_after=retry_after):
+                self.__backoff(deadline, self.retry_policy.backoff(attempt, retry_after=retry_after))
+                continue
+            raise VaultResponseException.from_content(content=content, status=response.status_code)
+
+    @staticmethod
+    def __backoff(deadline, delay):
+        # Sleeping past the deadline would only delay the inevitable failure
+        if deadline is not None and delay >= deadline.remaining():
+            raise VaultDeadlineExceededException(seconds=deadline.seconds)
+        time.sleep(delay)
+
+    def __send(self, method, url_suffix, headers, timeout, hedge, **kwargs) -> Response:
+        hedge_delay = self.hedging_policy.hedge_delay() if hedge and self.hedging_policy is not None else None
+        if hedge_delay is None:
+            return self.__timed_send(method, url_suffix, headers, timeout, **kwargs)
+
+        first = self.__hedge_executor.submit(self.__timed_send, method, url_suffix, headers, timeout, **kwargs)
+        done, _ = wait([first], timeout=hedge_delay)
+        if done:
+            return first.result()
+
+        second = self.__hedge_executor.submit(self.__timed_send, method, url_suffix, headers, timeout, **kwargs)
+        pending = {first, second}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # Fall back to a failed request only once neither request can still succeed
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded or not pending:
+                winner = (succeeded or list(done))[0]
+                self.hedging_policy.record_hedge(won=winner is second)
+                self.__discard(second if winner is first else first)
+                return winner.result()
+
+    @staticmethod
+    def __discard(future):
+        # Closes the response of the hedged request that lost once it arrives, giving its connection back to the
+        # pool instead of holding it until garbage collection
+        def close(done):
+            if not done.cancelled() and done.exception() is None:
+                done.result().close()
+
+        future.add_done_callback(close)
+
+    def __timed_send(self, method, url_suffix, headers, timeout, **kwargs) -> Response:
+        # Waiting for a request slot is bounded like waiting for a connection
+        wait_timeout = timeout[0] if timeout is not None else None
+        rate_limit = self.rate_limits.get(self.endpoint_class(method, url_suffix))
+        if rate_limit is not None and not rate_limit.acquire(timeout=wait_timeout):
+            raise VaultCommunicationException('Timed out waiting for the client-side rate limit')
+        if self.concurrency_limiter is not None and not self.concurrency_limiter.acquire(timeout=wait_timeout):
+            raise VaultCommunicationException('Timed out waiting for a free request slot')
+
+        start = time.monotonic()
+        latency = None
+        overloaded = True
         try:
-            headers = {"Authorization": self.api_key}
-            response = requests.delete(url=self.base_url + url_suffix, headers=headers)
+            response = self.session.request(method, self.base_url + url_suffix, headers=headers, timeout=timeout,
+                                            **kwargs)
+            latency = time.monotonic() - start
+            # Any 5xx counts, as a vault or proxy struggling under load answers with 500, 502 and 504 too
+            overloaded = response.status_code == 429 or response.status_code >= 500
+        finally:
+            if self.concurrency_limiter is not None:
+                self.concurrency_limiter.release(latency=latency, overloaded=overloaded)
 
-            if not response.ok:
-                error_message = "No message provided" if response.content is None else json.loads(response.content)[
-                    'message']
-                raise VaultResponseException(message=error_message, status=response.status_code)
+        if self.hedging_policy is not None and method == 'GET' and response.ok:
+            self.hedging_policy.record(latency)
+        return response
 
-            return response.content
-        except IOError as e:
-            raise VaultCommunicationException from e
+    @staticmethod
+    def endpoint_class(method, url_suffix) -> str:
+        """
+        :return: str - 'search', 'read' or 'write', the class a request is rate limited under
+        """
+        if url_suffix.startswith('/search'):
+            return 'search'
+        return 'read' if method == 'GET' else 'write'
+
+    def __record_outcome(self, failed):
+        if self.circuit_breaker is None:
+            return
+        if failed:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
 
     def find_by_entity(self, entity_id: str) -> Entity:
         """
@@ -90,8 +379,8 @@ class ViziVault:
         :param entity_id: str
         :return: Entity
         """
-        data = json.loads(self.__get_with_decryption_key(f"/entities/{entity_id}/attributes").content)['data'],
-        return Entity(entity_id=entity_id, data=data)
+        data = json_backend.loads(self.__get_entity(entity_id, f"/entities/{entity_id}/attributes"))['data']
+        return Entity(entity_id=entity_id, data=data, lazy=self.lazy_attributes)
 
     def find_by_user(self, entity_id: str) -> User:
         """
@@ -99,8 +388,36 @@ class ViziVault:
         :param entity_id: str
         :return: User
         """
-        data = json.loads(self.__get_with_decryption_key(f"/users/{entity_id}/attributes").content)['data']
-        return User(entity_id=entity_id, data=data)
+        data = json_backend.loads(self.__get_entity(entity_id, f"/users/{entity_id}/attributes", hedge=True))['data']
+        return User(entity_id=entity_id, data=data, lazy=self.lazy_attributes)
+
+    def find_by_entities(self, entity_ids, max_workers: int = 8, ordered: bool = False):
+        """
+        Retrieves many entities concurrently, yielding each one as soon as it arrives. IDs are read from the
+        iterable lazily, so it can be arbitrarily long. An entity that is missing or fails to load is reported in
+        its result instead of ending the whole batch.
+
+        :param entity_ids: iterable of str
+        :param max_workers: int - number of requests running at once
+        :param ordered: bool - yield results in input order instead of as they arrive
+        :return: generator of BulkResult, with the ID as item and the Entity as value
+        """
+        return bounded_map(self.bind_call_options(self.find_by_entity), entity_ids, max_workers=max_workers,
+                           ordered=ordered)
+
+    def find_by_users(self, entity_ids, max_workers: int = 8, ordered: bool = False):
+        """
+        Retrieves many users concurrently, yielding each one as soon as it arrives. IDs are read from the
+        iterable lazily, so it can be arbitrarily long. A user that is missing (BulkResult.missing) or fails to
+        load is reported in its result instead of ending the whole batch.
+
+        :param entity_ids: iterable of str
+        :param max_workers: int - number of requests running at once
+        :param ordered: bool - yield results in input order instead of as they arrive
+        :return: generator of BulkResult, with the ID as item and the User as value
+        """
+        return bounded_map(self.bind_call_options(self.find_by_user), entity_ids, max_workers=max_workers,
+                           ordered=ordered)
 
     def get_user_attribute(self, user_id: str, attribute_key: str) -> List:
         """
@@ -109,28 +426,187 @@ class ViziVault:
         :param attribute_key: str
         :return: Attribute
         """
-        data = (self.__get_with_decryption_key(f"/users/{user_id}/attributes/{attribute_key}").content)
+        data = self.__get_entity(user_id, f"/users/{user_id}/attributes/{attribute_key}")
         return Attribute.from_json(data)
 
-    def save(self, entity: Entity):
+    def __get_entity(self, entity_id: str, url_suffix: str, hedge=False) -> bytes:
+        if self.entity_cache is None:
+            return self.__get_with_decryption_key(url_suffix, hedge=hedge).content
+        content = self.entity_cache.get(url_suffix)
+        if content is not None:
+            return content
+        generation = self.entity_cache.generation
+        content = self.__get_with_decryption_key(url_suffix, hedge=hedge).content
+        self.entity_cache.put(entity_id, url_suffix, content, generation)
+        return content
+
+    def __stream(self, send, build, chunk_size):
+        # send makes the request with stream=True, so that the body is read and parsed chunk by chunk
+        response = send()
+        try:
+            for record in iter_json_array(response.iter_content(chunk_size=chunk_size)):
+                yield build(record)
+        except (IOError, requests.exceptions.RequestException) as e:
+            # The connection failed after the response started, which retrying cannot fix halfway through
+            raise VaultCommunicationException from e
+        finally:
+            response.close()
+
+    def stream_user_attributes(self, entity_id: str, chunk_size: int = 65536):
+        """
+        Yields the attributes of a user one at a time as the response is read, rather than reading the whole
+        response before building a User, so memory use does not grow with the number of attributes. The request
+        is only sent once the generator is iterated, and bypasses the entity cache.
+
+        :param entity_id: str
+        :param chunk_size: int - bytes read from the connection at a time
+        :return: generator of Attribute
+        """
+        url_suffix = f"/users/{entity_id}/attributes"
+        return self.__stream(lambda: self.__request('GET', url_suffix, headers=self.__decryption_headers(),
+                                                    stream=True),
+                             Attribute.from_json_dict, chunk_size)
+
+    def stream_entity_attributes(self, entity_id: str, chunk_size: int = 65536):
+        """
+        Like stream_user_attributes, for an entity.
+
+        :param entity_id: str
+        :param chunk_size: int - bytes read from the connection at a time
+        :return: generator of Attribute
+        """
+        url_suffix = f"/entities/{entity_id}/attributes"
+        return self.__stream(lambda: self.__request('GET', url_suffix, headers=self.__decryption_headers(),
+                                                    stream=True),
+                             Attribute.from_json_dict, chunk_size)
+
+    def save(self, entity: Entity, timings: bool = False):
         """
         Updates a user or entity to match changes that have been made client-side,
         by deleting or creating attributes in the vault as necessary.
 
+        Only requests with something to write are sent: the entity definition only if the id or tags changed
+        since the entity was read or last saved, and the attributes only if some were added. A save with no
+        changes sends nothing. Attribute deletions are sent concurrently with each other and with the entity
+        definition; new attributes are sent after both, unless they cannot depend on either.
+
         :param entity: Entity
+        :param timings: bool - return how long each request took
+        :return: dict - seconds taken by each request sent, by method and path, if timings is set
         """
         if not isinstance(entity, Entity):
             raise TypeError(
                 'Argument entity is not of type Entity'
             )
-        for attribute in entity.deleted_attributes:
-            self.__delete(f"/users/{entity.id}/attributes/{attribute}")
-        entity.deleted_attributes.clear()
-        entity_definition = json.dumps(EntityDefinition(entity), default=lambda o: o.__dict__)
-        self.__post("/users" if isinstance(entity, User) else "/entities", entity_definition)
-        storage_request = AttributeSet(entity.changed_attributes).to_json()
-        self.__post_with_encryption_key(f"/users/{entity.id}/attributes", storage_request)
-        entity.changed_attributes.clear()
+        deleted_attributes = entity.deleted_attributes
+        changed_attributes = entity.changed_attributes
+        definition = entity.definition_snapshot() if entity.definition_changed else None
+        request_timings = {}
+        if not deleted_attributes and not changed_attributes and definition is None:
+            return request_timings if timings else None
+
+        def delete_attribute(attribute):
+            return (f"DELETE /users/{entity.id}/attributes/{attribute}",
+                    lambda: self.__delete(f"/users/{entity.id}/attributes/{attribute}"))
+
+        def post_definition():
+            entity_definition = json_backend.dumps(EntityDefinition(entity), default=lambda o: o.__dict__)
+            url_suffix = "/users" if isinstance(entity, User) else "/entities"
+            return f"POST {url_suffix}", lambda: self.__post(url_suffix, entity_definition)
+
+        def post_attributes():
+            storage_request = AttributeSet(changed_attributes).to_json_bytes()
+            url_suffix = f"/users/{entity.id}/attributes"
+            return f"POST {url_suffix}", lambda: self.__post_with_encryption_key(url_suffix, storage_request)
+
+        # New attributes must reach the vault after the entity is created and after deletions of their key
+        written_keys = {attribute.attribute for attribute in changed_attributes}
+        independent = definition is None and written_keys.isdisjoint(deleted_attributes)
+        first = [delete_attribute(attribute) for attribute in deleted_attributes]
+        definition_request = post_definition() if definition is not None else None
+        if definition_request is not None:
+            first.append(definition_request)
+        attributes_request = post_attributes() if changed_attributes else None
+        if attributes_request is not None and independent:
+            first.append(attributes_request)
+        try:
+            failures = self.__run_concurrently(first, request_timings)
+            # Each request that went through is forgotten, so that saving again does not repeat it
+            attributes_written = (independent and attributes_request is not None
+                                  and attributes_request[0] not in failures)
+            definition_written = definition_request is not None and definition_request[0] not in failures
+            entity.clear_pending_changes(
+                deleted_attributes=[attribute for attribute, (label, _) in zip(deleted_attributes, first)
+                                    if label not in failures],
+                changed_attributes=changed_attributes if attributes_written else [],
+                definition=definition if definition_written else None)
+            if failures:
+                raise next(iter(failures.values()))
+            if attributes_request is not None and not independent:
+                self.__run_concurrently([attributes_request], request_timings, raise_failure=True)
+                entity.clear_pending_changes(changed_attributes=changed_attributes)
+        finally:
+            # Also after a failure, since some of the writes may have gone through
+            if self.search_cache is not None:
+                self.search_cache.invalidate_entity(entity.id, set(deleted_attributes) | written_keys)
+            if self.entity_cache is not None:
+                self.entity_cache.invalidate_entity(entity.id)
+        return request_timings if timings else None
+
+    def __run_concurrently(self, requests_to_send, request_timings, raise_failure=False) -> dict:
+        """
+        Sends requests at the same time, with the timeout and deadline of the calling thread, and waits for all
+        of them.
+
+        :param requests_to_send: list of (str, callable) - a label and a function sending each request
+        :param request_timings: dict - receives the seconds each request took, by label
+        :param raise_failure: bool - raise the exception of a failed request instead of returning it
+        :return: dict - the exception each failed request raised, by label
+        """
+        @self.bind_call_options
+        def send(label, request):
+            start = time.monotonic()
+            try:
+                request()
+                return None
+            except Exception as e:
+                return e
+            finally:
+                request_timings[label] = time.monotonic() - start
+
+        if len(requests_to_send) == 1:
+            outcomes = [send(*requests_to_send[0])]
+        else:
+            executor = self.__write_executor()
+            futures = [executor.submit(send, label, request) for label, request in requests_to_send]
+            outcomes = [future.result() for future in futures]
+        failures = {label: error for (label, _), error in zip(requests_to_send, outcomes) if error is not None}
+        if failures and raise_failure:
+            raise next(iter(failures.values()))
+        return failures
+
+    def __write_executor(self) -> ThreadPoolExecutor:
+        with self.__executor_lock:
+            if self.__save_executor is None:
+                self.__save_executor = ThreadPoolExecutor(max_workers=self.__pool_maxsize)
+            return self.__save_executor
+
+    def save_many(self, entities, max_workers: int = 8, ordered: bool = False):
+        """
+        Saves many users or entities concurrently. Entities are read from the iterable lazily and at most
+        2 * max_workers saves are pending at a time, so arbitrarily long inputs use bounded memory.
+
+        Each entity gets its own result, and a failing entity does not stop the others. Pending changes are
+        cleared only on entities that were saved successfully, so failed ones can simply be saved again.
+        Nothing is saved until the returned generator is iterated.
+
+        :param entities: iterable of Entity
+        :param max_workers: int - number of saves running at once; keep it at most pool_maxsize so that every
+            worker gets a pooled connection
+        :param ordered: bool - yield results in input order instead of as they complete
+        :return: generator of BulkResult, with the entity as item
+        """
+        return bounded_map(self.bind_call_options(self.save), entities, max_workers=max_workers, ordered=ordered)
 
     def purge(self, entity_id: str):
         """
@@ -138,7 +614,26 @@ class ViziVault:
         :param entityId: str
         """
 
-        self.__delete(f"/users/{entity_id}/data")
+        try:
+            self.__delete(f"/users/{entity_id}/data")
+        finally:
+            if self.search_cache is not None:
+                self.search_cache.invalidate_entity(entity_id)
+            if self.entity_cache is not None:
+                self.entity_cache.invalidate_entity(entity_id)
+
+    def purge_many(self, entity_ids, max_workers: int = 8, ordered: bool = False):
+        """
+        Deletes all attributes of many users/entities concurrently. IDs are read from the iterable lazily, and a
+        failing ID does not stop the others. Nothing is purged until the returned generator is iterated.
+        See vizivault.purge.PurgeJob for a resumable, checkpointed version.
+
+        :param entity_ids: iterable of str
+        :param max_workers: int - number of purges running at once
+        :param ordered: bool - yield results in input order instead of as they complete
+        :return: generator of BulkResult, with the ID as item
+        """
+        return bounded_map(self.bind_call_options(self.purge), entity_ids, max_workers=max_workers, ordered=ordered)
 
     def store_attribute_definition(self, attribute_definition: AttributeDefinition) -> Response:
         """
@@ -151,8 +646,9 @@ class ViziVault:
             raise TypeError(
                 'Argument attribute_definition is not of type Attribute Definition'
             )
-        attribute_definition_json = attribute_definition.to_json()
+        attribute_definition_json = attribute_definition.to_json_bytes()
         result = self.__post("/attributes", attribute_definition_json)
+        self.__invalidate_metadata(f"/attributes/{attribute_definition.name}", "/attributes")
         return result
 
     def get_attribute_definition(self, attribute_key: str) -> AttributeDefinition:
@@ -163,7 +659,7 @@ class ViziVault:
         :return: AttributeDefinition
         """
         attribute_definition = AttributeDefinition.from_json(
-            self.__get_with_decryption_key(f"/attributes/{attribute_key}").content)
+            self.__get_metadata(f"/attributes/{attribute_key}", headers=self.__decryption_headers()))
         return attribute_definition
 
     def get_attribute_definitions(self) -> List[AttributeDefinition]:
@@ -173,7 +669,19 @@ class ViziVault:
         :return: list of all attribute definition in the vault
 
         """
-        return AttributeDefinition.from_json(self.__get_with_decryption_key(f"/attributes").content)
+        return AttributeDefinition.from_json(self.__get_metadata("/attributes", headers=self.__decryption_headers()))
+
+    def stream_attribute_definitions(self, chunk_size: int = 65536):
+        """
+        Like get_attribute_definitions, but yields the definitions one at a time as the response is read. Bypasses
+        the metadata catalog.
+
+        :param chunk_size: int - bytes read from the connection at a time
+        :return: generator of AttributeDefinition
+        """
+        return self.__stream(lambda: self.__request('GET', "/attributes", headers=self.__decryption_headers(),
+                                                    stream=True),
+                             AttributeDefinition.from_json_dict, chunk_size)
 
     def delete_attribute_definition(self, attribute_key: str) -> Response:
         """
@@ -182,7 +690,10 @@ class ViziVault:
         :param attribute_key:
         :return: Response (http Response)
         """
-        return self.__delete(f"/attributes/{attribute_key}")
+        try:
+            return self.__delete(f"/attributes/{attribute_key}")
+        finally:
+            self.__invalidate_metadata(f"/attributes/{attribute_key}", "/attributes")
 
     def store_tag(self, tag: Tag):
         """
@@ -194,8 +705,9 @@ class ViziVault:
             raise TypeError(
                 'Argument tag is not of type Tag'
             )
-        tag_json = tag.to_json()
+        tag_json = tag.to_json_bytes()
         self.__post("/tags", tag_json)
+        self.__invalidate_metadata(f"/tags/{tag.name}", "/tags/")
 
     def get_tag(self, name: str) -> Tag:
         """
@@ -204,7 +716,7 @@ class ViziVault:
         :return: Tag
         :rtype: Tag
         """
-        new_tag = Tag.from_json(self.__get(f'/tags/{name}').content)
+        new_tag = Tag.from_json(self.__get_metadata(f'/tags/{name}'))
         return new_tag
 
     def get_tags(self) -> List[Tag]:
@@ -213,7 +725,7 @@ class ViziVault:
         :rtype list[Tag[
         :return: list of all lags in vault
         """
-        return Tag.from_json(self.__get_with_decryption_key('/tags/').content)
+        return Tag.from_json(self.__get_metadata('/tags/', headers=self.__decryption_headers()))
 
     def delete_tag(self, tag: str) -> bool:
         """
@@ -228,6 +740,8 @@ class ViziVault:
             return True
         except VaultResponseException:
             return False
+        finally:
+            self.__invalidate_metadata(f"/tags/{tag}", "/tags/")
 
     def store_regulation(self, regulation: Regulation):
         """
@@ -236,8 +750,9 @@ class ViziVault:
         """
         if not isinstance(regulation, Regulation):
             raise TypeError('Argument regulation is not of type Regulation')
-        json_regulation = regulation.to_json()
+        json_regulation = regulation.to_json_bytes()
         self.__post("/regulations", json_regulation)
+        self.__invalidate_metadata(f"/regulations/{regulation.key}", "/regulations/")
 
     def get_regulations(self) -> List[Regulation]:
         """
@@ -247,7 +762,7 @@ class ViziVault:
         :return: list of all regulations in the vault
         """
 
-        return Regulation.from_json(self.__get_with_decryption_key('/regulations/').content)
+        return Regulation.from_json(self.__get_metadata('/regulations/', headers=self.__decryption_headers()))
 
     def get_regulation(self, key: str) -> Regulation:
         """
@@ -257,7 +772,7 @@ class ViziVault:
         :param key: primary key value of regulation
         :return: Regulation
         """
-        return Regulation.from_json(self.__get_with_decryption_key(f'/regulations/{key}').content)
+        return Regulation.from_json(self.__get_metadata(f'/regulations/{key}', headers=self.__decryption_headers()))
 
     def delete_regulation(self, regulation) -> bool:
         """
@@ -272,6 +787,42 @@ class ViziVault:
             return True
         except VaultResponseException:
             return False
+        finally:
+            self.__invalidate_metadata(f"/regulations/{regulation}", "/regulations/")
+
+    def warm_metadata_catalog(self) -> int:
+        """
+        Reads every attribute definition, tag and regulation into the metadata catalog, so that reading any one of
+        them is served from memory until the catalog's ttl runs out.
+
+        :return: int - the number of items cached
+        """
+        if self.metadata_catalog is None:
+            raise ValueError('ViziVault was created without a metadata_catalog')
+        headers = self.__decryption_headers()
+        cached = 0
+        for list_path, item_path, id_field in (("/attributes", "/attributes/", "key"), ("/tags/", "/tags/", "name"),
+                                               ("/regulations/", "/regulations/", "key")):
+            for item in json_backend.loads(self.__get_metadata(list_path, headers=headers))['data']:
+                self.metadata_catalog.put(item_path + item[id_field], json_backend.dumps({"data": item}))
+                cached += 1
+        return cached
+
+    def export_metadata_snapshot(self, path: str) -> int:
+        """
+        Writes every attribute definition, tag and regulation to a snapshot file that other processes can read
+        with vizivault.metadata_snapshot.MetadataSnapshot, replacing the file atomically if it exists. The lists
+        are read from the vault, or revalidated with it if they are in the metadata catalog, so the snapshot is
+        current even when the catalog is not.
+
+        :param path: str
+        :return: int - the number of items written
+        """
+        headers = self.__decryption_headers()
+        created_at = time.time()
+        lists = [json_backend.loads(self.__get_metadata(list_path, headers=headers, revalidate=True))['data']
+                 for list_path in ("/attributes", "/tags/", "/regulations/")]
+        return write_snapshot(path, *lists, created_at=created_at)
 
     def search(self, search_request: SearchRequest, page: int, count: int) -> List[Attribute]:
         """
@@ -280,12 +831,200 @@ class ViziVault:
         :param search_request: SearchRequest
         :param page: (int) - THe page offset of search results
         :param count: (int) - The number of attributes in a result
-        :return: List of attributes found in search
+        :return: List of attributes found in search, a LazyAttributeList if the client has lazy_attributes
+        """
+        records = self.search_records(search_request, page, count)
+        if self.lazy_attributes:
+            return LazyAttributeList(records)
+        return [Attribute.from_json_dict(record) for record in records]
+
+    def search_records(self, search_request: SearchRequest, page: int, count: int) -> List[dict]:
+        """
+        Like search, but returns the decoded JSON records instead of building an Attribute for each, which is
+        cheaper when the results are only passed on, e.g. written to a file.
+
+        :rtype: List[dict]
+        :param search_request: SearchRequest
+        :param page: (int) - The page offset of search results
+        :param count: (int) - The number of attributes in a result
+        :return: List of attribute records found in search
         """
         if not isinstance(search_request, SearchRequest):
             raise TypeError('Argument search_request is not of type SearchRequest')
-        paginated_search_request = f'{{"query": {search_request.to_json()}, "page": {page}, "count": {count}}}'
-        return Attribute.from_json(self.__post("/search/", paginated_search_request).content)
+        generation = None
+        if self.search_cache is not None:
+            content = self.search_cache.get(search_request, page, count)
+            if content is not None:
+                return json_backend.loads(content)['data']
+            generation = self.search_cache.generation
+        query = search_request.to_json_bytes()
+        paginated_search_request = b'{"query":%s,"page":%d,"count":%d}' % (query, page, count)
+        content = self.__post("/search/", paginated_search_request, idempotent=True).content
+        records = json_backend.loads(content)['data']
+        if self.search_cache is not None:
+            self.search_cache.put(search_request, page, count, content, records, generation)
+        return records
+
+    def search_pages(self, search_request: SearchRequest, page_size: int = 1000, prefetch: int = 1,
+                     start_page: int = 0):
+        """
+        Yields every page of search results in turn, as lists of decoded records, while the next `prefetch` pages
+        are fetched in the background. The search ends at the first page shorter than page_size. Nothing is
+        requested until the generator is iterated, and closing it early cancels the pages not fetched yet.
+
+        :param search_request: SearchRequest
+        :param page_size: int - number of records per page
+        :param prefetch: int - pages fetched ahead of the one being consumed, 0 fetches on demand
+        :param start_page: int - page to start from
+        :return: generator of List[dict]
+        """
+        if page_size <= 0:
+            raise ValueError('Argument page_size must be positive')
+        if not isinstance(search_request, SearchRequest):
+            raise TypeError('Argument search_request is not of type SearchRequest')
+        # A single thread keeps the pages in order and never has more than one request in flight
+        executor = ThreadPoolExecutor(max_workers=1)
+        search_records = self.bind_call_options(self.search_records)
+        pending = deque()
+        next_page = start_page
+        try:
+            while True:
+                while len(pending) <= prefetch:
+                    pending.append(executor.submit(search_records, search_request, next_page, page_size))
+                    next_page += 1
+                records = pending.popleft().result()
+                if records:
+                    yield records
+                if len(records) < page_size:
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def search_iter(self, search_request: SearchRequest, page_size: int = 1000, prefetch: int = 1):
+        """
+        Yields every attribute matching a search, fetching pages as needed and prefetching the next `prefetch`
+        pages in the background while the current one is consumed.
+
+        :param search_request: SearchRequest
+        :param page_size: int - number of attributes requested at a time
+        :param prefetch: int - pages fetched ahead of the one being consumed, 0 fetches on demand
+        :return: generator of Attribute
+        """
+        for records in self.search_pages(search_request, page_size=page_size, prefetch=prefetch):
+            for record in records:
+                yield Attribute.from_json_dict(record)
+
+    def stream_search(self, search_request: SearchRequest, page: int, count: int, chunk_size: int = 65536):
+        """
+        Like search, but yields the attributes of the page one at a time as the response is read, so that a page
+        with a large count does not have to fit in memory at once. Bypasses the search cache.
+
+        :param search_request: SearchRequest
+        :param page: (int) - The page offset of search results
+        :param count: (int) - The number of attributes in a result
+        :param chunk_size: int - bytes read from the connection at a time
+        :return: generator of Attribute
+        """
+        if not isinstance(search_request, SearchRequest):
+            raise TypeError('Argument search_request is not of type SearchRequest')
+        query = search_request.to_json_bytes()
+        paginated_search_request = b'{"query":%s,"page":%d,"count":%d}' % (query, page, count)
+        return self.__stream(lambda: self.__post("/search/", paginated_search_request, idempotent=True, stream=True),
+                             Attribute.from_json_dict, chunk_size)
+
+    def search_frame(self, search_request: SearchRequest, page_size: int = 1000, prefetch: int = 1) -> SearchFrame:
+        """
+        Retrieves every attribute matching a search into a SearchFrame, which stores them column by column
+        instead of as one Attribute each.
+
+        :param search_request: SearchRequest
+        :param page_size: int - number of attributes requested at a time
+        :param prefetch: int - pages fetched ahead of the one being added to the frame
+        :return: SearchFrame
+        """
+        frame = SearchFrame()
+        for records in self.search_pages(search_request, page_size=page_size, prefetch=prefetch):
+            frame.extend(records)
+        return frame
+
+    def search_parallel(self, search_request: SearchRequest, page_size: int = 1000, max_workers: int = 4,
+                        ordered: bool = True, estimated_total: int = None):
+        """
+        Yields every attribute matching a search, fetching several pages at once. Pages are requested in order
+        and no page after the first short one is requested once that page has arrived. Attributes are
+        deduplicated by data point ID, since records can move between pages when data changes during the scan;
+        the IDs seen so far are kept in memory.
+
+        :param search_request: SearchRequest
+        :param page_size: int - number of attributes requested at a time
+        :param max_workers: int - number of pages fetched at once
+        :param ordered: bool - yield pages in page order instead of as they arrive
+        :param estimated_total: int - expected number of results; past the pages this covers, pages are fetched
+            one at a time so that few requests are wasted beyond the last page
+        :return: generator of Attribute
+        """
+        if page_size <= 0:
+            raise ValueError('Argument page_size must be positive')
+        if not isinstance(search_request, SearchRequest):
+            raise TypeError('Argument search_request is not of type SearchRequest')
+        estimated_pages = None if estimated_total is None else math.ceil(estimated_total / page_size)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        search_records = self.bind_call_options(self.search_records)
+        in_flight = {}
+        arrived = {}
+        next_page = 0
+        next_to_yield = 0
+        last_page = None
+        seen = set()
+        try:
+            while True:
+                while last_page is None:
+                    limit = max_workers if estimated_pages is None or next_page < estimated_pages else 1
+                    # In order, pages held back waiting for an earlier one count against the limit too
+                    if len(in_flight) >= limit or (ordered and next_page - next_to_yield >= 2 * max_workers):
+                        break
+                    future = executor.submit(search_records, search_request, next_page, page_size)
+                    in_flight[future] = next_page
+                    next_page += 1
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=in_flight.get):
+                    if future not in in_flight:
+                        # A later page dropped when an earlier one turned out to be the last
+                        continue
+                    page = in_flight.pop(future)
+                    records = future.result()
+                    if len(records) < page_size and (last_page is None or page < last_page):
+                        last_page = page
+                        for later in [later for later, later_page in in_flight.items() if later_page > page]:
+                            later.cancel()
+                            del in_flight[later]
+                    if last_page is None or page <= last_page:
+                        arrived[page] = records
+
+                if ordered:
+                    pages = []
+                    while next_to_yield in arrived:
+                        pages.append(arrived.pop(next_to_yield))
+                        next_to_yield += 1
+                else:
+                    pages = [arrived.pop(page) for page in sorted(arrived)]
+                for records in pages:
+                    for record in records:
+                        data_point_id = record.get('dataPointId')
+                        if data_point_id is not None:
+                            if data_point_id in seen:
+                                continue
+                            seen.add(data_point_id)
+                        yield Attribute.from_json_dict(record)
+        finally:
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True)
 
     def get_data_point(self, data_point_id: str) -> Attribute:
         """
@@ -294,11 +1033,17 @@ class ViziVault:
         :param data_point_id: (str) unique id of attribute (datapoint id)
         :return: Attribute with the desired datapoint id
         """
-        return Attribute.from_json(self.__get_with_decryption_key(f"/data/{data_point_id}").content)
+        return Attribute.from_json(self.__get_with_decryption_key(f"/data/{data_point_id}", hedge=True).content)
 
     def delete_data_point(self, data_point_id: str) -> Attribute:
         """
 
         :param data_point_id: (str) unique id of attribute (datapoint id)
         """
-        self.__delete(f"/data/{data_point_id}")
+        try:
+            self.__delete(f"/data/{data_point_id}")
+        finally:
+            if self.search_cache is not None:
+                self.search_cache.invalidate_data_point(data_point_id)
+            if self.entity_cache is not None:
+                self.entity_cache.invalidate_data_point(data_point_id)